@@ -1,18 +1,22 @@
 import streamlit as st
 import os
-import hashlib
-import urllib.request
 import torch
-from PIL import Image
 
 # 导入自定义模块
-from model import load_model, predict, batch_predict
+from model import load_backend, batch_predict
+from inference_queue import InferenceScheduler
+from utils.prediction_cache import PredictionCache
+from utils.model_loader import BackgroundModelLoader, start_health_server
+from utils.checkpoint import ensure_model_file
+from utils.timing import latency_recorder, stage
+from utils.db import DB_PATH, save_prediction
 from components.image_upload import single_image_upload, multiple_image_upload
 from components.prediction import display_prediction_result, display_batch_predictions
 from components.history import show_history
 from components.feedback import collect_feedback, feedback_form, view_feedback_records, collect_batch_feedback
 from components.export import export_data, data_visualization
 from components.navigation import class_navigation
+from components.diagnostics import show_latency_diagnostics
 from utils.styles import get_all_css
 
 # 页面配置
@@ -31,54 +35,195 @@ MODEL_URL = "https://github.com/718232157/CIFAR-100/releases/download/v1.0.0/bes
 MODEL_SIZE = 455397781
 MODEL_SHA256 = "a5bd01d6e8cc0227094b88421256037059b1c3cef29e62143190fa94be2729ea"
 
+# 设置MODEL_FORCE_VERIFY=1时忽略校验戳，启动时重新完整校验权重文件
+MODEL_FORCE_VERIFY = os.environ.get("MODEL_FORCE_VERIFY", "0") == "1"
 
-def _sha256(path):
-    digest = hashlib.sha256()
-    with open(path, "rb") as model_file:
-        for chunk in iter(lambda: model_file.read(8 * 1024 * 1024), b""):
-            digest.update(chunk)
-    return digest.hexdigest()
+# 并发下载的区间数，1表示顺序下载（边下载边校验）
+MODEL_DOWNLOAD_WORKERS = int(os.environ.get("MODEL_DOWNLOAD_WORKERS", "1"))
 
+# 推理精度：fp32或int8（INT8动态量化，仅CPU）
+MODEL_PRECISION = os.environ.get("MODEL_PRECISION", "fp32")
 
-def ensure_model_file():
-    """Download and verify the public release checkpoint when it is absent."""
-    if (
-        os.path.exists(MODEL_PATH)
-        and os.path.getsize(MODEL_PATH) == MODEL_SIZE
-        and _sha256(MODEL_PATH) == MODEL_SHA256
-    ):
-        return MODEL_PATH
+# 分支执行模式：sequential或concurrent（ConvNeXt与ViT分支并发执行）
+MODEL_BRANCH_MODE = os.environ.get("MODEL_BRANCH_MODE", "sequential")
 
-    temporary_path = f"{MODEL_PATH}.download"
-    if os.path.exists(temporary_path):
-        os.remove(temporary_path)
+# 图编译模式：留空为eager，trace（TorchScript，产物缓存在磁盘）、optimize（trace并执行CPU推理优化）
+# 或compile（torch.compile），失败时自动回退到eager
+MODEL_COMPILE = os.environ.get("MODEL_COMPILE", "") or None
 
-    urllib.request.urlretrieve(MODEL_URL, temporary_path)
+# 推理后端：torch或onnx（ONNX Runtime CPU，首次启动时自动导出模型）
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "torch")
 
-    if os.path.getsize(temporary_path) != MODEL_SIZE or _sha256(temporary_path) != MODEL_SHA256:
-        os.remove(temporary_path)
-        raise RuntimeError("模型文件完整性校验失败，请稍后重试。")
+# 级联推理：ConvNeXt分支置信度达到阈值时跳过ViT分支，阈值可用tools.calibrate_cascade标定；留空表示关闭
+MODEL_CASCADE_THRESHOLD = float(os.environ["MODEL_CASCADE_THRESHOLD"]) if os.environ.get("MODEL_CASCADE_THRESHOLD") else None
+MODEL_CASCADE_METRIC = os.environ.get("MODEL_CASCADE_METRIC", "confidence")
 
-    os.replace(temporary_path, MODEL_PATH)
-    return MODEL_PATH
+# ViT分支token合并比例：单个数值表示每层相同，也可用逗号分隔为12层分别指定；留空表示关闭
+MODEL_TOKEN_MERGE = [float(ratio) for ratio in os.environ.get("MODEL_TOKEN_MERGE", "").split(",") if ratio.strip()] or None
+
+# CPU执行选项，可分别开启：channels-last布局、bf16自动混合精度（需CPU支持）；
+# 算子融合通过MODEL_COMPILE=optimize开启；MODEL_NUM_THREADS为线程数或auto（启动时测量选择）
+MODEL_CHANNELS_LAST = os.environ.get("MODEL_CHANNELS_LAST", "0") == "1"
+MODEL_BF16 = os.environ.get("MODEL_BF16", "0") == "1"
+MODEL_NUM_THREADS = os.environ.get("MODEL_NUM_THREADS", "")
+MODEL_NUM_THREADS = int(MODEL_NUM_THREADS) if MODEL_NUM_THREADS.isdigit() else (MODEL_NUM_THREADS or None)
+
+# 设置MODEL_SHARED_WEIGHTS=1时权重放在/dev/shm中，同一主机上的多个Streamlit进程共享一份权重内存
+MODEL_SHARED_WEIGHTS = os.environ.get("MODEL_SHARED_WEIGHTS", "0") == "1"
+
+# 跨会话微批推理参数，可通过环境变量调整
+INFERENCE_MAX_BATCH = int(os.environ.get("INFERENCE_MAX_BATCH", "16"))
+INFERENCE_MAX_WAIT_MS = float(os.environ.get("INFERENCE_MAX_WAIT_MS", "5"))
+INFERENCE_QUEUE_SIZE = int(os.environ.get("INFERENCE_QUEUE_SIZE", "64"))
+INFERENCE_SUBMIT_TIMEOUT = float(os.environ.get("INFERENCE_SUBMIT_TIMEOUT", "30"))
+
+# 模型就绪前预热的批大小，默认覆盖单张请求与最大微批；设置为空字符串表示不预热
+MODEL_WARMUP_BATCH_SIZES = [int(size) for size in os.environ.get("MODEL_WARMUP_BATCH_SIZES", f"1,{INFERENCE_MAX_BATCH}").split(",") if size.strip()]
+
+# 就绪探针的HTTP端口：GET http://<host>:<端口>/health 返回就绪状态JSON（就绪时200，否则503）；设置为空字符串表示不启动
+MODEL_HEALTH_PORT = int(os.environ.get("MODEL_HEALTH_PORT", "8502") or 0)
+
+# 预测结果缓存的内存LRU容量
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "1024"))
+# 持久化预测缓存（data/prediction_cache.db）的最大条目数，超出时淘汰最早写入的条目
+PREDICTION_CACHE_DISK_SIZE = int(os.environ.get("PREDICTION_CACHE_DISK_SIZE", "100000"))
+TOP_K = 5
+
+# 设置LATENCY_PERSIST=1时将各阶段耗时样本写入历史数据库的stage_latency表
+LATENCY_PERSIST = os.environ.get("LATENCY_PERSIST", "0") == "1"
+
+
+def _load_model_in_background(report):
+    def download_progress(downloaded, total):
+        report(f"正在下载模型文件 {downloaded / 1024 / 1024:.0f} / {total / 1024 / 1024:.0f} MB（{downloaded / total * 100:.0f}%）")
+
+    report("正在校验模型文件，约 455 MB……")
+    model_path = ensure_model_file(
+        MODEL_PATH,
+        MODEL_URL,
+        MODEL_SIZE,
+        MODEL_SHA256,
+        force_verify=MODEL_FORCE_VERIFY,
+        progress=download_progress,
+        workers=MODEL_DOWNLOAD_WORKERS,
+    )
+    def stage_changed(stage_name, details):
+        if stage_name == 'loaded' and MODEL_WARMUP_BATCH_SIZES:
+            report(f"正在预热模型（批大小 {', '.join(map(str, MODEL_WARMUP_BATCH_SIZES))}）……", state=BackgroundModelLoader.WARMING)
+        elif stage_name == 'warmed':
+            report("模型预热完成", warmup=details)
+
+    report("正在加载模型权重……")
+    return load_backend(
+        model_path,
+        MODEL_BACKEND,
+        precision=MODEL_PRECISION,
+        branch_mode=MODEL_BRANCH_MODE,
+        compile_mode=MODEL_COMPILE,
+        checkpoint_hash=MODEL_SHA256,
+        cascade_threshold=MODEL_CASCADE_THRESHOLD,
+        cascade_metric=MODEL_CASCADE_METRIC,
+        token_merge_ratio=MODEL_TOKEN_MERGE,
+        channels_last=MODEL_CHANNELS_LAST,
+        bf16=MODEL_BF16,
+        num_threads=MODEL_NUM_THREADS,
+        shared_weights=MODEL_SHARED_WEIGHTS,
+        warmup_batch_sizes=MODEL_WARMUP_BATCH_SIZES,
+        on_stage=stage_changed,
+    )
 
 
 @st.cache_resource(show_spinner=False)
+def get_model_loader():
+    """进程启动时即在后台线程中加载模型，页面无需等待；加载失败后由wait_for_model/show_model_status重新加载。
+    
+    同时在MODEL_HEALTH_PORT上启动就绪探针服务。
+    """
+    loader = BackgroundModelLoader(_load_model_in_background).start()
+    if MODEL_HEALTH_PORT:
+        start_health_server(loader, MODEL_HEALTH_PORT)
+    return loader
+
+
 def get_cached_model():
-    model_path = ensure_model_file()
-    return load_model(model_path)
+    return get_model_loader().wait()
+
+
+@st.cache_resource(show_spinner=False)
+def get_inference_scheduler():
+    """所有会话共享的微批推理调度器，与缓存模型一同存活。"""
+    model, device = get_cached_model()
+    scheduler = InferenceScheduler(
+        model,
+        device,
+        max_batch_size=INFERENCE_MAX_BATCH,
+        max_wait_ms=INFERENCE_MAX_WAIT_MS,
+        max_queue_size=INFERENCE_QUEUE_SIZE,
+    )
+    return scheduler
+
+
+@st.cache_resource(show_spinner=False)
+def get_prediction_cache():
+    """按图像内容哈希缓存预测结果，键中包含权重校验值、精度模式、推理后端、级联与token合并设置。"""
+    return PredictionCache(f"{MODEL_SHA256}:{MODEL_PRECISION}:{MODEL_BACKEND}:{MODEL_CASCADE_METRIC}@{MODEL_CASCADE_THRESHOLD}:{MODEL_TOKEN_MERGE}:bf16={MODEL_BF16}",
+                           max_entries=PREDICTION_CACHE_SIZE, max_disk_entries=PREDICTION_CACHE_DISK_SIZE)
+
 
+@st.cache_resource(show_spinner=False)
+def enable_latency_persistence():
+    latency_recorder.enable_persistence(DB_PATH)
+    return True
+
+
+if LATENCY_PERSIST:
+    enable_latency_persistence()
+
+
+def _read_file_bytes(path):
+    with open(path, "rb") as image_file:
+        return image_file.read()
+
+
+# 模型在进程内只加载一次，并在后台线程中进行，不需要模型的页面可以立即渲染。
+model_loader = get_model_loader()
+
+def wait_for_model():
+    """分类页面使用：等待后台加载完成并显示进度，加载失败时显示错误并停止渲染。"""
+    # 上次加载失败（如下载临时中断）时重新加载，刷新页面即可重试
+    model_loader.retry()
+    if not model_loader.is_ready:
+        progress_placeholder = st.empty()
+        try:
+            while model_loader.wait(timeout=0.5) is None:
+                status = model_loader.status()
+                progress_placeholder.info(f"⏳ {status['message']}（已用时 {status['elapsed']:.0f} 秒）")
+        except Exception as error:
+            progress_placeholder.empty()
+            st.session_state.model_loaded = False
+            st.error("模型下载或加载失败。")
+            st.code(str(error))
+            st.warning("请稍后刷新重试；模型权重也可以从项目的 GitHub Release 手动下载。")
+            st.stop()
+        progress_placeholder.empty()
+    
+    if 'model' not in st.session_state:
+        st.session_state.model, st.session_state.device = model_loader.wait()
+    st.session_state.model_loaded = True
+    # 已有分类请求到达，就绪探针开始报告serving
+    model_loader.mark_serving()
+
+
+def show_model_status():
+    """在分类页面顶部提示模型加载状态（不阻塞页面）。"""
+    status = model_loader.status()
+    if status['state'] in (BackgroundModelLoader.LOADING, BackgroundModelLoader.WARMING):
+        st.info(f"⏳ 模型正在后台加载：{status['message']}（已用时 {status['elapsed']:.0f} 秒），可以先上传图片。")
+    elif status['state'] == BackgroundModelLoader.FAILED:
+        st.error(f"模型下载或加载失败：{status['error']}")
+        if model_loader.retry():
+            st.info("已在后台重新开始加载模型，稍后刷新页面查看进度。")
 
-# 模型在进程内只加载一次，避免 Streamlit 重跑重复占用内存。
-if 'model' not in st.session_state:
-    try:
-        with st.spinner("首次启动正在下载并加载模型，约 455 MB，请稍候……"):
-            st.session_state.model, st.session_state.device = get_cached_model()
-        st.session_state.model_loaded = True
-        st.session_state.model_error = None
-    except Exception as error:
-        st.session_state.model_loaded = False
-        st.session_state.model_error = str(error)
 
 if 'current_tab' not in st.session_state:
     st.session_state.current_tab = "单张图片分类"
@@ -99,16 +244,39 @@ with st.sidebar:
     """, unsafe_allow_html=True)
     
     # 设备信息
-    if 'model_loaded' in st.session_state and st.session_state.model_loaded:
+    model_state = model_loader.status()['state']
+    if model_state != BackgroundModelLoader.FAILED:
         device_info = "GPU" if torch.cuda.is_available() else "CPU"
+        running_status = {
+            BackgroundModelLoader.READY: "正常",
+            BackgroundModelLoader.WARMING: "模型预热中",
+        }.get(model_state, "模型加载中")
+        warmup = model_loader.readiness()['warmup']
+        warmup_info = f"<strong>预热耗时：</strong>{warmup['total_ms'] / 1000:.1f} 秒<br>" if warmup else ""
         st.markdown(f"""
         <div class="info-box">
-            <strong>运行状态：</strong>正常<br>
+            <strong>运行状态：</strong>{running_status}<br>
+            {warmup_info}
             <strong>使用设备：</strong>{device_info}<br>
             <strong>模型类型：</strong>ConvNeXt + ViT 混合模型
         </div>
         """, unsafe_allow_html=True)
     
+        # 预测缓存命中统计，用于评估缓存容量
+        cache_stats = get_prediction_cache().stats()
+        with st.expander("🗂️ 预测缓存"):
+            st.markdown(f"""
+            - 内存命中：{cache_stats['memory_hits']}
+            - 磁盘命中：{cache_stats['disk_hits']}
+            - 未命中：{cache_stats['misses']}
+            - 命中率：{cache_stats['hit_rate'] * 100:.1f}%
+            - 条目数：内存 {cache_stats['memory_entries']} / {PREDICTION_CACHE_SIZE}，磁盘 {cache_stats['disk_entries']} / {PREDICTION_CACHE_DISK_SIZE}
+            """)
+    
+        # 请求链路各阶段的延迟统计
+        with st.expander("⏱️ 性能诊断"):
+            show_latency_diagnostics()
+    
     # 主菜单
     st.markdown("<h3 style='margin-top: 1.5rem;'>主功能</h3>", unsafe_allow_html=True)
     
@@ -158,14 +326,6 @@ with st.sidebar:
 # 主界面
 st.markdown("<h1 class='main-header'>CIFAR-100 图像分类应用</h1>", unsafe_allow_html=True)
 
-# 如果模型未加载，显示错误信息
-if 'model_loaded' in st.session_state and not st.session_state.model_loaded:
-    st.error("模型下载或加载失败。")
-    if st.session_state.get('model_error'):
-        st.code(st.session_state.model_error)
-    st.warning("请稍后刷新重试；模型权重也可以从项目的 GitHub Release 手动下载。")
-    st.stop()
-
 # 根据当前选择的标签显示内容 - 改进显示逻辑
 if st.session_state.current_tab == "单张图片分类":
     st.markdown("<h2 class='sub-header' style='margin-bottom: 0.5rem;'>单张图片分类</h2>", unsafe_allow_html=True)
@@ -177,6 +337,9 @@ if st.session_state.current_tab == "单张图片分类":
     </div>
     """, unsafe_allow_html=True)
     
+    # 模型仍在后台加载时提示进度
+    show_model_status()
+    
     # 上传单张图片
     file_path = single_image_upload()
     
@@ -184,22 +347,32 @@ if st.session_state.current_tab == "单张图片分类":
         # 进行预测
         classify_btn = st.button("📊 开始分类", key="single_classify_btn", use_container_width=True)
         if classify_btn:
+            # 等待后台模型加载完成
+            wait_for_model()
             with st.spinner("正在进行分类分析..."):
                 try:
-                    # 读取图片
-                    image = Image.open(file_path).convert('RGB')
+                    # 读取图片字节，先查预测缓存
+                    image_bytes = _read_file_bytes(file_path)
+                    prediction_cache = get_prediction_cache()
+                    prediction_result = prediction_cache.get(image_bytes, TOP_K)
                     
-                    # 预测
-                    prediction_result = predict(
-                        st.session_state.model, 
-                        image, 
-                        st.session_state.device
-                    )
+                    if prediction_result is None:
+                        # 预测 - 通过共享调度器与其他会话的请求合并为批次
+                        prediction_result = get_inference_scheduler().submit(
+                            image_bytes,
+                            top_k=TOP_K,
+                            timeout=INFERENCE_SUBMIT_TIMEOUT
+                        )
+                        prediction_cache.put(image_bytes, TOP_K, prediction_result)
                     
-                    # 显示预测结果
-                    record_id = display_prediction_result(file_path, prediction_result)
+                    # 保存预测结果到数据库（由save_prediction阶段单独计时，不计入render）
+                    record_id = save_prediction(file_path, prediction_result) if prediction_result else None
                     st.session_state.last_prediction_record_id = record_id
                     
+                    # 显示预测结果
+                    with stage('render'):
+                        display_prediction_result(file_path, prediction_result)
+                    
                     # 添加成功消息
                     st.markdown("""
                     <div class="success-box">
@@ -232,6 +405,9 @@ elif st.session_state.current_tab == "多张图片分类":
     </div>
     """, unsafe_allow_html=True)
     
+    # 模型仍在后台加载时提示进度
+    show_model_status()
+    
     # 初始化会话状态
     if 'batch_record_ids' not in st.session_state:
         st.session_state.batch_record_ids = None
@@ -250,23 +426,37 @@ elif st.session_state.current_tab == "多张图片分类":
         # 进行预测
         batch_btn = st.button("📊 开始批量分类", key="batch_classify_btn", use_container_width=True)
         if batch_btn:
+            # 等待后台模型加载完成
+            wait_for_model()
             with st.spinner("正在进行批量分类分析..."):
                 try:
-                    # 读取图片
-                    images = [Image.open(path).convert('RGB') for path in file_paths]
+                    # 读取图片字节，已缓存的图片跳过解码与推理
+                    prediction_cache = get_prediction_cache()
+                    images = [_read_file_bytes(path) for path in file_paths]
+                    batch_results = [prediction_cache.get(image_bytes, TOP_K) for image_bytes in images]
+                    missing = [i for i, result in enumerate(batch_results) if result is None]
                     
-                    # 批量预测
-                    batch_results = batch_predict(
-                        st.session_state.model, 
-                        images, 
-                        st.session_state.device
-                    )
+                    # 批量预测未命中缓存的图片
+                    if missing:
+                        missing_results = batch_predict(
+                            st.session_state.model, 
+                            [images[i] for i in missing], 
+                            st.session_state.device,
+                            top_k=TOP_K
+                        )
+                        for i, result in zip(missing, missing_results):
+                            batch_results[i] = result
+                            prediction_cache.put(images[i], TOP_K, result)
                     
-                    # 显示预测结果
-                    record_ids = display_batch_predictions(file_paths, batch_results)
+                    # 保存预测结果到数据库（由save_prediction阶段单独计时，不计入render），
+                    # 记录ID保存到会话状态，用于批量反馈
+                    st.session_state.batch_record_ids = [
+                        save_prediction(path, result) for path, result in zip(file_paths, batch_results)
+                    ]
                     
-                    # 保存记录ID到会话状态，用于批量反馈
-                    st.session_state.batch_record_ids = record_ids
+                    # 显示预测结果
+                    with stage('render'):
+                        display_batch_predictions(file_paths, batch_results)
                     
                     # 添加成功消息
                     st.markdown("""
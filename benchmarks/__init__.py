@@ -0,0 +1,2 @@
+# 性能基准测试包
+# 使用随机权重构建模型，无需下载模型权重即可运行
@@ -0,0 +1,40 @@
+"""批量推理流水线基准测试
+
+对比串行解码（num_workers=0）与线程池预取解码在一批大尺寸JPEG照片上的端到端耗时，
+并用进程CPU时间与墙钟时间之比估算平均CPU利用率。
+
+用法:
+    python -m benchmarks.batch_pipeline --images 20 --size 4000x3000 --workers 0 2 4
+"""
+import argparse
+import time
+import torch
+
+from model import batch_predict
+from benchmarks.common import build_random_model, make_photo_jpeg
+
+def main():
+    parser = argparse.ArgumentParser(description="批量推理流水线基准测试")
+    parser.add_argument('--images', type=int, default=20, help="图像数量")
+    parser.add_argument('--size', default='4000x3000', help="照片尺寸，格式为宽x高")
+    parser.add_argument('--batch-size', type=int, default=8, help="批处理大小")
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, 4], help="测试的解码线程数")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split('x'))
+    device = torch.device('cpu')
+    model = build_random_model(device)
+    images = [make_photo_jpeg(width, height, seed=i) for i in range(args.images)]
+
+    # 预热
+    batch_predict(model, images[:1], device)
+
+    print(f"{'解码线程':<10}{'耗时(s)':>10}{'吞吐量(张/秒)':>16}{'CPU利用率':>12}")
+    for workers in args.workers:
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        batch_predict(model, images, device, batch_size=args.batch_size, num_workers=workers)
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        print(f"{workers:<10}{wall:>10.3f}{args.images / wall:>16.2f}{cpu / wall * 100:>11.0f}%")
+
+if __name__ == '__main__':
+    main()
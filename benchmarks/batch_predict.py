@@ -0,0 +1,49 @@
+"""批量预测吞吐量基准测试
+
+对比逐张调用predict与不同batch_size下batch_predict的吞吐量，并校验两者结果一致。
+
+用法:
+    python -m benchmarks.batch_predict --images 20 --batch-sizes 1 4 8 16
+"""
+import argparse
+import torch
+
+from model import predict, batch_predict
+from benchmarks.common import build_random_model, make_images, measure
+
+def main():
+    parser = argparse.ArgumentParser(description="batch_predict吞吐量基准测试")
+    parser.add_argument('--images', type=int, default=20, help="测试图像数量")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32], help="测试的批次大小")
+    parser.add_argument('--repeat', type=int, default=3, help="每种配置的计时次数")
+    parser.add_argument('--threads', type=int, default=None, help="PyTorch线程数")
+    args = parser.parse_args()
+    
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    
+    device = torch.device('cpu')
+    model = build_random_model(device)
+    images = make_images(args.images)
+    
+    # 校验批量结果与逐张结果一致
+    reference = [predict(model, image, device) for image in images]
+    batched = batch_predict(model, images, device, batch_size=max(args.batch_sizes))
+    mismatches = sum(
+        [r['class_id'] for r in ref] != [r['class_id'] for r in res]
+        for ref, res in zip(reference, batched)
+    )
+    print(f"结果一致性: {len(images) - mismatches}/{len(images)} 张图像top-k类别一致")
+    
+    print(f"{'模式':<16}{'耗时(s)':>10}{'吞吐量(张/秒)':>16}")
+    timings = measure(lambda: [predict(model, image, device) for image in images], repeat=args.repeat)
+    best = min(timings)
+    print(f"{'逐张predict':<16}{best:>10.3f}{len(images) / best:>16.2f}")
+    
+    for batch_size in args.batch_sizes:
+        timings = measure(lambda: batch_predict(model, images, device, batch_size=batch_size), repeat=args.repeat)
+        best = min(timings)
+        print(f"{'batch=' + str(batch_size):<16}{best:>10.3f}{len(images) / best:>16.2f}")
+
+if __name__ == '__main__':
+    main()
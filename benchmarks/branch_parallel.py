@@ -0,0 +1,39 @@
+"""分支并发执行基准测试
+
+在不同线程数下对比EfficientHybrid两个分支依次执行与并发执行的延迟，
+用于为部署机器的核数选择最快的执行布局。
+
+用法:
+    python -m benchmarks.branch_parallel --threads 2 4 8 --batch-sizes 1 8
+"""
+import argparse
+import os
+import torch
+
+from benchmarks.common import build_random_model, measure
+
+def main():
+    parser = argparse.ArgumentParser(description="分支并发执行基准测试")
+    parser.add_argument('--threads', type=int, nargs='+', default=None, help="测试的总线程数，默认为1到CPU核数的2的幂")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8], help="测试的批次大小")
+    parser.add_argument('--repeat', type=int, default=5, help="每种配置的计时次数")
+    args = parser.parse_args()
+
+    cpu_count = os.cpu_count() or 1
+    thread_counts = args.threads or [n for n in (1, 2, 4, 8, 16, 32, 64) if n <= cpu_count]
+    model = build_random_model()
+
+    print(f"{'线程数':<8}{'批大小':<8}{'sequential(ms)':>16}{'concurrent(ms)':>16}{'加速比':>10}")
+    with torch.no_grad():
+        for num_threads in thread_counts:
+            torch.set_num_threads(num_threads)
+            for batch_size in args.batch_sizes:
+                x = torch.randn(batch_size, 3, 160, 160)
+                model.set_branch_mode('sequential')
+                sequential = min(measure(lambda: model(x), repeat=args.repeat)) * 1000
+                model.set_branch_mode('concurrent', num_threads)
+                concurrent = min(measure(lambda: model(x), repeat=args.repeat)) * 1000
+                print(f"{num_threads:<8}{batch_size:<8}{sequential:>16.1f}{concurrent:>16.1f}{sequential / concurrent:>10.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import io
+import time
+import numpy as np
+import torch
+from PIL import Image
+
+from model import EfficientHybrid
+
+def build_random_model(device='cpu', seed=0):
+    """构建随机权重的EfficientHybrid模型，用于基准测试
+    
+    Args:
+        device: 计算设备
+        seed: 随机种子，保证多次运行结果一致
+        
+    Returns:
+        评估模式下的模型
+    """
+    torch.manual_seed(seed)
+    model = EfficientHybrid().to(device)
+    model.eval()
+    return model
+
+def make_images(count, size=(640, 480), seed=0):
+    """生成随机内容的RGB图像
+    
+    Args:
+        count: 图像数量
+        size: 图像尺寸（宽，高）
+        seed: 随机种子
+        
+    Returns:
+        PIL.Image列表
+    """
+    rng = np.random.default_rng(seed)
+    return [
+        Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8), 'RGB')
+        for _ in range(count)
+    ]
+
+def make_photo_jpeg(width, height, seed=0):
+    """生成平滑内容的JPEG字节，模拟真实照片的频谱特性
+    
+    Args:
+        width: 图像宽度
+        height: 图像高度
+        seed: 随机种子
+        
+    Returns:
+        JPEG编码的bytes
+    """
+    rng = np.random.default_rng(seed)
+    coarse = Image.fromarray(rng.integers(0, 256, (48, 64, 3), dtype=np.uint8), 'RGB')
+    buffer = io.BytesIO()
+    coarse.resize((width, height), Image.BICUBIC).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+def measure(func, repeat=3, warmup=1):
+    """多次运行函数并返回每次耗时（秒）
+    
+    Args:
+        func: 无参数的可调用对象
+        repeat: 计时次数
+        warmup: 预热次数（不计时）
+        
+    Returns:
+        每次运行耗时的列表
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+    return timings
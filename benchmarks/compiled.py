@@ -0,0 +1,57 @@
+"""图编译基准测试
+
+对比eager、TorchScript跟踪（trace+freeze）与torch.compile在单张和批量推理下的延迟，
+并检查编译后的输出与eager一致。trace模式的产物写入临时目录，第二次调用compile_model
+时验证可以直接从缓存加载。
+
+用法:
+    python -m benchmarks.compiled --batch-sizes 1 8
+"""
+import argparse
+import tempfile
+import time
+import torch
+
+from model import compile_model
+from benchmarks.common import build_random_model, measure
+
+def main():
+    parser = argparse.ArgumentParser(description="图编译基准测试")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8], help="测试的批次大小")
+    parser.add_argument('--modes', nargs='+', choices=['trace', 'compile'], default=['trace', 'compile'],
+                        help="参与对比的编译模式")
+    parser.add_argument('--repeat', type=int, default=5, help="每种配置的计时次数")
+    args = parser.parse_args()
+
+    model = build_random_model()
+    variants = {'eager': model}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for mode in args.modes:
+            start_time = time.perf_counter()
+            compiled = compile_model(model, 'benchmark', mode=mode, cache_dir=cache_dir)
+            first_time = time.perf_counter() - start_time
+            if compiled is model:
+                print(f"{mode}: 编译失败或不可用，跳过")
+                continue
+            variants[mode] = compiled
+            print(f"{mode}: 准备耗时 {first_time:.2f}s")
+            if mode == 'trace':
+                start_time = time.perf_counter()
+                compile_model(model, 'benchmark', mode=mode, cache_dir=cache_dir)
+                print(f"trace: 从缓存加载耗时 {time.perf_counter() - start_time:.2f}s")
+
+        print(f"{'模式':<10}{'批大小':<8}{'延迟(ms)':>12}{'相对eager':>12}{'最大误差':>12}")
+        with torch.no_grad():
+            for batch_size in args.batch_sizes:
+                x = torch.randn(batch_size, 3, 160, 160)
+                reference = model(x)
+                eager_time = None
+                for name, variant in variants.items():
+                    # torch.compile在首次调用新形状时编译，先预热再计时
+                    error = (variant(x) - reference).abs().max().item()
+                    latency = min(measure(lambda: variant(x), repeat=args.repeat)) * 1000
+                    eager_time = eager_time or latency
+                    print(f"{name:<10}{batch_size:<8}{latency:>12.1f}{eager_time / latency:>12.2f}{error:>12.2e}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""CPU执行选项基准测试
+
+分别开启channels-last、oneDNN融合（trace + freeze + optimize_for_inference）和bf16自动混合精度，
+以及全部组合，对比相对默认执行方式的延迟与输出误差；最后测量不同算子内线程数的延迟，
+即load_model(num_threads='auto')的选择依据。
+
+用法:
+    python -m benchmarks.cpu_options --batch-sizes 1 8
+    python -m benchmarks.cpu_options --options channels_last bf16
+"""
+import argparse
+import tempfile
+import torch
+
+from model import compile_model, cpu_supports_bf16, select_num_threads
+from benchmarks.common import build_random_model, measure
+
+# 可单独开启的选项
+OPTIONS = ('channels_last', 'fusion', 'bf16')
+
+def _build_variant(model, options, cache_dir):
+    """按选项组合配置模型，返回可调用的推理对象"""
+    model.set_cpu_options(channels_last='channels_last' in options, bf16='bf16' in options)
+    if 'fusion' in options:
+        return compile_model(model, 'benchmark', mode='optimize', cache_dir=cache_dir)
+    return model
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU执行选项基准测试")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8], help="测试的批次大小")
+    parser.add_argument('--options', nargs='+', choices=OPTIONS, default=list(OPTIONS), help="参与对比的选项")
+    parser.add_argument('--repeat', type=int, default=5, help="每种配置的计时次数")
+    args = parser.parse_args()
+
+    options = [option for option in args.options if option != 'bf16' or cpu_supports_bf16()]
+    if len(options) < len(args.options):
+        print("当前CPU不支持bfloat16指令，跳过bf16")
+    configs = [('默认', ())] + [(option, (option,)) for option in options]
+    if len(options) > 1:
+        configs.append(('+'.join(options), tuple(options)))
+
+    model = build_random_model()
+    inputs = {batch_size: torch.randn(batch_size, 3, 160, 160) for batch_size in args.batch_sizes}
+    with torch.no_grad():
+        references = {batch_size: model(x) for batch_size, x in inputs.items()}
+
+        print(f"{'配置':<32}{'批大小':<8}{'延迟(ms)':>10}{'加速比':>8}{'最大误差':>12}{'top-1一致':>10}")
+        baseline = {}
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for name, config in configs:
+                variant = _build_variant(model, config, cache_dir)
+                for batch_size, x in inputs.items():
+                    latency = min(measure(lambda: variant(x), repeat=args.repeat)) * 1000
+                    baseline.setdefault(batch_size, latency)
+                    output = variant(x)
+                    error = (output - references[batch_size]).abs().max().item()
+                    agreement = (output.argmax(dim=1) == references[batch_size].argmax(dim=1)).float().mean().item()
+                    print(f"{name:<32}{batch_size:<8}{latency:>10.1f}{baseline[batch_size] / latency:>8.2f}"
+                          f"{error:>12.2e}{agreement * 100:>9.0f}%")
+        model.set_cpu_options()
+
+        print()
+        select_num_threads(model, example_shape=(max(args.batch_sizes), 3, 160, 160))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""历史数据库并发读写基准测试
+
+多个写线程不断保存预测记录，多个读线程同时分页查询历史记录和总数，对比两种连接方式：
+- legacy: 每次调用新建连接并关闭，默认回滚日志模式（连接层引入前的方式）
+- pooled: utils.db的线程复用连接，WAL日志模式，synchronous=NORMAL
+报告各类操作的延迟百分位数、吞吐量以及"database is locked"错误次数。数据库建在临时目录中。
+
+用法:
+    python -m benchmarks.db_concurrency --readers 4 --writers 2 --ops 200
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import utils.db as db
+
+PREDICTION = [{'class_id': 0, 'class_name': 'apple', 'probability': 91.5},
+              {'class_id': 57, 'class_name': 'pear', 'probability': 4.2}]
+
+def _legacy_connect(path):
+    """新建连接，注册搜索索引触发器使用的分词函数"""
+    conn = sqlite3.connect(path)
+    conn.create_function('split_cjk', 1, db._split_cjk, deterministic=True)
+    return conn
+
+def _legacy_save(path):
+    conn = _legacy_connect(path)
+    conn.execute(
+        "INSERT INTO prediction_history (image_path, prediction_result, timestamp, category) VALUES (?, ?, ?, ?)",
+        ('benchmark.jpg', json.dumps(PREDICTION), datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'apple')
+    )
+    conn.commit()
+    conn.close()
+
+def _legacy_read(path):
+    conn = _legacy_connect(path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("SELECT * FROM prediction_history ORDER BY timestamp DESC LIMIT 20 OFFSET 0").fetchall()
+    [json.loads(row['prediction_result']) for row in rows]
+    conn.execute("SELECT COUNT(*) FROM prediction_history").fetchone()
+    conn.close()
+
+def _pooled_save(path):
+    db.save_prediction('benchmark.jpg', PREDICTION)
+
+def _pooled_read(path):
+    db.get_history_page(limit=20)
+    db.get_history_count()
+
+OPERATIONS = {
+    'legacy': (_legacy_save, _legacy_read),
+    'pooled': (_pooled_save, _pooled_read),
+}
+
+def _prepare(mode, path, rows):
+    """创建数据库并预先写入rows条记录"""
+    db.DB_PATH = path
+    db.init_db()
+    db.close_connection(path)
+    conn = _legacy_connect(path)
+    conn.execute(f"PRAGMA journal_mode={'DELETE' if mode == 'legacy' else 'WAL'}")
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    conn.executemany(
+        "INSERT INTO prediction_history (image_path, prediction_result, timestamp, category) VALUES (?, ?, ?, ?)",
+        [('benchmark.jpg', json.dumps(PREDICTION), now, 'apple')] * rows
+    )
+    conn.commit()
+    conn.close()
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100.0 * len(values))) - 1)] if values else 0.0
+
+def run(mode, path, readers, writers, ops):
+    """运行一轮并发读写，返回各类操作的延迟列表、错误数和总耗时"""
+    save, read = OPERATIONS[mode]
+    timings = {'write': [], 'read': []}
+    errors = {'write': 0, 'read': 0}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(readers + writers)
+
+    def worker(kind, func):
+        start_barrier.wait()
+        for _ in range(ops):
+            start_time = time.perf_counter()
+            try:
+                func(path)
+            except sqlite3.OperationalError:
+                with lock:
+                    errors[kind] += 1
+                continue
+            with lock:
+                timings[kind].append((time.perf_counter() - start_time) * 1000)
+
+    threads = [threading.Thread(target=worker, args=('write', save)) for _ in range(writers)]
+    threads += [threading.Thread(target=worker, args=('read', read)) for _ in range(readers)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, errors, time.perf_counter() - start_time
+
+def main():
+    parser = argparse.ArgumentParser(description="历史数据库并发读写基准测试")
+    parser.add_argument('--readers', type=int, default=4, help="读线程数")
+    parser.add_argument('--writers', type=int, default=2, help="写线程数")
+    parser.add_argument('--ops', type=int, default=200, help="每个线程的操作次数")
+    parser.add_argument('--rows', type=int, default=10000, help="预先写入的记录数")
+    args = parser.parse_args()
+
+    print(f"{'方式':<8}{'操作':<7}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'吞吐(次/秒)':>14}{'锁错误':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for mode in OPERATIONS:
+            path = os.path.join(temp_dir, f'{mode}.db')
+            _prepare(mode, path, args.rows)
+            timings, errors, elapsed = run(mode, path, args.readers, args.writers, args.ops)
+            for kind in ('write', 'read'):
+                values = timings[kind]
+                print(f"{mode:<8}{kind:<7}{_percentile(values, 50):>10.2f}{_percentile(values, 95):>10.2f}"
+                      f"{_percentile(values, 99):>10.2f}{len(values) / elapsed:>14.1f}{errors[kind]:>8}")
+
+if __name__ == '__main__':
+    main()
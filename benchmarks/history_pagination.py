@@ -0,0 +1,111 @@
+"""历史记录分页基准测试：LIMIT/OFFSET vs 游标分页
+
+在临时数据库中写入指定数量的记录，测量不同页码深度下获取一页记录的中位延迟：
+- offset: get_history(limit, offset)，SQLite需要逐条跳过前面的所有记录
+- keyset: get_history_page(limit, cursor)，按(timestamp, id)等复合索引直接定位
+分别在全部记录和单个类别（对应类别浏览器和图片库）上测试。
+
+用法:
+    python -m benchmarks.history_pagination
+    python -m benchmarks.history_pagination --rows 200000 --pages 1 100 1000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import utils.db as db
+
+def _time_ms(func, repeat):
+    func()  # 预热
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start_time) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def _populate(rows):
+    """直接写入记录（触发器已移除，本测试不需要统计表和搜索索引）"""
+    rng = random.Random(0)
+    with db.transaction() as conn:
+        for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name NOT LIKE 'prediction_%'").fetchall():
+            conn.execute(f"DROP TRIGGER {name}")
+        conn.executemany("INSERT INTO class_names (class_id, name) VALUES (?, ?)",
+                         [(class_id, f"class_{class_id}") for class_id in range(100)])
+        batch = []
+        for index in range(rows):
+            class_id = min(99, int(rng.expovariate(1 / 20)))
+            probability = round(rng.uniform(20, 100), 2)
+            result = [{'class_id': class_id, 'class_name': f"class_{class_id}", 'probability': probability}]
+            timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(1704067200 + index * 30))
+            batch.append((f"image_{index}.jpg", json.dumps(result), timestamp, f"class_{class_id}",
+                          class_id, probability))
+            if len(batch) == 10000 or index == rows - 1:
+                conn.executemany(
+                    "INSERT INTO prediction_history (image_path, prediction_result, timestamp, category, "
+                    "top1_class_id, top1_probability) VALUES (?, ?, ?, ?, ?, ?)",
+                    batch
+                )
+                batch = []
+
+def _cursor_at(offset, category=None):
+    """构造指向第offset条记录之后的游标（与逐页翻到该位置时得到的游标相同）"""
+    query = "SELECT timestamp, id FROM prediction_history"
+    params = []
+    if category:
+        query += " WHERE category = ?"
+        params.append(category)
+    query += " ORDER BY timestamp DESC, id DESC LIMIT 1 OFFSET ?"
+    params.append(offset - 1)
+    row = db.get_connection().execute(query, params).fetchone()
+    return db._encode_cursor('timestamp', 'DESC', [row['timestamp'], row['id']])
+
+def main():
+    parser = argparse.ArgumentParser(description="历史记录分页基准测试")
+    parser.add_argument('--rows', type=int, default=1000000, help="历史记录数")
+    parser.add_argument('--page-size', type=int, default=20, help="分页大小")
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100, 1000, 10000], help="测试的页码")
+    parser.add_argument('--repeat', type=int, default=5, help="每项的计时次数（取中位数）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'history.db')
+        db.DB_PATH = path
+        db.init_db()
+        _populate(args.rows)
+        category = db.get_connection().execute(
+            "SELECT category FROM prediction_history GROUP BY category ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()[0]
+        category_rows = db.get_history_count_by_category(category)
+        print(f"记录数 {args.rows}，类别「{category}」{category_rows} 条，每页 {args.page_size} 条")
+        print(f"{'范围':<8}{'页码':>8}{'offset(ms)':>12}{'keyset(ms)':>12}")
+
+        for scope, scope_category, total in (('全部', None, args.rows), ('类别', category, category_rows)):
+            for page in args.pages:
+                offset = (page - 1) * args.page_size
+                if offset >= total:
+                    continue
+                cursor = _cursor_at(offset, scope_category) if offset else None
+                offset_ms = _time_ms(lambda: db.get_history(limit=args.page_size, offset=offset,
+                                                            category=scope_category), args.repeat)
+                keyset_ms = _time_ms(lambda: db.get_history_page(limit=args.page_size, cursor=cursor,
+                                                                 category=scope_category), args.repeat)
+                expected = [record['id'] for record in db.get_history(limit=args.page_size, offset=offset,
+                                                                      category=scope_category)]
+                actual = [record['id'] for record in db.get_history_page(limit=args.page_size, cursor=cursor,
+                                                                         category=scope_category)[0]]
+                if expected != actual:
+                    raise SystemExit(f"第 {page} 页的游标分页结果与OFFSET不一致")
+                print(f"{scope:<8}{page:>8}{offset_ms:>12.2f}{keyset_ms:>12.2f}")
+
+        # 恢复触发器，保持数据库结构完整
+        db.ensure_db_structure(migrate=False)
+        db.close_connection(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""历史记录读取基准测试：JSON结果逐行解析 vs prediction_topk规范化表
+
+在临时数据库中写入旧格式（只有prediction_result JSON）的记录，先测量旧的读取方式
+（SELECT *后对每行json.loads），再运行分块迁移，测量utils.db中的读取函数：
+分页查询、类别统计，以及规范化后才能在SQL中完成的按置信度排序。
+
+用法:
+    python -m benchmarks.history_reads --rows 100000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import utils.db as db
+
+def _time_ms(func, repeat):
+    func()  # 预热
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start_time) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def _create_legacy_db(path, rows, top_k=5):
+    """按旧结构写入只有JSON结果的记录"""
+    rng = random.Random(0)
+    conn = sqlite3.connect(path)
+    conn.execute('''
+    CREATE TABLE prediction_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        image_path TEXT,
+        prediction_result TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        feedback TEXT,
+        category TEXT
+    )
+    ''')
+    batch = []
+    for index in range(rows):
+        class_ids = rng.sample(range(100), top_k)
+        probabilities = sorted((round(rng.uniform(0, 100), 2) for _ in range(top_k)), reverse=True)
+        result = [{'class_id': class_id, 'class_name': f"class_{class_id}", 'probability': probability}
+                  for class_id, probability in zip(class_ids, probabilities)]
+        timestamp = f"2025-01-{index // 86400 % 28 + 1:02d} {index // 3600 % 24:02d}:{index // 60 % 60:02d}:{index % 60:02d}"
+        batch.append((f"image_{index}.jpg", json.dumps(result), timestamp, result[0]['class_name']))
+        if len(batch) == 10000:
+            conn.executemany("INSERT INTO prediction_history (image_path, prediction_result, timestamp, category) "
+                             "VALUES (?, ?, ?, ?)", batch)
+            batch = []
+    conn.executemany("INSERT INTO prediction_history (image_path, prediction_result, timestamp, category) "
+                     "VALUES (?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+def _legacy_page(conn, limit):
+    rows = conn.execute("SELECT * FROM prediction_history ORDER BY timestamp DESC LIMIT ? OFFSET 0", (limit,))
+    return [dict(row, prediction_result=json.loads(row['prediction_result'])) for row in rows]
+
+def _legacy_statistics(conn):
+    class_counts = {}
+    for row in conn.execute("SELECT prediction_result FROM prediction_history"):
+        prediction_result = json.loads(row['prediction_result'])
+        if prediction_result:
+            top1_class = prediction_result[0]['class_name']
+            class_counts[top1_class] = class_counts.get(top1_class, 0) + 1
+    return sorted(class_counts.items(), key=lambda x: x[1], reverse=True)
+
+def _legacy_top_confidence(conn, limit):
+    """旧结构下按置信度排序只能全表解析后在Python中排序"""
+    records = [dict(row, prediction_result=json.loads(row['prediction_result']))
+               for row in conn.execute("SELECT * FROM prediction_history")]
+    records.sort(key=lambda record: record['prediction_result'][0]['probability'], reverse=True)
+    return records[:limit]
+
+def main():
+    parser = argparse.ArgumentParser(description="历史记录读取基准测试")
+    parser.add_argument('--rows', type=int, default=100000, help="记录数")
+    parser.add_argument('--page-size', type=int, default=20, help="分页大小")
+    parser.add_argument('--repeat', type=int, default=5, help="每项的计时次数（取中位数）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'history.db')
+        _create_legacy_db(path, args.rows)
+
+        legacy = sqlite3.connect(path)
+        legacy.row_factory = sqlite3.Row
+        before = {
+            'page': _time_ms(lambda: _legacy_page(legacy, args.page_size), args.repeat),
+            'class_statistics': _time_ms(lambda: _legacy_statistics(legacy), args.repeat),
+            'top_confidence': _time_ms(lambda: _legacy_top_confidence(legacy, args.page_size), args.repeat),
+        }
+        legacy.close()
+
+        db.DB_PATH = path
+        db.ensure_db_structure(migrate=False)
+        start_time = time.perf_counter()
+        db.migrate_prediction_topk()
+        migration_seconds = time.perf_counter() - start_time
+
+        after = {
+            'page': _time_ms(lambda: db.get_history_page(limit=args.page_size), args.repeat),
+            'class_statistics': _time_ms(db.get_class_statistics, args.repeat),
+            'top_confidence': _time_ms(lambda: db.get_history_page(limit=args.page_size, sort_by='probability'),
+                                       args.repeat),
+        }
+        if sorted(db.get_class_statistics()) != sorted(_legacy_statistics(db.get_connection())):
+            raise SystemExit("规范化表的类别统计与JSON结果不一致")
+        db.close_connection(path)
+
+    print(f"记录数 {args.rows}，迁移耗时 {migration_seconds:.1f}s "
+          f"({args.rows / migration_seconds:.0f} 条/秒)")
+    print(f"{'操作':<18}{'JSON解析(ms)':>14}{'规范化表(ms)':>14}{'加速比':>8}")
+    for name in before:
+        print(f"{name:<18}{before[name]:>14.2f}{after[name]:>14.2f}{before[name] / after[name]:>8.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""历史记录搜索基准测试：LIKE全表扫描 vs FTS5全文索引
+
+在临时数据库中逐步增加记录数，每个规模下分别用LIKE（未建立全文索引时的退回方式）
+和FTS5索引执行历史页面的一次搜索（一页记录加总数），报告中位延迟：
+- rare: 只在固定20条记录的反馈中出现的词，FTS5的延迟不随记录数增长
+- common: 约3%的记录top-k中出现的类别名，FTS5的延迟与匹配数成正比
+LIKE每次都扫描全表，延迟随记录数线性增长。
+
+用法:
+    python -m benchmarks.history_search
+    python -m benchmarks.history_search --sizes 10000 100000 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import utils.db as db
+
+# rare搜索词出现的记录数（只写在第一批记录中）
+RARE_MATCHES = 20
+
+def _time_ms(func, repeat):
+    func()  # 预热
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start_time) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def _append_rows(conn, rng, start, end, rare_ids, top_k=3):
+    """直接写入记录与top-k明细（触发器已移除，之后统一重建索引）"""
+    history, topk = [], []
+    for record_id in range(start + 1, end + 1):
+        class_ids = rng.sample(range(100), top_k)
+        result = [{'class_id': class_id, 'class_name': f"class_{class_id}", 'probability': 90.0 - rank}
+                  for rank, class_id in enumerate(class_ids)]
+        feedback = None
+        if record_id in rare_ids:
+            feedback = json.dumps({'rating': 1, 'correct_class': None, 'comment': "looks like a unicorn"})
+        elif rng.random() < 0.05:
+            feedback = json.dumps({'rating': rng.randint(1, 5), 'correct_class': None, 'comment': "ok"})
+        history.append((record_id, f"image_{record_id}.jpg", json.dumps(result), f"2025-01-01 00:00:{record_id % 60:02d}",
+                        feedback, result[0]['class_name'], class_ids[0], 90.0))
+        topk.extend((record_id, rank, class_id, 90.0 - rank) for rank, class_id in enumerate(class_ids, 1))
+    conn.executemany(
+        "INSERT INTO prediction_history (id, image_path, prediction_result, timestamp, feedback, category, "
+        "top1_class_id, top1_probability) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", history
+    )
+    conn.executemany(
+        "INSERT INTO prediction_topk (record_id, rank, class_id, probability) VALUES (?, ?, ?, ?)", topk
+    )
+
+def _search(term, page_size):
+    db.get_history_page(limit=page_size, search_term=term)
+    db.get_history_count(search_term=term)
+
+def main():
+    parser = argparse.ArgumentParser(description="历史记录搜索基准测试")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help="记录数（递增）")
+    parser.add_argument('--page-size', type=int, default=20, help="分页大小")
+    parser.add_argument('--repeat', type=int, default=5, help="每项的计时次数（取中位数）")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    terms = {'rare': "unicorn", 'common': "class_42"}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'history.db')
+        db.DB_PATH = path
+        db.init_db()
+        with db.transaction() as conn:
+            conn.executemany("INSERT INTO class_names (class_id, name) VALUES (?, ?)",
+                             [(class_id, f"class_{class_id}") for class_id in range(100)])
+            for (name,) in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name NOT LIKE 'prediction_%'").fetchall():
+                conn.execute(f"DROP TRIGGER {name}")
+
+        print(f"{'记录数':>10}{'搜索词':>8}{'匹配数':>8}{'LIKE(ms)':>12}{'FTS5(ms)':>12}")
+        written = 0
+        for size in sorted(args.sizes):
+            rare_ids = set(rng.sample(range(1, size + 1), RARE_MATCHES)) if written == 0 else set()
+            with db.transaction() as conn:
+                _append_rows(conn, rng, written, size, rare_ids)
+            written = size
+            db.rebuild_search_index()
+
+            for name, term in terms.items():
+                db._search_index_enabled[path] = False
+                like_ms = _time_ms(lambda: _search(term, args.page_size), args.repeat)
+                db._search_index_enabled[path] = True
+                fts_ms = _time_ms(lambda: _search(term, args.page_size), args.repeat)
+                matches = db.get_history_count(search_term=term)
+                print(f"{size:>10}{name:>8}{matches:>8}{like_ms:>12.2f}{fts_ms:>12.2f}")
+
+        # 恢复触发器，保持数据库结构完整
+        db.ensure_db_structure(migrate=False)
+        db.close_connection(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""历史统计基准测试：逐行解析JSON、SQL聚合与触发器维护的计数表
+
+在临时数据库中写入指定数量（默认100万条）的历史记录，对比三种获取统计的方式：
+- json: 旧实现，读出全部prediction_result并在Python中json.loads后计数
+- group_by: 在prediction_history上用SQL GROUP BY聚合
+- materialized: 读取触发器维护的class_counts/daily_counts/feedback_counts表
+并报告计数触发器给单条写入带来的额外开销，以及rebuild_statistics的重建耗时。
+
+用法:
+    python -m benchmarks.history_statistics
+    python -m benchmarks.history_statistics --rows 200000 --repeat 3
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import utils.db as db
+
+def _time_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start_time) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def _make_row(rng, index, rows):
+    class_id = min(99, int(rng.expovariate(1 / 20)))
+    probability = round(rng.uniform(20, 100), 2)
+    result = [{'class_id': class_id, 'class_name': f"class_{class_id}", 'probability': probability}]
+    # 记录均匀分布在一年内
+    seconds = index * 365 * 86400 // rows
+    timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(1704067200 + seconds))
+    feedback = json.dumps({'rating': rng.randint(1, 5)}) if rng.random() < 0.05 else None
+    return (f"image_{index}.jpg", json.dumps(result), timestamp, f"class_{class_id}",
+            feedback, class_id, probability)
+
+def _populate(rows):
+    """批量写入记录（计数由触发器同时维护），返回写入耗时（秒）"""
+    rng = random.Random(0)
+    start_time = time.perf_counter()
+    with db.transaction() as conn:
+        conn.executemany("INSERT OR IGNORE INTO class_names (class_id, name) VALUES (?, ?)",
+                         [(class_id, f"class_{class_id}") for class_id in range(100)])
+        batch = []
+        for index in range(rows):
+            batch.append(_make_row(rng, index, rows))
+            if len(batch) == 10000 or index == rows - 1:
+                conn.executemany(
+                    "INSERT INTO prediction_history (image_path, prediction_result, timestamp, category, "
+                    "feedback, top1_class_id, top1_probability) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    batch
+                )
+                batch = []
+        # 标记为已迁移，避免启动时的迁移扫描
+        conn.execute("INSERT OR REPLACE INTO db_meta (key, value) VALUES ('topk_migration_last_id', ?)", (rows,))
+    return time.perf_counter() - start_time
+
+def _json_statistics():
+    class_counts = {}
+    for row in db.get_connection().execute("SELECT prediction_result FROM prediction_history"):
+        prediction_result = json.loads(row['prediction_result'])
+        if prediction_result:
+            top1_class = prediction_result[0]['class_name']
+            class_counts[top1_class] = class_counts.get(top1_class, 0) + 1
+    return sorted(class_counts.items(), key=lambda x: x[1], reverse=True)
+
+def _group_by_statistics():
+    rows = db.get_connection().execute(
+        "SELECT c.name, COUNT(*) AS count FROM prediction_history h "
+        "JOIN class_names c ON c.class_id = h.top1_class_id "
+        "GROUP BY h.top1_class_id ORDER BY count DESC"
+    ).fetchall()
+    return [(row['name'], row['count']) for row in rows]
+
+def _group_by_daily():
+    rows = db.get_connection().execute(
+        "SELECT date(timestamp) AS day, COUNT(*) AS count FROM prediction_history GROUP BY day ORDER BY day"
+    ).fetchall()
+    return [(row['day'], row['count']) for row in rows]
+
+def _group_by_feedback(category):
+    rows = db.get_connection().execute(
+        "SELECT feedback, COUNT(*) AS count FROM prediction_history "
+        "WHERE category = ? AND feedback IS NOT NULL GROUP BY feedback ORDER BY count DESC",
+        (category,)
+    ).fetchall()
+    return [(row['feedback'], row['count']) for row in rows]
+
+def _single_inserts(count):
+    """逐条提交写入，返回每条的平均耗时（微秒）"""
+    start_time = time.perf_counter()
+    for index in range(count):
+        with db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO prediction_history (image_path, prediction_result, timestamp, category, "
+                "feedback, top1_class_id, top1_probability) VALUES (?, '[]', datetime('now'), ?, NULL, ?, ?)",
+                (f"insert_{index}.jpg", f"class_{index % 100}", index % 100, 50.0)
+            )
+    return (time.perf_counter() - start_time) * 1e6 / count
+
+def main():
+    parser = argparse.ArgumentParser(description="历史统计基准测试")
+    parser.add_argument('--rows', type=int, default=1000000, help="历史记录数")
+    parser.add_argument('--repeat', type=int, default=3, help="每项的计时次数（取中位数）")
+    parser.add_argument('--inserts', type=int, default=2000, help="测量写入开销时逐条提交的记录数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'history.db')
+        db.DB_PATH = path
+        db.init_db()
+        populate_seconds = _populate(args.rows)
+        print(f"写入 {args.rows} 条记录（含触发器计数），耗时 {populate_seconds:.1f}s")
+
+        if sorted(db.get_class_statistics()) != sorted(_group_by_statistics()) \
+                or db.get_daily_counts() != _group_by_daily():
+            raise SystemExit("计数表与GROUP BY结果不一致")
+
+        category = db.get_class_statistics()[0][0]
+        results = [
+            ('类别统计', {
+                'json': _time_ms(_json_statistics, args.repeat),
+                'group_by': _time_ms(_group_by_statistics, args.repeat),
+                'materialized': _time_ms(db.get_class_statistics, args.repeat),
+            }),
+            ('每日数量', {
+                'group_by': _time_ms(_group_by_daily, args.repeat),
+                'materialized': _time_ms(db.get_daily_counts, args.repeat),
+            }),
+            ('类别反馈统计', {
+                'group_by': _time_ms(lambda: _group_by_feedback(category), args.repeat),
+                'materialized': _time_ms(lambda: db.get_feedback_statistics(category), args.repeat),
+            }),
+        ]
+
+        print(f"{'统计':<12}{'json(ms)':>12}{'group_by(ms)':>14}{'计数表(ms)':>12}")
+        for name, timings in results:
+            json_ms = f"{timings['json']:.1f}" if 'json' in timings else '-'
+            print(f"{name:<12}{json_ms:>12}{timings['group_by']:>14.1f}{timings['materialized']:>12.3f}")
+
+        with_triggers = _single_inserts(args.inserts)
+        conn = db.get_connection()
+        triggers = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'statistics_%'")]
+        with db.transaction() as conn:
+            for name in triggers:
+                conn.execute(f"DROP TRIGGER {name}")
+        without_triggers = _single_inserts(args.inserts)
+        print(f"单条写入: 有计数触发器 {with_triggers:.0f}us，无触发器 {without_triggers:.0f}us")
+
+        rebuild_ms = _time_ms(db.rebuild_statistics, 1)
+        print(f"rebuild_statistics 重建耗时 {rebuild_ms / 1000:.1f}s")
+        db.close_connection(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""并发推理基准测试
+
+模拟多个会话同时提交单张图像：对比各线程直接调用predict与通过InferenceScheduler
+合并批次两种方式的总吞吐量。
+
+用法:
+    python -m benchmarks.inference_queue --clients 8 --requests 4
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import torch
+
+from model import predict
+from inference_queue import InferenceScheduler
+from benchmarks.common import build_random_model, make_images
+
+def run_clients(clients, requests_per_client, images, call):
+    """启动多个并发客户端，返回全部请求完成的总耗时（秒）"""
+    def client(index):
+        for i in range(requests_per_client):
+            call(images[(index + i) % len(images)])
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(client, range(clients)))
+    return time.perf_counter() - start_time
+
+def main():
+    parser = argparse.ArgumentParser(description="跨会话微批推理基准测试")
+    parser.add_argument('--clients', type=int, default=8, help="并发客户端数量")
+    parser.add_argument('--requests', type=int, default=4, help="每个客户端的请求数")
+    parser.add_argument('--max-batch', type=int, default=16, help="调度器最大批大小")
+    parser.add_argument('--max-wait-ms', type=float, default=5, help="调度器最长等待时间（毫秒）")
+    args = parser.parse_args()
+
+    device = torch.device('cpu')
+    model = build_random_model(device)
+    images = make_images(args.clients)
+    total = args.clients * args.requests
+
+    # 预热
+    predict(model, images[0], device)
+
+    elapsed = run_clients(args.clients, args.requests, images, lambda image: predict(model, image, device))
+    print(f"直接predict:   {elapsed:.3f}s, {total / elapsed:.2f} 张/秒")
+
+    scheduler = InferenceScheduler(model, device, max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+    try:
+        elapsed = run_clients(args.clients, args.requests, images, scheduler.submit)
+        stats = scheduler.stats()
+        print(f"微批调度器:    {elapsed:.3f}s, {total / elapsed:.2f} 张/秒, 平均批大小 {stats['avg_batch_size']:.2f}")
+    finally:
+        scheduler.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""模型加载峰值内存对比
+
+每种加载方式在独立子进程中运行，读取子进程的峰值RSS（ru_maxrss）：
+- legacy:      旧流程，先构建随机权重模型再torch.load，内存中同时存在两份权重
+- pth:         meta设备构建结构，直接挂载torch.load读出的张量
+- safetensors: meta设备构建结构，直接挂载内存映射的safetensors张量
+另外给出仅导入torch与模型代码的baseline，便于扣除解释器和库本身的占用。
+
+用法:
+    python -m benchmarks.load_memory --model-path best_model.pth
+    python -m benchmarks.load_memory          # 使用随机权重生成临时文件
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+MODES = ('baseline', 'legacy', 'pth', 'safetensors')
+
+def _child(mode, path):
+    """子进程：按指定方式加载模型并执行一次推理，最后输出本进程峰值RSS（KB）"""
+    import torch
+    from model import EfficientHybrid, load_model
+
+    if mode == 'baseline':
+        print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+        return
+    if mode == 'legacy':
+        model = EfficientHybrid()
+        state_dict = torch.load(path, map_location='cpu')
+        model.load_state_dict(state_dict)
+        del state_dict
+        model.eval()
+    else:
+        model, _ = load_model(path)
+    with torch.no_grad():
+        model(torch.randn(1, 3, 160, 160))
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+def measure_peak_rss_mb(mode, path):
+    """在子进程中运行加载流程，返回峰值RSS（MB）"""
+    completed = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.load_memory', '--child', mode, path],
+        check=True, capture_output=True, text=True
+    )
+    return int(completed.stdout.strip().splitlines()[-1]) / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="模型加载峰值内存对比")
+    parser.add_argument('--model-path', default=None, help=".pth权重路径，省略时用随机权重生成临时文件")
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(*args.child)
+        return
+
+    import torch
+    from benchmarks.common import build_random_model
+    from utils.weights import save_safetensors
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pth_path = args.model_path
+        if pth_path is None:
+            pth_path = os.path.join(temp_dir, 'random_model.pth')
+            torch.save(build_random_model().state_dict(), pth_path)
+        safetensors_path = os.path.join(temp_dir, 'model.safetensors')
+        save_safetensors(torch.load(pth_path, map_location='cpu'), safetensors_path)
+
+        paths = {'baseline': pth_path, 'legacy': pth_path, 'pth': pth_path, 'safetensors': safetensors_path}
+        print(f"{'加载方式':<14}{'峰值RSS(MB)':>14}")
+        for mode in MODES:
+            print(f"{mode:<14}{measure_peak_rss_mb(mode, paths[mode]):>14.1f}")
+
+if __name__ == '__main__':
+    main()
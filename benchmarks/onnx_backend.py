@@ -0,0 +1,63 @@
+"""ONNX Runtime后端基准测试与等价性检查
+
+将随机权重的EfficientHybrid导出为ONNX，对比PyTorch后端与ONNX Runtime后端在不同批大小下的延迟，
+并在同一批图像上检查两者的top-k结果是否一致（top-1一致率、top-k集合一致率和概率最大差值）。
+
+用法:
+    python -m benchmarks.onnx_backend --batch-sizes 1 8 --images 32
+"""
+import argparse
+import os
+import tempfile
+import torch
+
+from model import TorchBackend, OnnxBackend, export_onnx, batch_predict
+from benchmarks.common import build_random_model, make_images, measure
+
+def compare_topk(reference, candidate):
+    """比较两组batch_predict结果，返回top-1一致率、top-k集合一致率和概率最大差值（百分点）"""
+    top1 = sum(a[0]['class_id'] == b[0]['class_id'] for a, b in zip(reference, candidate))
+    topk = sum({p['class_id'] for p in a} == {p['class_id'] for p in b} for a, b in zip(reference, candidate))
+    max_diff = max(abs(p['probability'] - q['probability'])
+                   for a, b in zip(reference, candidate) for p, q in zip(a, b))
+    return top1 / len(reference), topk / len(reference), max_diff
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX Runtime后端基准测试与等价性检查")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8], help="测试的批次大小")
+    parser.add_argument('--images', type=int, default=32, help="等价性检查使用的图像数量")
+    parser.add_argument('--top-k', type=int, default=5, help="比较的top-k")
+    parser.add_argument('--threads', type=int, default=None, help="两个后端使用的线程数，默认不设置")
+    parser.add_argument('--repeat', type=int, default=5, help="每种配置的计时次数")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    device = torch.device('cpu')
+    model = build_random_model(device)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        onnx_path = os.path.join(temp_dir, 'efficient_hybrid.onnx')
+        export_onnx(model, onnx_path)
+        print(f"ONNX模型大小: {os.path.getsize(onnx_path) / 1024 / 1024:.1f} MB")
+        backends = {'torch': TorchBackend(model, device), 'onnx': OnnxBackend(onnx_path, args.threads)}
+
+        images = make_images(args.images)
+        outputs = {name: batch_predict(backend, images, device, top_k=args.top_k) for name, backend in backends.items()}
+        top1, topk, max_diff = compare_topk(outputs['torch'], outputs['onnx'])
+        print(f"等价性: top-1一致率 {top1 * 100:.1f}%, top-{args.top_k}集合一致率 {topk * 100:.1f}%, "
+              f"概率最大差值 {max_diff:.3f} 个百分点")
+
+        print(f"{'批大小':<8}{'torch(ms)':>12}{'onnx(ms)':>12}{'加速比':>10}")
+        for batch_size in args.batch_sizes:
+            x = torch.randn(batch_size, 3, 160, 160)
+            latencies = {name: min(measure(lambda: backend(x), repeat=args.repeat)) * 1000
+                         for name, backend in backends.items()}
+            print(f"{batch_size:<8}{latencies['torch']:>12.1f}{latencies['onnx']:>12.1f}"
+                  f"{latencies['torch'] / latencies['onnx']:>10.2f}")
+
+    if top1 < 1.0:
+        raise SystemExit("ONNX后端与PyTorch后端的top-1结果不一致")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""图像解码与预处理基准测试
+
+对比torchvision参考转换（完整解码）与快速预处理路径（JPEG缩小解码 + 批量归一化）
+的单张耗时，并检查两者输出差异是否在容差范围内。测试图像包括data/categories下的
+真实照片和指定尺寸的合成照片。
+
+用法:
+    python -m benchmarks.preprocess
+    python -m benchmarks.preprocess --images photos/*.jpg --sizes 1000x750 4000x3000 8000x6000
+"""
+import argparse
+import glob
+import os
+
+from model import preprocess_image
+from benchmarks.common import make_photo_jpeg, measure
+
+# 快速路径与参考转换的容差（归一化后的数值）
+MEAN_ABS_TOLERANCE = 0.05
+MAX_ABS_TOLERANCE = 0.5
+
+# 默认使用的真实照片
+DEFAULT_IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'data', 'categories', '*', '*.jpg')
+
+def main():
+    parser = argparse.ArgumentParser(description="图像解码与预处理基准测试")
+    parser.add_argument('--images', nargs='*', default=None, help="真实照片路径，默认为data/categories下的JPEG")
+    parser.add_argument('--sizes', nargs='*', default=['1000x750', '4000x3000', '8000x6000'], help="合成照片尺寸，格式为宽x高")
+    parser.add_argument('--repeat', type=int, default=3, help="每种配置的计时次数")
+    args = parser.parse_args()
+
+    cases = []
+    for path in sorted(glob.glob(DEFAULT_IMAGES)) if args.images is None else args.images:
+        with open(path, 'rb') as f:
+            cases.append((os.path.basename(path)[:24], f.read()))
+    for size in args.sizes:
+        width, height = (int(v) for v in size.split('x'))
+        cases.append((f"合成 {size}", make_photo_jpeg(width, height)))
+
+    print(f"{'图像':<28}{'参考(ms)':>10}{'快速(ms)':>10}{'加速比':>8}{'平均误差':>10}{'最大误差':>10}")
+    failed = False
+    for name, data in cases:
+        reference = preprocess_image(data, fast=False)
+        fast = preprocess_image(data)
+        mean_error = (reference - fast).abs().mean().item()
+        max_error = (reference - fast).abs().max().item()
+        failed |= mean_error > MEAN_ABS_TOLERANCE or max_error > MAX_ABS_TOLERANCE
+
+        reference_time = min(measure(lambda: preprocess_image(data, fast=False), repeat=args.repeat)) * 1000
+        fast_time = min(measure(lambda: preprocess_image(data), repeat=args.repeat)) * 1000
+        print(f"{name:<28}{reference_time:>10.1f}{fast_time:>10.1f}{reference_time / fast_time:>8.1f}{mean_error:>10.4f}{max_error:>10.4f}")
+
+    if failed:
+        raise SystemExit(f"快速预处理超出容差（平均 {MEAN_ABS_TOLERANCE}，最大 {MAX_ABS_TOLERANCE}）")
+    print("快速预处理输出在容差范围内")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""INT8动态量化精度与性能报告
+
+在本地带标签的图像集（默认data/categories，子目录名即类别）上对比fp32与INT8模型：
+top-1一致率、各自对目录标签的准确率、top-1概率平均偏差、单张延迟以及模型文件大小。
+
+用法:
+    python -m benchmarks.quantization_report --model-path best_model.pth
+"""
+import argparse
+import copy
+import io
+import os
+import time
+import torch
+from PIL import Image
+
+from model import CIFAR100_CLASSES, load_model, quantize_model, preprocess_batch
+from utils.image_utils import list_labeled_images
+from benchmarks.common import build_random_model
+
+def serialized_size_mb(model):
+    """模型序列化后的大小（MB）"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 1024 / 1024
+
+@torch.no_grad()
+def evaluate(model, batch):
+    """返回softmax概率和单张平均延迟（毫秒）"""
+    start_time = time.perf_counter()
+    probabilities = torch.cat([
+        torch.nn.functional.softmax(model(batch[i:i + 1]), dim=1) for i in range(len(batch))
+    ])
+    latency = (time.perf_counter() - start_time) * 1000 / len(batch)
+    return probabilities, latency
+
+def main():
+    default_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'categories')
+    parser = argparse.ArgumentParser(description="INT8动态量化精度与性能报告")
+    parser.add_argument('--model-path', default=None, help="fp32权重路径，省略时使用随机权重")
+    parser.add_argument('--image-dir', default=default_dir, help="按类别子目录组织的图像集")
+    args = parser.parse_args()
+
+    device = torch.device('cpu')
+    if args.model_path:
+        fp32_model, _ = load_model(args.model_path, device)
+    else:
+        print("未指定权重，使用随机权重（仅用于验证流程，精度指标无意义）")
+        fp32_model = build_random_model(device)
+    # 复制一份再量化，避免影响fp32基准
+    int8_model = quantize_model(copy.deepcopy(fp32_model))
+
+    # 只评估子目录名为CIFAR-100类别的图像
+    samples = [(path, CIFAR100_CLASSES.index(label)) for path, label in list_labeled_images(args.image_dir)
+               if label in CIFAR100_CLASSES]
+    if not samples:
+        raise SystemExit(f"未在 {args.image_dir} 中找到图像")
+    batch = preprocess_batch([Image.open(path).convert('RGB') for path, _ in samples])
+    labels = torch.tensor([label for _, label in samples])
+
+    fp32_probs, fp32_latency = evaluate(fp32_model, batch)
+    int8_probs, int8_latency = evaluate(int8_model, batch)
+    fp32_top1 = fp32_probs.argmax(dim=1)
+    int8_top1 = int8_probs.argmax(dim=1)
+
+    agreement = (fp32_top1 == int8_top1).float().mean().item() * 100
+    prob_delta = (fp32_probs.gather(1, fp32_top1[:, None]) - int8_probs.gather(1, fp32_top1[:, None])).abs().mean().item() * 100
+
+    print(f"图像数量: {len(samples)}")
+    print(f"{'指标':<24}{'fp32':>12}{'int8':>12}")
+    print(f"{'目录标签准确率(%)':<24}{(fp32_top1 == labels).float().mean().item() * 100:>12.2f}{(int8_top1 == labels).float().mean().item() * 100:>12.2f}")
+    print(f"{'单张延迟(ms)':<24}{fp32_latency:>12.1f}{int8_latency:>12.1f}")
+    print(f"{'权重大小(MB)':<24}{serialized_size_mb(fp32_model):>12.1f}{serialized_size_mb(int8_model):>12.1f}")
+    print(f"top-1一致率: {agreement:.2f}%")
+    print(f"top-1概率平均偏差: {prob_delta:.3f} 个百分点")
+
+if __name__ == '__main__':
+    main()
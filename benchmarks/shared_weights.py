@@ -0,0 +1,105 @@
+"""多进程共享权重的内存对比
+
+分别启动N个工作进程（N默认为1、2、4），每个进程加载模型并执行一次推理，全部进程就绪后
+读取各进程的RSS与PSS（按共享进程数分摊后的常驻内存，来自/proc/<pid>/smaps_rollup）：
+- copy:   每个进程用load_state_dict把权重读入自己的内存（共享前的方式）
+- shared: load_model(shared_weights=True)，第一个进程把权重写入/dev/shm，其余进程映射同一个文件
+RSS会把共享页计入每个进程，PSS之和才是主机实际占用的内存。仅支持Linux。
+
+用法:
+    python -m benchmarks.shared_weights --model-path best_model.pth
+    python -m benchmarks.shared_weights --workers 1 2 4   # 省略--model-path时使用随机权重
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+MODES = ('copy', 'shared')
+
+def _memory_mb():
+    """读取本进程的RSS与PSS（MB）"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                values[key.lower()] = int(rest.split()[0]) / 1024
+    return values
+
+def _worker(mode, path, shared_dir):
+    """工作进程：加载模型并推理一次，之后每收到一行指令就输出一次内存占用，stdin关闭时退出"""
+    import torch
+    from model import EfficientHybrid, load_model
+
+    # stdout用于与主进程通信，加载过程的输出转到stderr
+    with contextlib.redirect_stdout(sys.stderr), torch.no_grad():
+        if mode == 'copy':
+            model = EfficientHybrid()
+            model.load_state_dict(torch.load(path, map_location='cpu'))
+            model.eval()
+        else:
+            model, _ = load_model(path, shared_weights=True, shared_weights_dir=shared_dir)
+        model(torch.randn(1, 3, 160, 160))
+
+    print(json.dumps({'ready': True}), flush=True)
+    for _ in sys.stdin:
+        print(json.dumps(_memory_mb()), flush=True)
+
+def _run_workers(mode, path, count, shared_dir):
+    """依次启动count个工作进程（避免加载峰值叠加），全部就绪后读取各自的内存占用"""
+    workers = []
+    try:
+        for _ in range(count):
+            worker = subprocess.Popen(
+                [sys.executable, '-m', 'benchmarks.shared_weights', '--worker', mode, path, shared_dir],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+            )
+            workers.append(worker)
+            if not worker.stdout.readline():
+                raise RuntimeError(f"工作进程启动失败: {mode}")
+        usage = []
+        for worker in workers:
+            worker.stdin.write('measure\n')
+            worker.stdin.flush()
+            usage.append(json.loads(worker.stdout.readline()))
+        return usage
+    finally:
+        for worker in workers:
+            worker.stdin.close()
+            worker.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程共享权重的内存对比")
+    parser.add_argument('--model-path', default=None, help=".pth权重路径，省略时用随机权重生成临时文件")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="测试的工作进程数")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES), help="参与对比的加载方式")
+    parser.add_argument('--worker', nargs=3, metavar=('MODE', 'PATH', 'SHARED_DIR'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(*args.worker)
+        return
+
+    import torch
+    from benchmarks.common import build_random_model
+
+    with tempfile.TemporaryDirectory() as temp_dir, tempfile.TemporaryDirectory(dir='/dev/shm') as shared_dir:
+        path = args.model_path
+        if path is None:
+            path = os.path.join(temp_dir, 'random_model.pth')
+            torch.save(build_random_model().state_dict(), path)
+
+        print(f"{'加载方式':<10}{'进程数':<8}{'平均RSS(MB)':>14}{'平均PSS(MB)':>14}{'PSS合计(MB)':>14}")
+        for mode in args.modes:
+            for count in args.workers:
+                usage = _run_workers(mode, path, count, shared_dir)
+                rss = sum(item['rss'] for item in usage) / count
+                pss = sum(item['pss'] for item in usage)
+                print(f"{mode:<10}{count:<8}{rss:>14.1f}{pss / count:>14.1f}{pss:>14.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""推理性能基准测试套件
+
+使用随机权重构建EfficientHybrid，无需下载模型权重。覆盖preprocess_image、predict和
+batch_predict，在不同批大小、线程数、输入分辨率和精度模式下测量吞吐量、延迟百分位数
+和峰值内存，结果输出为JSON；compare子命令与保存的基线对比并标记性能回退。
+
+用法:
+    python -m benchmarks.suite run --output current.json
+    python -m benchmarks.suite run --quick --output baseline.json
+    python -m benchmarks.suite compare baseline.json current.json --threshold 0.10
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+import torch
+
+from model import predict, batch_predict, preprocess_image, quantize_model
+from benchmarks.common import build_random_model, make_photo_jpeg
+
+# 默认测试矩阵
+DEFAULT_MATRIX = {
+    'batch_sizes': [1, 4, 8, 16],
+    'threads': None,  # None表示1到CPU核数之间的2的幂
+    'resolutions': ['640x480', '4000x3000'],
+    'precisions': ['fp32', 'int8'],
+    'repeat': 10,
+}
+
+# --quick时使用的较小矩阵，便于在CI或开发机上快速运行
+QUICK_MATRIX = {
+    'batch_sizes': [1, 8],
+    'threads': None,
+    'resolutions': ['640x480'],
+    'precisions': ['fp32'],
+    'repeat': 3,
+}
+
+def _percentile(sorted_values, percent):
+    rank = max(1, int(round(percent / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def _rss_mb():
+    """当前常驻内存（MB），非Linux平台返回None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError):
+        return None
+
+def _reset_peak_rss():
+    """重置进程的峰值常驻内存（Linux的clear_refs），之后读取的VmHWM只反映重置后的峰值
+
+    Returns:
+        是否重置成功；不支持时各用例不报告峰值内存
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def _peak_rss_mb():
+    """上次重置以来的峰值常驻内存（MB），读取/proc/self/status中的VmHWM"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _time_case(func, images_per_call, repeat):
+    """多次调用func，返回延迟百分位数、吞吐量与内存信息
+    
+    峰值内存在预热前重置，只包含本用例（含预热）的分配，不受之前用例的影响。
+    """
+    peak_reset = _reset_peak_rss()
+    func()  # 预热
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start_time) * 1000)
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    return {
+        'latency_ms': {
+            'mean': mean,
+            'p50': _percentile(timings, 50),
+            'p95': _percentile(timings, 95),
+            'p99': _percentile(timings, 99),
+        },
+        'throughput': images_per_call * 1000 / mean,
+        'rss_mb': _rss_mb(),
+        'peak_rss_mb': _peak_rss_mb() if peak_reset else None,
+    }
+
+def _case_key(case):
+    """用基准名称和参数唯一标识一个测试用例"""
+    return case['name'] + '|' + json.dumps(case['params'], sort_keys=True)
+
+def run_suite(matrix):
+    """按测试矩阵运行全部基准测试，返回JSON可序列化的结果"""
+    cpu_count = os.cpu_count() or 1
+    thread_counts = matrix['threads'] or [n for n in (1, 2, 4, 8, 16, 32, 64) if n <= cpu_count]
+    device = torch.device('cpu')
+    repeat = matrix['repeat']
+
+    fp32_model = build_random_model(device)
+    models = {'fp32': fp32_model}
+    if 'int8' in matrix['precisions']:
+        models['int8'] = quantize_model(build_random_model(device))
+
+    sources = {resolution: make_photo_jpeg(*(int(v) for v in resolution.split('x')))
+               for resolution in matrix['resolutions']}
+    max_batch = max(matrix['batch_sizes'])
+
+    cases = []
+    for num_threads in thread_counts:
+        torch.set_num_threads(num_threads)
+        for resolution, data in sources.items():
+            params = {'threads': num_threads, 'resolution': resolution}
+            cases.append({'name': 'preprocess_image', 'params': params,
+                          **_time_case(lambda: preprocess_image(data), 1, repeat)})
+
+            for precision in matrix['precisions']:
+                model = models[precision]
+                params = {'threads': num_threads, 'resolution': resolution, 'precision': precision}
+                cases.append({'name': 'predict', 'params': params,
+                              **_time_case(lambda: predict(model, data, device), 1, repeat)})
+
+                images = [data] * max_batch
+                for batch_size in matrix['batch_sizes']:
+                    batch = images[:batch_size]
+                    params = {'threads': num_threads, 'resolution': resolution,
+                              'precision': precision, 'batch_size': batch_size}
+                    cases.append({'name': 'batch_predict', 'params': params,
+                                  **_time_case(lambda: batch_predict(model, batch, device, batch_size=batch_size),
+                                               batch_size, repeat)})
+                print(f"完成: threads={num_threads} resolution={resolution} precision={precision}", file=sys.stderr)
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'cpu_count': cpu_count,
+            'matrix': matrix,
+        },
+        'results': cases,
+    }
+
+def compare_results(baseline, current, threshold):
+    """对比两次结果，返回回退列表
+
+    吞吐量下降或p50延迟上升超过threshold（比例）即视为回退。
+    """
+    baseline_cases = {_case_key(case): case for case in baseline['results']}
+    regressions = []
+    for case in current['results']:
+        base = baseline_cases.get(_case_key(case))
+        if base is None:
+            continue
+        throughput_change = case['throughput'] / base['throughput'] - 1
+        latency_change = case['latency_ms']['p50'] / base['latency_ms']['p50'] - 1
+        if throughput_change < -threshold or latency_change > threshold:
+            regressions.append({
+                'name': case['name'],
+                'params': case['params'],
+                'throughput_change': throughput_change,
+                'p50_change': latency_change,
+            })
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="推理性能基准测试套件")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="运行基准测试")
+    run_parser.add_argument('--output', default=None, help="结果JSON输出路径，默认输出到标准输出")
+    run_parser.add_argument('--quick', action='store_true', help="使用较小的测试矩阵")
+    run_parser.add_argument('--batch-sizes', type=int, nargs='+', help="覆盖批大小列表")
+    run_parser.add_argument('--threads', type=int, nargs='+', help="覆盖线程数列表")
+    run_parser.add_argument('--resolutions', nargs='+', help="覆盖输入分辨率列表，格式为宽x高")
+    run_parser.add_argument('--precisions', nargs='+', choices=['fp32', 'int8'], help="覆盖精度模式列表")
+    run_parser.add_argument('--repeat', type=int, help="每个用例的计时次数")
+
+    compare_parser = subparsers.add_parser('compare', help="与基线结果对比")
+    compare_parser.add_argument('baseline', help="基线结果JSON")
+    compare_parser.add_argument('current', help="当前结果JSON")
+    compare_parser.add_argument('--threshold', type=float, default=0.10, help="判定回退的相对变化阈值")
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        matrix = dict(QUICK_MATRIX if args.quick else DEFAULT_MATRIX)
+        for key in ('batch_sizes', 'threads', 'resolutions', 'precisions', 'repeat'):
+            if getattr(args, key) is not None:
+                matrix[key] = getattr(args, key)
+        report = json.dumps(run_suite(matrix), indent=2, ensure_ascii=False)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(report)
+        else:
+            print(report)
+        return
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)
+    regressions = compare_results(baseline, current, args.threshold)
+    for regression in regressions:
+        print(f"回退: {regression['name']} {json.dumps(regression['params'], sort_keys=True)} "
+              f"吞吐量 {regression['throughput_change'] * 100:+.1f}%, p50 {regression['p50_change'] * 100:+.1f}%")
+    if regressions:
+        sys.exit(1)
+    print(f"未发现超过 {args.threshold * 100:.0f}% 的性能回退")
+
+if __name__ == '__main__':
+    main()
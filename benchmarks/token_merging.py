@@ -0,0 +1,79 @@
+"""ViT分支token合并的速度/精度报告
+
+在本地图像（默认data/categories，子目录名为类别标签）上对比原始ViT路径与不同token合并比例：
+报告每张图像的推理延迟、相对原始路径的加速比、与原始路径top-1的一致率，
+以及类别标签可识别时的top-1准确率。未指定权重文件时使用随机权重，只有延迟和一致率有参考意义。
+
+用法:
+    python -m benchmarks.token_merging --model-path best_model.pth
+    python -m benchmarks.token_merging --model-path best_model.pth --ratios 0.05 0.1 0.2 --schedules 0.3,0.3,0.3,0.3,0,0,0,0,0,0,0,0
+"""
+import argparse
+import os
+import torch
+
+from model import load_model, preprocess_batch, CIFAR100_CLASSES
+from utils.image_utils import list_labeled_images
+from utils.token_merging import token_counts
+from benchmarks.common import build_random_model, measure
+
+def _evaluate(model, batches, labels, repeat):
+    """返回每张图像的平均延迟（毫秒）和所有图像的top-1预测"""
+    predictions = []
+    seconds = 0.0
+    for batch in batches:
+        seconds += min(measure(lambda: model(batch), repeat=repeat))
+        predictions.extend(model(batch).argmax(dim=1).tolist())
+    return seconds / len(labels) * 1000, predictions
+
+@torch.no_grad()
+def main():
+    parser = argparse.ArgumentParser(description="ViT分支token合并的速度/精度报告")
+    parser.add_argument('--model-path', default=None, help="模型权重文件路径，默认使用随机权重")
+    parser.add_argument('--images', default=os.path.join('data', 'categories'), help="评估图像目录")
+    parser.add_argument('--ratios', type=float, nargs='+', default=[0.05, 0.1, 0.15, 0.2],
+                        help="所有层使用相同比例时测试的合并比例")
+    parser.add_argument('--schedules', nargs='*', default=[],
+                        help="逐层合并比例，每个配置为逗号分隔的12个数值")
+    parser.add_argument('--batch-size', type=int, default=8, help="批处理大小")
+    parser.add_argument('--repeat', type=int, default=3, help="每个批次的计时次数")
+    args = parser.parse_args()
+
+    images = list_labeled_images(args.images)
+    if not images:
+        raise SystemExit(f"{args.images} 中没有找到图像")
+    if args.model_path:
+        model, _ = load_model(args.model_path, torch.device('cpu'))
+    else:
+        print("未指定权重文件，使用随机权重（准确率无意义）")
+        model = build_random_model()
+
+    paths = [path for path, _ in images]
+    labels = [CIFAR100_CLASSES.index(label) if label in CIFAR100_CLASSES else None for _, label in images]
+    batches = [preprocess_batch(paths[i:i + args.batch_size]) for i in range(0, len(paths), args.batch_size)]
+    num_tokens = model.vit.patch_embed.num_patches + 1
+    depth = len(model.vit.blocks)
+
+    configs = [('stock', None)] + [(f"r={ratio:g}", ratio) for ratio in args.ratios]
+    configs += [(f"schedule{index + 1}", [float(value) for value in schedule.split(',')])
+                for index, schedule in enumerate(args.schedules)]
+
+    print(f"评估图像 {len(paths)} 张，ViT共 {depth} 层、{num_tokens} 个token")
+    print(f"{'配置':<14}{'末层token':>10}{'延迟(ms/张)':>14}{'加速比':>8}{'一致率':>10}{'准确率':>10}")
+    labeled = [index for index, label in enumerate(labels) if label is not None]
+    stock_latency = stock_predictions = None
+    for name, ratios in configs:
+        model.set_token_merging(ratios)
+        latency, predictions = _evaluate(model, batches, labels, args.repeat)
+        if stock_predictions is None:
+            stock_latency, stock_predictions = latency, predictions
+        agreement = sum(a == b for a, b in zip(predictions, stock_predictions)) / len(predictions)
+        accuracy = (f"{sum(predictions[i] == labels[i] for i in labeled) / len(labeled) * 100:.1f}%"
+                    if labeled else '-')
+        final_tokens = token_counts(ratios, num_tokens, depth)[-1] if ratios else num_tokens
+        print(f"{name:<14}{final_tokens:>10}{latency:>14.1f}{stock_latency / latency:>8.2f}"
+              f"{agreement * 100:>9.1f}%{accuracy:>10}")
+    model.set_token_merging(None)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import streamlit as st
+import pandas as pd
+from utils.timing import latency_recorder, STAGES
+from model import cascade_stats
+
+# 阶段名称的中文说明
+STAGE_LABELS = {
+    'upload_validation': '上传校验',
+    'file_save': '文件保存',
+    'decode': '图像解码',
+    'preprocess': '预处理',
+    'forward': '模型推理',
+    'topk_format': 'Top-K格式化',
+    'save_prediction': '保存记录',
+    'render': '结果渲染',
+    'load_model': '模型加载',
+}
+
+def show_latency_diagnostics():
+    """显示请求链路各阶段的延迟统计（p50/p95/p99）"""
+    summary = latency_recorder.summary()
+    if not summary:
+        st.info("暂无耗时数据，完成一次分类后再查看。")
+        return
+    
+    # 先按链路顺序展示已知阶段，再展示其他阶段
+    ordered = [name for name in STAGES if name in summary]
+    ordered += sorted(name for name in summary if name not in STAGES)
+    
+    rows = []
+    for name in ordered:
+        stats = summary[name]
+        rows.append({
+            '阶段': STAGE_LABELS.get(name, name),
+            '次数': stats['count'],
+            '平均(ms)': round(stats['mean'], 1),
+            'p50(ms)': round(stats['p50'], 1),
+            'p95(ms)': round(stats['p95'], 1),
+            'p99(ms)': round(stats['p99'], 1),
+            '最大(ms)': round(stats['max'], 1),
+        })
+    
+    st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+    st.caption("统计基于每个阶段最近的样本；结果渲染包含保存记录的耗时。")
+    
+    show_cascade_stats()
+    
+    if st.button("重置统计", key="reset_latency_stats"):
+        latency_recorder.reset()
+        cascade_stats.reset()
+        st.rerun()
+
+def show_cascade_stats():
+    """显示级联推理的提前退出率与估算节省的延迟"""
+    summary = cascade_stats.summary()
+    if not summary['samples']:
+        return
+    
+    columns = st.columns(2)
+    columns[0].metric("提前退出率", f"{summary['exit_rate'] * 100:.1f}%",
+                      help=f"{summary['exits']} / {summary['samples']} 张图像仅使用ConvNeXt分支")
+    if summary['saved_ms'] is not None:
+        columns[1].metric("估算节省", f"{summary['saved_ms'] / 1000:.1f} s",
+                          help=f"ViT分支与融合层平均每张 {summary['full_branch_ms_per_sample']:.1f} ms")
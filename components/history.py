@@ -4,18 +4,15 @@ import os
 from datetime import datetime
 import json
 import plotly.express as px
-import sqlite3
 from utils.db import (
-    get_history, delete_record, clear_history, get_history_count, 
+    get_history_page, delete_record, clear_history, get_history_count, 
     batch_delete_records, get_class_statistics, get_categories,
-    get_history_by_category, get_history_count_by_category
+    get_history_by_category, get_history_count_by_category, get_record,
+    get_daily_counts, get_feedback_statistics
 )
 import html
 from utils.styles import tooltip_css, feedback_css
 
-# 导入数据库路径常量
-from utils.db import DB_PATH
-
 def show_history():
     """显示历史记录页面，包含搜索、筛选和详情查看功能"""
     # 添加自定义CSS，为长文本创建更好的工具提示效果
@@ -126,7 +123,8 @@ def show_category_browser(category):
     col1, col2, col3 = st.columns([2, 1, 1])
     
     with col1:
-        search = st.text_input("🔍 搜索记录", value=st.session_state.search_term, key="category_search")
+        search = st.text_input("🔍 搜索记录", value=st.session_state.search_term, key="category_search",
+                               help="按前缀匹配类别的中英文名称和反馈内容，多个词以空格分隔")
         if search != st.session_state.search_term:
             st.session_state.search_term = search
             st.session_state.page = 0  # 重置页码
@@ -134,7 +132,9 @@ def show_category_browser(category):
     with col2:
         sort_options = {
             "timestamp": "时间",
-            "id": "ID"
+            "id": "ID",
+            "probability": "置信度",
+            "relevance": "相关度"
         }
         sort_by = st.selectbox(
             "排序依据", 
@@ -179,9 +179,14 @@ def show_category_browser(category):
             st.warning(f"确定要删除全部「{category}」类别记录吗？此操作不可撤销！")
             delete_confirm = st.button("确认删除", key="confirm_delete_category")
             if delete_confirm:
-                # 获取该类别所有记录ID
-                all_records = get_history_by_category(category, limit=10000)
-                record_ids = [r['id'] for r in all_records]
+                # 按游标逐页获取该类别所有记录ID
+                record_ids = []
+                cursor = None
+                while True:
+                    records, cursor = get_history_by_category(category, limit=1000, cursor=cursor)
+                    record_ids.extend(r['id'] for r in records)
+                    if cursor is None:
+                        break
                 if record_ids:
                     deleted = batch_delete_records(record_ids)
                     st.success(f"已删除 {deleted} 条「{category}」类别记录")
@@ -205,9 +210,18 @@ def show_category_browser(category):
     total_pages = (total_records - 1) // st.session_state.records_per_page + 1
     col1, col2, col3 = st.columns([1, 2, 1])
     
+    query = dict(
+        search_term=st.session_state.search_term,
+        sort_by=st.session_state.sort_by,
+        sort_order=st.session_state.sort_order,
+        category=category,
+        limit=st.session_state.records_per_page
+    )
+    pager = _cursor_pager("category_pager", query)
+    
     with col1:
         if st.button("◀️ 上一页", disabled=st.session_state.page <= 0, key="prev_category"):
-            st.session_state.page -= 1
+            _prev_page(pager)
             st.rerun()
     
     with col2:
@@ -215,29 +229,22 @@ def show_category_browser(category):
     
     with col3:
         if st.button("下一页 ▶️", disabled=st.session_state.page >= total_pages - 1, key="next_category"):
-            st.session_state.page += 1
+            _next_page(pager)
             st.rerun()
     
-    # 每页显示记录数
-    st.session_state.records_per_page = st.select_slider(
+    # 每页显示记录数，修改后重新运行，分页从第一页开始
+    records_per_page = st.select_slider(
         "每页显示记录数", 
         options=[10, 20, 50, 100],
         value=st.session_state.records_per_page,
         key="records_per_page_category"
     )
-    
-    # 计算偏移量
-    offset = st.session_state.page * st.session_state.records_per_page
+    if records_per_page != st.session_state.records_per_page:
+        st.session_state.records_per_page = records_per_page
+        st.rerun()
     
     # 获取历史记录
-    history = get_history(
-        limit=st.session_state.records_per_page,
-        offset=offset,
-        search_term=st.session_state.search_term,
-        sort_by=st.session_state.sort_by,
-        sort_order=st.session_state.sort_order,
-        category=category
-    )
+    history = _fetch_page(pager)
     
     # 显示历史记录表格
     display_history_table(history)
@@ -273,9 +280,12 @@ def show_category_gallery(category):
     total_pages = (total_records - 1) // st.session_state.gallery_per_page + 1
     col1, col2, col3 = st.columns([1, 2, 1])
     
+    pager = _cursor_pager("gallery_pager", dict(sort_by="timestamp", sort_order="DESC", category=category,
+                                                limit=st.session_state.gallery_per_page))
+    
     with col1:
         if st.button("◀️ 上一页", disabled=st.session_state.page <= 0, key=f"gallery_prev_{category}"):
-            st.session_state.page -= 1
+            _prev_page(pager)
             st.rerun()
     
     with col2:
@@ -283,20 +293,11 @@ def show_category_gallery(category):
     
     with col3:
         if st.button("下一页 ▶️", disabled=st.session_state.page >= total_pages - 1, key=f"gallery_next_{category}"):
-            st.session_state.page += 1
+            _next_page(pager)
             st.rerun()
     
-    # 计算偏移量
-    offset = st.session_state.page * st.session_state.gallery_per_page
-    
     # 获取历史记录
-    history = get_history(
-        limit=st.session_state.gallery_per_page,
-        offset=offset,
-        sort_by="timestamp",
-        sort_order="DESC",
-        category=category
-    )
+    history = _fetch_page(pager)
     
     if not history:
         st.warning("无法加载图片")
@@ -356,22 +357,12 @@ def show_category_gallery(category):
 def show_record_detail(record_id):
     """显示记录详情"""
     # 获取记录详情
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM prediction_history WHERE id = ?", (record_id,))
-    row = cursor.fetchone()
+    record = get_record(record_id)
     
-    if not row:
+    if not record:
         st.error(f"找不到ID为 {record_id} 的记录")
         return
     
-    record = dict(row)
-    record['prediction_result'] = json.loads(record['prediction_result'])
-    
-    conn.close()
-    
     # 显示详情对话框
     with st.expander("图片详情", expanded=True):
         col1, col2 = st.columns([1, 2])
@@ -467,7 +458,8 @@ def show_all_history():
     col1, col2, col3 = st.columns([2, 1, 1])
     
     with col1:
-        search = st.text_input("🔍 搜索记录", value=st.session_state.search_term)
+        search = st.text_input("🔍 搜索记录", value=st.session_state.search_term,
+                               help="按前缀匹配类别的中英文名称和反馈内容，多个词以空格分隔")
         if search != st.session_state.search_term:
             st.session_state.search_term = search
             st.session_state.page = 0  # 重置页码
@@ -475,7 +467,9 @@ def show_all_history():
     with col2:
         sort_options = {
             "timestamp": "时间",
-            "id": "ID"
+            "id": "ID",
+            "probability": "置信度",
+            "relevance": "相关度"
         }
         sort_by = st.selectbox(
             "排序依据", 
@@ -540,9 +534,17 @@ def show_all_history():
     total_pages = (total_records - 1) // st.session_state.records_per_page + 1
     col1, col2, col3 = st.columns([1, 2, 1])
     
+    query = dict(
+        search_term=st.session_state.search_term,
+        sort_by=st.session_state.sort_by,
+        sort_order=st.session_state.sort_order,
+        limit=st.session_state.records_per_page
+    )
+    pager = _cursor_pager("history_pager", query)
+    
     with col1:
         if st.button("◀️ 上一页", disabled=st.session_state.page <= 0):
-            st.session_state.page -= 1
+            _prev_page(pager)
             st.rerun()
     
     with col2:
@@ -550,27 +552,21 @@ def show_all_history():
     
     with col3:
         if st.button("下一页 ▶️", disabled=st.session_state.page >= total_pages - 1):
-            st.session_state.page += 1
+            _next_page(pager)
             st.rerun()
     
-    # 每页显示记录数
-    st.session_state.records_per_page = st.select_slider(
+    # 每页显示记录数，修改后重新运行，分页从第一页开始
+    records_per_page = st.select_slider(
         "每页显示记录数", 
         options=[10, 20, 50, 100],
         value=st.session_state.records_per_page
     )
-    
-    # 计算偏移量
-    offset = st.session_state.page * st.session_state.records_per_page
+    if records_per_page != st.session_state.records_per_page:
+        st.session_state.records_per_page = records_per_page
+        st.rerun()
     
     # 获取历史记录
-    history = get_history(
-        limit=st.session_state.records_per_page,
-        offset=offset,
-        search_term=st.session_state.search_term,
-        sort_by=st.session_state.sort_by,
-        sort_order=st.session_state.sort_order
-    )
+    history = _fetch_page(pager)
     
     # 显示历史记录表格
     display_history_table(history)
@@ -579,6 +575,44 @@ def show_all_history():
     with st.expander("📊 预测统计"):
         history_statistics()
 
+def _cursor_pager(key, query):
+    """获取游标分页状态
+    
+    cursors是已访问页的游标栈（第一页为None），栈顶对应当前页；next是当前页之后的游标。
+    查询条件或每页记录数变化、页码被其他操作重置时，回到第一页。
+    
+    Args:
+        key: 会话状态中的键
+        query: 传给get_history_page的筛选、排序参数和每页记录数(limit)
+    """
+    pager = st.session_state.get(key)
+    if pager is None or pager['query'] != query or len(pager['cursors']) != st.session_state.page + 1:
+        pager = {'query': query, 'cursors': [None], 'next': None}
+        st.session_state[key] = pager
+        st.session_state.page = 0
+    return pager
+
+def _fetch_page(pager):
+    """获取当前页的记录，并记下下一页的游标"""
+    history, pager['next'] = get_history_page(cursor=pager['cursors'][-1], **pager['query'])
+    return history
+
+def _next_page(pager):
+    """翻到下一页，把下一页的游标压入栈"""
+    if pager['next'] is None:
+        _fetch_page(pager)
+    if pager['next'] is not None:
+        pager['cursors'].append(pager['next'])
+        pager['next'] = None
+        st.session_state.page += 1
+
+def _prev_page(pager):
+    """回到上一页，弹出当前页的游标"""
+    if len(pager['cursors']) > 1:
+        pager['cursors'].pop()
+        pager['next'] = None
+        st.session_state.page -= 1
+
 def display_history_table(history):
     """显示历史记录表格"""
     # 转换数据为表格显示
@@ -898,20 +932,13 @@ def show_category_statistics(category):
         percentage = (count / total_count) * 100
         st.write(f"该类别占总记录的 {percentage:.2f}%")
     
-    # 获取该类别的所有记录
-    records = get_history_by_category(category, limit=1000)
-    
     # 统计反馈情况
-    feedback_counts = {}
-    for record in records:
-        if record['feedback']:
-            feedback = record['feedback']
-            feedback_counts[feedback] = feedback_counts.get(feedback, 0) + 1
+    feedback_counts = get_feedback_statistics(category)
     
     if feedback_counts:
         st.subheader("反馈统计")
         feedback_df = pd.DataFrame(
-            [(fb, cnt) for fb, cnt in feedback_counts.items()], 
+            feedback_counts, 
             columns=["反馈内容", "次数"]
         )
         
@@ -985,6 +1012,19 @@ def history_statistics():
     # 显示统计数据表格
     st.subheader("详细统计数据")
     st.dataframe(display_df, use_container_width=True)
+    
+    # 每日预测数量趋势
+    daily_counts = get_daily_counts(days=90)
+    if daily_counts:
+        daily_df = pd.DataFrame(daily_counts, columns=["日期", "次数"])
+        daily_fig = px.line(
+            daily_df,
+            x="日期",
+            y="次数",
+            title="每日预测数量（最近90天）",
+            markers=True
+        )
+        st.plotly_chart(daily_fig, use_container_width=True)
 
 def browse_category(category):
     """浏览特定类别的图片（设置重定向）"""
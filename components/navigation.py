@@ -1,109 +1,6 @@
 import streamlit as st
 from model import CIFAR100_CLASSES
-
-# 添加中英文映射字典
-CIFAR100_CHINESE_MAPPING = {
-    'apple': '苹果',
-    'aquarium_fish': '观赏鱼',
-    'baby': '婴儿',
-    'bear': '熊',
-    'beaver': '海狸',
-    'bed': '床',
-    'bee': '蜜蜂',
-    'beetle': '甲虫',
-    'bicycle': '自行车',
-    'bottle': '瓶子',
-    'bowl': '碗',
-    'boy': '男孩',
-    'bridge': '桥',
-    'bus': '公交车',
-    'butterfly': '蝴蝶',
-    'camel': '骆驼',
-    'can': '罐头',
-    'castle': '城堡',
-    'caterpillar': '毛毛虫',
-    'cattle': '牛',
-    'chair': '椅子',
-    'chimpanzee': '黑猩猩',
-    'clock': '时钟',
-    'cloud': '云',
-    'cockroach': '蟑螂',
-    'couch': '沙发',
-    'crab': '螃蟹',
-    'crocodile': '鳄鱼',
-    'cup': '杯子',
-    'dinosaur': '恐龙',
-    'dolphin': '海豚',
-    'elephant': '大象',
-    'flatfish': '比目鱼',
-    'forest': '森林',
-    'fox': '狐狸',
-    'girl': '女孩',
-    'hamster': '仓鼠',
-    'house': '房子',
-    'kangaroo': '袋鼠',
-    'keyboard': '键盘',
-    'lamp': '台灯',
-    'lawn_mower': '割草机',
-    'leopard': '豹子',
-    'lion': '狮子',
-    'lizard': '蜥蜴',
-    'lobster': '龙虾',
-    'man': '男人',
-    'maple_tree': '枫树',
-    'motorcycle': '摩托车',
-    'mountain': '山',
-    'mouse': '老鼠',
-    'mushroom': '蘑菇',
-    'oak_tree': '橡树',
-    'orange': '橙子',
-    'orchid': '兰花',
-    'otter': '水獭',
-    'palm_tree': '棕榈树',
-    'pear': '梨',
-    'pickup_truck': '皮卡车',
-    'pine_tree': '松树',
-    'plain': '平原',
-    'plate': '盘子',
-    'poppy': '罂粟花',
-    'porcupine': '豪猪',
-    'possum': '负鼠',
-    'rabbit': '兔子',
-    'raccoon': '浣熊',
-    'ray': '鳐鱼',
-    'road': '道路',
-    'rocket': '火箭',
-    'rose': '玫瑰',
-    'sea': '海洋',
-    'seal': '海豹',
-    'shark': '鲨鱼',
-    'shrew': '鼩鼱',
-    'skunk': '臭鼬',
-    'skyscraper': '摩天大楼',
-    'snail': '蜗牛',
-    'snake': '蛇',
-    'spider': '蜘蛛',
-    'squirrel': '松鼠',
-    'streetcar': '有轨电车',
-    'sunflower': '向日葵',
-    'sweet_pepper': '甜椒',
-    'table': '桌子',
-    'tank': '坦克',
-    'telephone': '电话',
-    'television': '电视',
-    'tiger': '老虎',
-    'tractor': '拖拉机',
-    'train': '火车',
-    'trout': '鳟鱼',
-    'tulip': '郁金香',
-    'turtle': '乌龟',
-    'wardrobe': '衣柜',
-    'whale': '鲸鱼',
-    'willow_tree': '柳树',
-    'wolf': '狼',
-    'woman': '女人',
-    'worm': '蠕虫'
-}
+from utils.class_names import CIFAR100_CHINESE_MAPPING
 
 # 反向映射，用于中文搜索
 CIFAR100_REVERSE_MAPPING = {v: k for k, v in CIFAR100_CHINESE_MAPPING.items()}
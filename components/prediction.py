@@ -7,7 +7,6 @@ import os
 import pandas as pd
 from PIL import Image
 from datetime import datetime
-from utils.db import save_prediction
 from utils.image_utils import get_image_exif
 from utils.styles import get_result_card_style, get_batch_result_header
 
@@ -19,17 +18,11 @@ def display_prediction_result(image_path, prediction_result):
     Args:
         image_path: 图片路径
         prediction_result: 预测结果列表，包含类别和概率
-        
-    Returns:
-        int: 记录ID
     """
     if not prediction_result:
         st.error("❌ 预测失败，无法获取结果")
         return
     
-    # 保存预测结果到数据库
-    record_id = save_prediction(image_path, prediction_result)
-    
     # 只获取最可能的结果
     top_result = prediction_result[0]
     
@@ -207,8 +200,6 @@ def display_prediction_result(image_path, prediction_result):
         <p style="margin: 0;">您可以在"历史记录"页面中查看此分类记录，或使用"数据导出"功能导出分析结果。</p>
     </div>
     """, unsafe_allow_html=True)
-    
-    return record_id
 
 def display_batch_predictions(image_paths, batch_results):
     """显示多张图片的预测结果
@@ -218,25 +209,18 @@ def display_batch_predictions(image_paths, batch_results):
     Args:
         image_paths: 图片路径列表
         batch_results: 预测结果列表
-        
-    Returns:
-        list: 记录ID列表
     """
     if not batch_results or len(batch_results) != len(image_paths):
         st.error("❌ 批量预测失败，结果数量与图片数量不匹配")
-        return []
+        return
     
     # 标题
     st.markdown("### 📊 批量分类结果")
     
-    # 保存所有预测结果
-    record_ids = []
     top_classes = []
     top_probabilities = []
     
-    for img_path, result in zip(image_paths, batch_results):
-        record_id = save_prediction(img_path, result)
-        record_ids.append(record_id)
+    for result in batch_results:
         top_classes.append(result[0]['class_name'])
         top_probabilities.append(result[0]['probability'])
     
@@ -381,6 +365,4 @@ def display_batch_predictions(image_paths, batch_results):
     <div style="background-color: #f5f5f5; padding: 10px; border-radius: 5px; margin-top: 20px;">
         <p style="margin: 0;">批量分类结果已保存到历史记录中。您可以在"历史记录"页面查看所有分类，或使用"数据导出"功能导出分析结果。</p>
     </div>
-    """, unsafe_allow_html=True)
-    
-    return record_ids 
\ No newline at end of file
+    """, unsafe_allow_html=True)
\ No newline at end of file
@@ -0,0 +1,170 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+
+from model import preprocess_image, _topk_results
+from utils.timing import stage
+
+class QueueFullError(RuntimeError):
+    """推理队列已满时抛出，用于向调用方施加背压"""
+
+class _InferenceRequest:
+    """单个推理请求：预处理后的张量、top-k设置和结果Future"""
+    __slots__ = ('tensor', 'top_k', 'future')
+
+    def __init__(self, tensor, top_k):
+        self.tensor = tensor
+        self.top_k = top_k
+        self.future = Future()
+
+class InferenceScheduler:
+    """跨会话的动态微批推理调度器
+
+    所有会话将请求提交到同一个有界队列，后台线程在max_wait_ms内或凑满
+    max_batch_size后合并为一个批次，执行一次前向传播，再把各自的top-k结果
+    分发给对应的调用方。
+    """
+
+    def __init__(self, model, device, max_batch_size=16, max_wait_ms=5, max_queue_size=64):
+        """
+        Args:
+            model: 预训练模型或推理后端（TorchBackend、OnnxBackend）
+            device: 计算设备
+            max_batch_size: 单个批次的最大请求数
+            max_wait_ms: 收到第一个请求后等待更多请求的最长时间（毫秒）
+            max_queue_size: 等待队列容量，队列满时提交会阻塞或失败
+        """
+        self.model = model
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stopped = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'batches': 0, 'rejected': 0}
+
+        self._worker = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, image, top_k=5, timeout=None):
+        """提交一张图像并等待预测结果
+
+        预处理在调用方线程中完成，只有前向传播在调度线程中合并执行。
+
+        Args:
+            image: PIL.Image或二进制图像数据
+            top_k: 返回前k个预测结果
+            timeout: 等待入队的最长时间（秒），None表示一直等待
+
+        Returns:
+            预测结果列表，格式与predict相同
+        """
+        return self.submit_async(image, top_k, timeout).result()
+
+    def submit_async(self, image, top_k=5, timeout=None):
+        """提交一张图像，立即返回结果Future
+
+        Args:
+            image: PIL.Image或二进制图像数据
+            top_k: 返回前k个预测结果
+            timeout: 等待入队的最长时间（秒），None表示一直等待
+
+        Returns:
+            concurrent.futures.Future，结果为预测结果列表
+        """
+        if self._stopped.is_set():
+            raise RuntimeError("推理调度器已关闭")
+
+        request = _InferenceRequest(preprocess_image(image), top_k)
+        try:
+            self._queue.put(request, timeout=timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats['rejected'] += 1
+            raise QueueFullError("推理队列已满，请稍后重试")
+        # 入队期间调度器可能已关闭并清空过队列，此时由提交方清空，避免请求无人处理
+        if self._stopped.is_set():
+            self._fail_pending()
+        return request.future
+
+    def stats(self):
+        """返回调度统计信息（请求数、批次数、平均批大小、排队数、拒绝数）"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['avg_batch_size'] = stats['requests'] / stats['batches'] if stats['batches'] else 0.0
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    def close(self, timeout=None):
+        """停止调度线程，未处理的请求以异常结束"""
+        self._stopped.set()
+        self._worker.join(timeout)
+        self._fail_pending()
+
+    def _fail_pending(self):
+        """取出队列中剩余的请求，以调度器已关闭的异常结束"""
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request.future.set_running_or_notify_cancel():
+                request.future.set_exception(RuntimeError("推理调度器已关闭"))
+
+    def _collect_batch(self):
+        """阻塞等待第一个请求，然后在时间窗口内尽量凑满一个批次"""
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            # 忽略已被调用方取消的请求
+            batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self._infer(batch)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+
+            with self._stats_lock:
+                self._stats['requests'] += len(batch)
+                self._stats['batches'] += 1
+
+    @torch.no_grad()
+    def _infer(self, batch):
+        """对一个批次执行一次前向传播，并按各请求的top_k切分结果"""
+        batch_tensor = torch.cat([request.tensor for request in batch], dim=0).to(self.device)
+        with stage('forward'):
+            output = self.model(batch_tensor)
+
+        max_k = max(request.top_k for request in batch)
+        results = _topk_results(output, max_k)
+        return [result[:request.top_k] for request, result in zip(batch, results)]
@@ -6,9 +6,19 @@ from timm.models.vision_transformer import VisionTransformer
 import numpy as np
 from PIL import Image
 import io
-import functools
-import time
 import gc
+import os
+import json
+import hashlib
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.weights import load_safetensors_mmap, publish_safetensors, read_safetensors_header, SHARED_WEIGHTS_DIR
+from utils.checkpoint import file_sha256
+from utils.token_merging import apply_token_merging, remove_token_merging, token_merging_config
+from utils.timing import latency_recorder, stage
 
 # CIFAR-100类别名称
 CIFAR100_CLASSES = [
@@ -51,49 +61,546 @@ class EfficientHybrid(nn.Module):
             nn.Linear(384, num_classes)
         )
 
-    def forward(self, x):
-        # 并行处理提高效率
+        # 分支执行模式：sequential（依次执行）或concurrent（两个分支并发执行）
+        self.branch_mode = 'sequential'
+        self.branch_threads = None
+
+        # 级联推理：ConvNeXt分支置信度达到阈值时提前返回，None表示关闭
+        self.cascade_metric = None
+        self.cascade_threshold = None
+
+        # CPU执行选项：channels-last内存布局与bfloat16自动混合精度
+        self.channels_last = False
+        self.autocast_dtype = None
+
+    def set_branch_mode(self, mode, num_threads=None):
+        """设置ConvNeXt与ViT两个分支的执行方式
+        
+        Args:
+            mode: 'sequential'依次执行；'concurrent'在两个工作线程上并发执行，
+                  每个工作线程使用一半的计算线程
+            num_threads: 两个分支合计使用的线程数，None时使用进程可用的CPU数
+        """
+        if mode not in BRANCH_MODES:
+            raise ValueError(f"不支持的分支执行模式: {mode}")
+        self.branch_mode = mode
+        # 在设置时确定线程数，不随之后调用线程的torch.get_num_threads()变化
+        self.branch_threads = num_threads or available_cpus()
+        return self
+
+    def set_cascade(self, threshold=None, metric='confidence'):
+        """设置ConvNeXt单分支提前退出的级联推理
+        
+        先只运行ConvNeXt分支，对其softmax输出达到阈值的样本直接返回ConvNeXt的logits，
+        其余样本再运行ViT分支和融合层。阈值可用tools.calibrate_cascade按目标一致率标定。
+        
+        Args:
+            threshold: 提前退出阈值，None表示关闭级联
+            metric: 'confidence'使用top-1概率，'margin'使用top-1与top-2概率之差
+        """
+        if metric not in CASCADE_METRICS:
+            raise ValueError(f"不支持的级联指标: {metric}")
+        self.cascade_metric = metric if threshold is not None else None
+        self.cascade_threshold = threshold
+        return self
+
+    def set_cpu_options(self, channels_last=False, bf16=False):
+        """设置CPU执行选项
+        
+        Args:
+            channels_last: 将权重和输入转换为channels-last（NHWC）布局，卷积使用oneDNN的NHWC实现
+            bf16: 在bfloat16自动混合精度下推理，输出转换回float32；仅在CPU支持bf16指令时启用
+        """
+        if channels_last != getattr(self, 'channels_last', False):
+            # 只在布局变化时转换，避免复制内存映射的共享权重
+            self.to(memory_format=torch.channels_last if channels_last else torch.contiguous_format)
+        self.channels_last = channels_last
+        if bf16 and not cpu_supports_bf16():
+            print("当前CPU不支持bfloat16指令，bf16自动混合精度未启用")
+            bf16 = False
+        self.autocast_dtype = torch.bfloat16 if bf16 else None
+        return self
+
+    def set_token_merging(self, ratios=None, prop_attn=True):
+        """设置ViT分支的token合并（ToMe风格），减少后续块处理的token数
+        
+        Args:
+            ratios: 每层合并比例，单个数值表示12层使用相同比例，None或0表示关闭
+            prop_attn: 是否按合并后的token大小加权注意力
+        """
+        remove_token_merging(self.vit)
+        if ratios:
+            apply_token_merging(self.vit, ratios, prop_attn)
+        return self
+
+    def _cascade_forward(self, x):
         x1 = self.convnext(x)
-        x2 = self.vit(x)
+        exit_mask = cascade_scores(x1, self.cascade_metric) >= self.cascade_threshold
+        exits = int(exit_mask.sum())
+        if exits == x.shape[0]:
+            cascade_stats.record(x.shape[0], exits, 0.0)
+            return x1
+        
+        # 只对未退出的样本运行ViT分支与融合层；eval模式下BatchNorm使用运行统计量，可按子集计算
+        start_time = time.perf_counter()
+        remaining = ~exit_mask
+        x2 = self.vit(x[remaining])
+        fused = self.fusion(torch.cat([x1[remaining], x2], dim=1))
+        output = x1.clone()
+        output[remaining] = fused.to(output.dtype)
+        cascade_stats.record(x.shape[0], exits, time.perf_counter() - start_time)
+        return output
+
+    def forward(self, x):
+        # 兼容不含CPU执行选项属性的旧版序列化模型
+        if getattr(self, 'channels_last', False):
+            x = x.contiguous(memory_format=torch.channels_last)
+        autocast_dtype = getattr(self, 'autocast_dtype', None)
+        if autocast_dtype is not None and x.device.type == 'cpu':
+            with torch.autocast('cpu', dtype=autocast_dtype):
+                return self._forward(x).float()
+        return self._forward(x)
+
+    def _forward(self, x):
+        # 级联推理只在推理时生效，跟踪导出时保持完整的计算图
+        if (getattr(self, 'cascade_threshold', None) is not None and not self.training
+                and not torch.jit.is_tracing() and not torch.jit.is_scripting()):
+            return self._cascade_forward(x)
+        # 兼容不含branch_mode属性的旧版序列化模型
+        if getattr(self, 'branch_mode', 'sequential') == 'concurrent' and not torch.jit.is_tracing() and not torch.jit.is_scripting():
+            # 两个分支各自在独立的线程分区上并发执行，在torch.cat处汇合
+            num_threads = getattr(self, 'branch_threads', None) or available_cpus()
+            executor = _get_branch_executor()
+            grad_enabled = torch.is_grad_enabled()
+            with _concurrent_forward_lock:
+                previous_threads = torch.get_num_threads()
+                torch.set_num_threads(max(1, num_threads // 2))
+                try:
+                    vit_future = executor.submit(_run_branch, self.vit, x, grad_enabled)
+                    x1 = executor.submit(_run_branch, self.convnext, x, grad_enabled).result()
+                    x2 = vit_future.result()
+                finally:
+                    torch.set_num_threads(previous_threads)
+        else:
+            x1 = self.convnext(x)
+            x2 = self.vit(x)
         # 融合两个模型的输出
         return self.fusion(torch.cat([x1, x2], dim=1))
 
+# 支持的分支执行模式
+BRANCH_MODES = ('sequential', 'concurrent')
+
+# 级联推理支持的提前退出指标
+CASCADE_METRICS = ('confidence', 'margin')
+
+def cascade_scores(logits, metric='confidence'):
+    """根据logits计算提前退出指标：top-1概率或top-1与top-2概率之差"""
+    probabilities = torch.softmax(logits.float(), dim=1)
+    if metric == 'margin':
+        top2 = torch.topk(probabilities, 2, dim=1).values
+        return top2[:, 0] - top2[:, 1]
+    return probabilities.max(dim=1).values
+
+class CascadeStats:
+    """级联推理统计：样本数、提前退出数与ViT分支的平均单样本耗时
+    
+    节省的延迟按提前退出样本数乘以实测的ViT+融合层单样本耗时估算。
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self._samples = 0
+            self._exits = 0
+            self._full_samples = 0
+            self._full_seconds = 0.0
+    
+    def record(self, samples, exits, full_seconds):
+        with self._lock:
+            self._samples += samples
+            self._exits += exits
+            self._full_samples += samples - exits
+            self._full_seconds += full_seconds
+    
+    def summary(self):
+        """返回样本数、提前退出率、ViT分支单样本耗时和估算节省的总延迟（毫秒）"""
+        with self._lock:
+            per_sample = self._full_seconds / self._full_samples if self._full_samples else None
+            return {
+                'samples': self._samples,
+                'exits': self._exits,
+                'exit_rate': self._exits / self._samples if self._samples else 0.0,
+                'full_branch_ms_per_sample': per_sample * 1000 if per_sample is not None else None,
+                'saved_ms': self._exits * per_sample * 1000 if per_sample is not None else None,
+            }
+
+# 全局级联推理统计
+cascade_stats = CascadeStats()
+
+def cpu_supports_bf16():
+    """CPU是否支持bfloat16指令（AVX512-BF16或AMX），非Linux平台返回False"""
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in flags or 'amx_bf16' in flags
+
+def select_num_threads(model, example_shape=(1, 3, 160, 160), candidates=None, repeat=3):
+    """在当前机器上测量不同算子内线程数的推理延迟，设置并返回最快的线程数
+    
+    Args:
+        model: eval模式下的模型
+        example_shape: 测量使用的输入形状
+        candidates: 候选线程数，None时为1到CPU核数之间的2的幂以及CPU核数本身
+        repeat: 每个候选线程数的计时次数
+        
+    Returns:
+        选中的线程数
+    """
+    cpu_count = available_cpus()
+    candidates = candidates or sorted({n for n in (1, 2, 4, 8, 16, 32, 64) if n <= cpu_count} | {cpu_count})
+    device = next(model.parameters()).device
+    x = torch.randn(*example_shape, device=device)
+    timings = {}
+    with torch.no_grad():
+        for num_threads in candidates:
+            torch.set_num_threads(num_threads)
+            model(x)  # 预热
+            start_time = time.perf_counter()
+            for _ in range(repeat):
+                model(x)
+            timings[num_threads] = (time.perf_counter() - start_time) / repeat
+    best = min(timings, key=timings.get)
+    torch.set_num_threads(best)
+    print(f"自动选择线程数: {best}（{', '.join(f'{n}线程 {t * 1000:.0f}ms' for n, t in timings.items())}）")
+    return best
+
+def available_cpus():
+    """当前进程可用的CPU数，考虑CPU亲和性（容器、taskset）限制"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+# 执行两个分支的线程池（两个工作线程）；线程池不挂在模型上，以保持模型可序列化
+_branch_executor = None
+_branch_executor_lock = threading.Lock()
+
+# torch.set_num_threads作用于整个进程，并发模式的前向计算在此锁内依次执行，
+# 分支执行期间的线程数调整不会被其他请求观察到
+_concurrent_forward_lock = threading.Lock()
+
+def _get_branch_executor():
+    """获取执行两个分支的线程池"""
+    global _branch_executor
+    with _branch_executor_lock:
+        if _branch_executor is None:
+            _branch_executor = ThreadPoolExecutor(
+                max_workers=2,
+                thread_name_prefix="hybrid-branch"
+            )
+        return _branch_executor
+
+def _run_branch(branch, x, grad_enabled):
+    """在工作线程中执行单个分支（梯度开关是线程局部的，需要与调用线程保持一致）"""
+    with torch.set_grad_enabled(grad_enabled):
+        return branch(x)
+
 # 性能计时装饰器
 def timing_decorator(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        print(f"{func.__name__} 执行时间: {(end_time - start_time)*1000:.2f} ms")
-        return result
-    return wrapper
+    """以函数名为阶段名，将执行时间记录到utils.timing的延迟统计中"""
+    return latency_recorder.timed(func.__name__)(func)
 
-# 加载模型并缓存
-@timing_decorator
-def load_model(model_path, device=None):
-    """加载模型并将其移动到指定设备上
+# 支持的推理精度模式
+PRECISION_MODES = ('fp32', 'int8')
+
+# 动态量化模型
+def quantize_model(model):
+    """对模型的全部Linear层做INT8动态量化（仅支持CPU）
+    
+    覆盖ViT各Block中的qkv/proj/MLP、ConvNeXt各Block的MLP、分类头以及fusion融合层。
     
     Args:
-        model_path: 模型文件路径
-        device: 计算设备，None时自动选择
+        model: fp32模型（位于CPU上）
         
     Returns:
-        加载的模型和使用的设备
+        量化后的模型
     """
-    if device is None:
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    # 选择当前平台可用的量化后端
+    engines = torch.backends.quantized.supported_engines
+    for engine in ('fbgemm', 'x86', 'qnnpack'):
+        if engine in engines:
+            torch.backends.quantized.engine = engine
+            break
+    
+    model.eval()
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+def _quantized_cache_path(model_path):
+    """量化模型缓存文件路径：与原始权重同目录"""
+    return f"{model_path}.int8.pt"
+
+def _checkpoint_signature(model_path):
+    """用文件大小和修改时间标识原始权重，原始权重变化时缓存失效"""
+    stat = os.stat(model_path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'torch': torch.__version__}
+
+def _load_quantized_cache(cache_path, signature):
+    """读取量化模型缓存，缓存不存在或已失效时返回None"""
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        artifact = torch.load(cache_path, map_location='cpu', weights_only=False)
+    except Exception as e:
+        print(f"量化模型缓存读取失败: {str(e)}")
+        return None
+    if artifact.get('signature') != signature:
+        return None
+    return artifact['model']
+
+def _save_quantized_cache(cache_path, model, signature):
+    """保存量化模型缓存，先写临时文件再原子替换"""
+    temporary_path = f"{cache_path}.tmp"
+    try:
+        torch.save({'signature': signature, 'model': model}, temporary_path)
+        os.replace(temporary_path, cache_path)
+    except Exception as e:
+        print(f"量化模型缓存保存失败: {str(e)}")
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+def _build_empty_model():
+    """在meta设备上构建模型结构，不为随机初始化的权重分配内存
+    
+    只把注册的参数和缓冲区放到meta设备上，构造过程中的其他计算（如timm的drop_path
+    调度）仍在CPU上进行。
+    """
+    original_register_parameter = nn.Module.register_parameter
+    original_register_buffer = nn.Module.register_buffer
+    
+    def register_parameter(module, name, param):
+        if param is not None:
+            param = nn.Parameter(param.to('meta'), requires_grad=param.requires_grad)
+        original_register_parameter(module, name, param)
+    
+    def register_buffer(module, name, tensor, persistent=True):
+        if tensor is not None:
+            tensor = tensor.to('meta')
+        original_register_buffer(module, name, tensor, persistent=persistent)
+    
+    nn.Module.register_parameter = register_parameter
+    nn.Module.register_buffer = register_buffer
+    try:
+        return EfficientHybrid()
+    finally:
+        nn.Module.register_parameter = original_register_parameter
+        nn.Module.register_buffer = original_register_buffer
+
+def _assign_state_dict(model, state_dict):
+    """将state_dict中的张量直接挂到模型上，不复制数据
+    
+    与load_state_dict不同，这里替换参数和缓冲区本身，
+    因此内存映射的张量会被模型直接引用。
+    """
+    expected = set(model.state_dict().keys())
+    missing = expected - set(state_dict.keys())
+    unexpected = set(state_dict.keys()) - expected
+    if missing or unexpected:
+        raise RuntimeError(f"权重与模型结构不匹配: 缺少 {sorted(missing)[:5]}, 多余 {sorted(unexpected)[:5]}")
+    
+    for name, tensor in state_dict.items():
+        module_name, _, attr = name.rpartition('.')
+        module = model.get_submodule(module_name)
+        if attr in module._parameters:
+            module._parameters[attr] = nn.Parameter(tensor, requires_grad=False)
+        else:
+            module._buffers[attr] = tensor
+    
+    leftover = [name for name, tensor in list(model.named_parameters()) + list(model.named_buffers()) if tensor.is_meta]
+    if leftover:
+        raise RuntimeError(f"模型仍有未加载的张量: {leftover[:5]}")
+    return model
+
+def _safetensors_sibling(model_path):
+    """与.pth权重同名的.safetensors文件路径"""
+    return os.path.splitext(model_path)[0] + '.safetensors'
+
+def safetensors_source_metadata(model_path):
+    """转换时写入safetensors元数据的原始权重标识（文件大小、修改时间和SHA-256）"""
+    stat = os.stat(model_path)
+    return {
+        'source': os.path.basename(model_path),
+        'source_size': str(stat.st_size),
+        'source_mtime_ns': str(stat.st_mtime_ns),
+        'source_sha256': file_sha256(model_path),
+    }
+
+def _sibling_matches_source(sibling_path, model_path):
+    """检查同名safetensors文件是否由当前的.pth权重转换而来
+    
+    文件大小不同时直接判定失效；大小和修改时间都与记录一致时视为同一文件；
+    只有修改时间变化（如复制、重新下载）时再计算SHA-256确认内容。
+    """
+    try:
+        header, _ = read_safetensors_header(sibling_path)
+        stat = os.stat(model_path)
+    except (OSError, ValueError) as e:
+        print(f"读取safetensors文件失败: {str(e)}")
+        return False
+    metadata = header.get('__metadata__', {})
+    if metadata.get('source_size') != str(stat.st_size):
+        return False
+    if metadata.get('source_mtime_ns') == str(stat.st_mtime_ns):
+        return True
+    return metadata.get('source_sha256') == file_sha256(model_path)
+
+def _load_state_dict_low_memory(model_path):
+    """以尽量低的峰值内存读取权重
+    
+    优先使用内存映射的safetensors文件；.pth文件在torch支持时也使用mmap读取。
+    同名的.safetensors文件只有在其元数据与.pth权重一致时才使用，否则回退到.pth。
+    """
+    sibling_path = _safetensors_sibling(model_path)
+    if not model_path.endswith('.safetensors') and os.path.exists(sibling_path):
+        if _sibling_matches_source(sibling_path, model_path):
+            model_path = sibling_path
+        else:
+            print(f"{sibling_path} 与 {model_path} 不一致，使用.pth权重（可重新运行tools.convert_checkpoint）")
+    
+    if model_path.endswith('.safetensors'):
+        state_dict, _ = load_safetensors_mmap(model_path)
+        return state_dict
+    
+    # torch>=2.1支持对.pth文件做内存映射读取
+    if 'mmap' in inspect.signature(torch.load).parameters:
+        return torch.load(model_path, map_location='cpu', mmap=True)
+    return torch.load(model_path, map_location='cpu')
+
+def shared_weights_path(model_path, checkpoint_hash=None, shared_dir=None):
+    """共享权重文件路径，按权重文件路径与标识区分，权重更新后自动使用新文件"""
+    if checkpoint_hash is None:
+        checkpoint_hash = json.dumps(_checkpoint_signature(model_path), sort_keys=True)
+    key = hashlib.sha256(f"{os.path.abspath(model_path)}|{checkpoint_hash}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(shared_dir or SHARED_WEIGHTS_DIR, f"cifar100_efficient_hybrid_{key}.safetensors")
+
+def publish_shared_weights(model_path, checkpoint_hash=None, shared_dir=None):
+    """将权重发布为共享内存中的safetensors文件，返回其路径
+    
+    同一主机上第一个启动的进程负责转换写入（默认写到/dev/shm），之后的进程直接以只读方式
+    内存映射同一个文件，权重的物理内存在主机上只占用一份。文件在重启或手动删除前一直保留。
+    """
+    path = shared_weights_path(model_path, checkpoint_hash, shared_dir)
+    return publish_safetensors(
+        path,
+        lambda: _load_state_dict_low_memory(model_path),
+        metadata={'source': os.path.basename(model_path)},
+    )
+
+# 支持的图编译模式
+COMPILE_MODES = ('trace', 'optimize', 'compile')
+
+# 编译产物缓存目录
+COMPILE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.model_cache')
+
+def _compile_cache_path(cache_dir, checkpoint_hash, example_shape, variant):
+    """编译产物路径：由权重标识、torch版本、输入形状和编译变体（模式、精度、执行选项与token合并设置）共同决定"""
+    key_source = f"{checkpoint_hash}|{torch.__version__}|{tuple(example_shape)}|{variant}"
+    key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"efficient_hybrid_{key}.ts")
+
+def compile_model(model, checkpoint_hash, mode='trace', example_shape=(1, 3, 160, 160),
+                  precision='fp32', cache_dir=None, device=None):
+    """将模型编译为图执行形式，失败时自动回退到eager模式
+    
+    trace模式使用torch.jit.trace并freeze，产物按权重标识、torch版本、输入形状、精度与token合并设置缓存在磁盘上，
+    之后启动直接加载；optimize模式在此基础上执行torch.jit.optimize_for_inference，
+    应用卷积与BatchNorm折叠、oneDNN算子融合等CPU推理优化；compile模式使用torch.compile（torch>=2.0），编译在首次推理时进行，
+    由torch自身的编译缓存复用。
+    
+    Args:
+        model: eval模式下的模型
+        checkpoint_hash: 权重文件标识（如SHA-256）
+        mode: 'trace'、'optimize'或'compile'
+        example_shape: 跟踪时使用的输入形状，批次维度在推理时可以变化
+        precision: 精度模式，作为缓存键的一部分
+        cache_dir: 缓存目录，None时使用COMPILE_CACHE_DIR
+        device: 计算设备
+        
+    Returns:
+        编译后的模型；编译失败时返回原模型
+    """
+    if mode not in COMPILE_MODES:
+        raise ValueError(f"不支持的编译模式: {mode}")
+    device = device or next(model.parameters()).device
+    
+    if mode == 'compile':
+        if not hasattr(torch, 'compile'):
+            print("当前torch版本不支持torch.compile，使用eager模式")
+            return model
+        try:
+            return torch.compile(model)
+        except Exception as e:
+            print(f"torch.compile失败，使用eager模式: {str(e)}")
+            return model
+    
+    # token合并改变ViT分支的计算图，每层比例与prop_attn都需要计入缓存键
+    vit = getattr(model, 'vit', None)
+    token_merging = token_merging_config(vit) if vit is not None else None
+    variant = (mode, precision, getattr(model, 'channels_last', False), str(getattr(model, 'autocast_dtype', None)),
+               token_merging)
+    cache_path = _compile_cache_path(cache_dir or COMPILE_CACHE_DIR, checkpoint_hash, example_shape, variant)
+    if os.path.exists(cache_path):
+        try:
+            compiled = torch.jit.load(cache_path, map_location=device)
+            print("已从缓存加载编译后的模型")
+            return compiled
+        except Exception as e:
+            print(f"编译缓存读取失败，重新编译: {str(e)}")
+    
+    try:
+        example = torch.randn(*example_shape, device=device)
+        with torch.no_grad():
+            compiled = torch.jit.freeze(torch.jit.trace(model, example, check_trace=False))
+            if mode == 'optimize':
+                compiled = torch.jit.optimize_for_inference(compiled)
+            # 与eager输出对比，防止跟踪结果与原模型不一致；bf16下算子融合带来的舍入差异更大
+            tolerance = 1e-3 if getattr(model, 'autocast_dtype', None) is None else 2e-2
+            if not torch.allclose(compiled(example), model(example), atol=tolerance, rtol=tolerance):
+                raise RuntimeError("编译后的输出与eager模式不一致")
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temporary_path = f"{cache_path}.tmp"
+        torch.jit.save(compiled, temporary_path)
+        os.replace(temporary_path, cache_path)
+        print("模型编译完成")
+        return compiled
+    except Exception as e:
+        print(f"模型编译失败，使用eager模式: {str(e)}")
+        return model
+
+def _load_model_weights(model_path, device, precision, quantized_cache_path):
+    """按精度模式加载权重，返回eval模式下的EfficientHybrid"""
+    if precision == 'int8':
+        cache_path = quantized_cache_path or _quantized_cache_path(model_path)
+        signature = _checkpoint_signature(model_path)
+        model = _load_quantized_cache(cache_path, signature)
+        if model is not None:
+            print("已从缓存加载INT8量化模型")
+            return model.eval()
     
     print(f"正在加载模型到 {device} 设备...")
     
-    # 创建模型实例
-    model = EfficientHybrid().to(device)
+    # 在meta设备上创建模型结构，权重直接使用读取到的张量，避免同时持有两份权重
+    model = _build_empty_model()
     
     # 加载模型权重
     try:
-        state_dict = torch.load(model_path, map_location=device)
-        model.load_state_dict(state_dict)
+        state_dict = _load_state_dict_low_memory(model_path)
+        _assign_state_dict(model, state_dict)
         del state_dict
+        model.to(device)
         gc.collect()
         print("模型加载成功!")
     except Exception as e:
@@ -102,8 +609,257 @@ def load_model(model_path, device=None):
     
     # 设置为评估模式
     model.eval()
+    
+    if precision == 'int8':
+        model = quantize_model(model)
+        _save_quantized_cache(cache_path, model, signature)
+        gc.collect()
+        print("INT8动态量化完成")
+    return model
+
+# 加载模型并缓存
+@timing_decorator
+def load_model(model_path, device=None, precision='fp32', quantized_cache_path=None, branch_mode='sequential',
+               compile_mode=None, checkpoint_hash=None, compile_cache_dir=None,
+               cascade_threshold=None, cascade_metric='confidence', token_merge_ratio=None,
+               channels_last=False, bf16=False, num_threads=None, warmup_batch_sizes=None, on_stage=None,
+               shared_weights=False, shared_weights_dir=None):
+    """加载模型并将其移动到指定设备上
+    
+    Args:
+        model_path: 模型文件路径
+        device: 计算设备，None时自动选择
+        precision: 推理精度，'fp32'或'int8'（INT8动态量化，仅CPU）
+        quantized_cache_path: 量化模型缓存路径，None时保存在权重文件旁
+        branch_mode: 分支执行模式，'sequential'或'concurrent'
+        compile_mode: 图编译模式，None表示eager，'trace'或'compile'见compile_model
+        checkpoint_hash: 权重文件标识，用作编译缓存键；None时使用文件大小与修改时间
+        compile_cache_dir: 编译产物缓存目录
+        cascade_threshold: ConvNeXt单分支提前退出阈值，None表示关闭级联，见EfficientHybrid.set_cascade
+        cascade_metric: 提前退出指标，'confidence'或'margin'
+        token_merge_ratio: ViT分支每层的token合并比例（单个数值或每层一个），None表示关闭
+        channels_last: 使用channels-last内存布局（CPU）
+        bf16: 在支持bf16指令的CPU上使用bfloat16自动混合精度（仅fp32精度模式）
+        num_threads: 算子内线程数，None保持默认，'auto'时测量后自动选择
+        warmup_batch_sizes: 返回前预热的批大小列表，None或空表示不预热，见warmup_model
+        on_stage: 阶段回调，签名为on_stage(阶段名, 详情)；权重加载完成时为('loaded', None)，
+                  预热完成时为('warmed', warmup_model的结果)
+        shared_weights: 从共享内存中的safetensors副本加载权重，同一主机上的多个进程共享一份权重内存；
+                        仅fp32精度有效，channels_last和optimize编译会生成私有的权重副本
+        shared_weights_dir: 共享权重目录，None时使用/dev/shm
+        
+    Returns:
+        加载的模型和使用的设备
+    """
+    if precision not in PRECISION_MODES:
+        raise ValueError(f"不支持的精度模式: {precision}")
+    
+    if precision == 'int8':
+        # 动态量化算子只在CPU上实现
+        device = torch.device('cpu')
+    elif device is None:
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    
+    weights_path = model_path
+    if shared_weights and precision == 'int8':
+        # 量化后的权重是各进程私有的新张量，共享原始权重没有意义
+        print("INT8量化模型不使用共享权重")
+    elif shared_weights:
+        weights_path = publish_shared_weights(model_path, checkpoint_hash, shared_weights_dir)
+    
+    model = _load_model_weights(weights_path, device, precision, quantized_cache_path)
+    model.set_cascade(cascade_threshold, cascade_metric)
+    model.set_token_merging(token_merge_ratio)
+    if bf16 and precision == 'int8':
+        print("INT8量化模型不使用bf16自动混合精度")
+        bf16 = False
+    model.set_cpu_options(channels_last=channels_last, bf16=bf16 and device.type == 'cpu')
+    
+    if num_threads == 'auto':
+        # 在顺序执行模式下测量，选中的线程数同时作为并发分支合计的线程数
+        num_threads = select_num_threads(model) if device.type == 'cpu' else None
+    elif num_threads:
+        torch.set_num_threads(num_threads)
+    model.set_branch_mode(branch_mode, num_threads)
+    
+    if compile_mode and cascade_threshold is not None:
+        # 编译后的计算图总是完整执行两个分支，级联推理依赖eager模式下的动态分支
+        print("级联推理需要eager模式，已跳过模型编译")
+    elif compile_mode:
+        if checkpoint_hash is None:
+            checkpoint_hash = json.dumps(_checkpoint_signature(model_path), sort_keys=True)
+        model = compile_model(model, checkpoint_hash, mode=compile_mode, precision=precision,
+                              cache_dir=compile_cache_dir, device=device)
+    
+    _warmup_after_load(model, device, warmup_batch_sizes, on_stage)
     return model, device
 
+def _warmup_after_load(model, device, warmup_batch_sizes, on_stage):
+    """通知加载完成，按需预热并通知预热结果"""
+    if on_stage:
+        on_stage('loaded', None)
+    if warmup_batch_sizes:
+        warmup = warmup_model(model, device, warmup_batch_sizes)
+        if on_stage:
+            on_stage('warmed', warmup)
+
+# 模型预热
+def warmup_model(model, device, batch_sizes=(1,), img_size=160, top_k=5, rounds=2):
+    """按服务使用的批大小预先执行推理，使内存分配、算子选择和惰性初始化在首个请求之前完成
+    
+    每个批大小执行rounds次前向传播以及softmax和top-k，输入为随机张量。
+    预热不计入延迟统计，结束后清空级联推理统计。
+    
+    Args:
+        model: 模型或推理后端
+        device: 计算设备
+        batch_sizes: 预热的批大小列表
+        img_size: 输入图像尺寸
+        top_k: top-k的k值
+        rounds: 每个批大小的执行次数
+        
+    Returns:
+        dict: 各批大小首次与最后一次执行的耗时（毫秒）以及预热总耗时
+    """
+    results = {'batch_sizes': {}, 'total_ms': 0.0}
+    start_time = time.perf_counter()
+    with torch.no_grad():
+        for batch_size in sorted(set(batch_sizes)):
+            x = torch.randn(batch_size, 3, img_size, img_size, device=device)
+            timings = []
+            for _ in range(max(1, rounds)):
+                round_start = time.perf_counter()
+                probabilities = torch.nn.functional.softmax(model(x), dim=1)
+                torch.topk(probabilities, min(top_k, probabilities.shape[1]), dim=1)
+                if device.type == 'cuda':
+                    torch.cuda.synchronize(device)
+                timings.append((time.perf_counter() - round_start) * 1000)
+            results['batch_sizes'][batch_size] = {'first_ms': timings[0], 'warm_ms': timings[-1]}
+    results['total_ms'] = (time.perf_counter() - start_time) * 1000
+    cascade_stats.reset()
+    print(f"模型预热完成，耗时 {results['total_ms']:.0f} ms")
+    return results
+
+# 支持的推理后端
+INFERENCE_BACKENDS = ('torch', 'onnx')
+
+class TorchBackend:
+    """PyTorch推理后端，包装nn.Module（或编译后的模型）
+    
+    后端对象可以像模型一样调用：输入NCHW浮点张量，返回logits张量，
+    因此predict、batch_predict和InferenceScheduler无需区分后端类型。
+    """
+    name = 'torch'
+    
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+    
+    @torch.no_grad()
+    def __call__(self, batch_tensor):
+        return self.model(batch_tensor.to(self.device))
+
+class OnnxBackend:
+    """ONNX Runtime CPU推理后端，需要安装onnxruntime"""
+    name = 'onnx'
+    
+    def __init__(self, onnx_path, num_threads=None):
+        """
+        Args:
+            onnx_path: export_onnx导出的模型文件
+            num_threads: 算子内并行线程数，None时由ONNX Runtime决定
+        """
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("使用ONNX后端需要安装onnxruntime: pip install onnxruntime")
+        
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.device = torch.device('cpu')
+    
+    def __call__(self, batch_tensor):
+        inputs = batch_tensor.detach().cpu().numpy()
+        return torch.from_numpy(self.session.run(None, {self.input_name: inputs})[0])
+
+def export_onnx(model, onnx_path, img_size=160, opset_version=17):
+    """将EfficientHybrid导出为ONNX，批次维度为动态轴
+    
+    Args:
+        model: eval模式下的fp32模型
+        onnx_path: 导出路径
+        img_size: 输入图像尺寸
+        opset_version: ONNX算子集版本
+        
+    Returns:
+        导出路径
+    """
+    device = next(model.parameters()).device
+    example = torch.randn(1, 3, img_size, img_size, device=device)
+    export_kwargs = {}
+    # torch>=2.9默认使用基于torch.export的导出器，这里固定使用基于跟踪的导出器
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs['dynamo'] = False
+    
+    temporary_path = f"{onnx_path}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            example,
+            temporary_path,
+            input_names=['input'],
+            output_names=['logits'],
+            dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+            opset_version=opset_version,
+            do_constant_folding=True,
+            **export_kwargs,
+        )
+    os.replace(temporary_path, onnx_path)
+    return onnx_path
+
+def load_backend(model_path, backend='torch', device=None, onnx_path=None, num_threads=None, **load_kwargs):
+    """加载指定类型的推理后端
+    
+    ONNX后端优先使用已导出的模型文件；文件不存在或比权重文件旧时，先用PyTorch加载权重并重新导出。
+    
+    Args:
+        model_path: 模型文件路径
+        backend: 'torch'或'onnx'
+        device: 计算设备，仅PyTorch后端使用
+        onnx_path: ONNX模型路径，None时保存在权重文件旁
+        num_threads: ONNX Runtime算子内线程数
+        **load_kwargs: 传给load_model的其他参数（PyTorch后端）
+        
+    Returns:
+        推理后端和使用的设备
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"不支持的推理后端: {backend}")
+    
+    if backend == 'torch':
+        model, device = load_model(model_path, device, **load_kwargs)
+        return TorchBackend(model, device), device
+    
+    # ONNX后端只使用预热相关参数
+    warmup_batch_sizes = load_kwargs.get('warmup_batch_sizes')
+    on_stage = load_kwargs.get('on_stage')
+    
+    onnx_path = onnx_path or f"{model_path}.onnx"
+    if not os.path.exists(onnx_path) or os.path.getmtime(onnx_path) < os.path.getmtime(model_path):
+        print("正在导出ONNX模型...")
+        model, _ = load_model(model_path, torch.device('cpu'))
+        export_onnx(model, onnx_path)
+        del model
+        gc.collect()
+    onnx_backend = OnnxBackend(onnx_path, num_threads)
+    print("ONNX Runtime后端加载成功!")
+    _warmup_after_load(onnx_backend, onnx_backend.device, warmup_batch_sizes, on_stage)
+    return onnx_backend, onnx_backend.device
+
 # 图像预处理转换器 - 预先定义并重用
 def get_transform(img_size=160):
     """获取预处理转换器
@@ -126,17 +882,91 @@ def get_transform(img_size=160):
 # 预处理转换器缓存
 _transform_cache = {}
 
+# CIFAR-100数据集的均值和标准差（快速预处理路径使用的张量形式）
+_NORMALIZE_MEAN = torch.tensor([0.5071, 0.4867, 0.4408]).view(1, 3, 1, 1) * 255
+_NORMALIZE_SCALE = 1.0 / (torch.tensor([0.2675, 0.2565, 0.2761]).view(1, 3, 1, 1) * 255)
+
+# 解码图像
+@latency_recorder.timed('decode')
+def decode_image(image, img_size=160):
+    """解码图像并缩放、中心裁剪为img_size×img_size的RGB图像
+    
+    JPEG使用draft模式在解码阶段按1/2、1/4、1/8比例缩小，大尺寸照片无需完整解码。
+    缩小后的短边保持在缩放目标（img_size+32）的2倍以上，再由双线性插值缩放到目标尺寸；
+    缩小到接近目标尺寸时DCT缩放的误差会明显偏离参考转换，因此中等尺寸的照片仍完整解码。
+    
+    Args:
+        image: PIL.Image、二进制图像数据或图像文件路径
+        img_size: 输出图像大小
+        
+    Returns:
+        裁剪后的PIL.Image
+    """
+    resize_size = img_size + 32  # 与get_transform一致：略大一些再裁剪
+    
+    if isinstance(image, bytes):
+        image = Image.open(io.BytesIO(image))
+    elif isinstance(image, str):
+        image = Image.open(image)
+    elif not isinstance(image, Image.Image):
+        raise TypeError("图像必须是PIL.Image、bytes或文件路径")
+    
+    # 目标尺寸按原始尺寸计算，draft缩小后的尺寸有取整误差
+    width, height = image.size
+    
+    # 尚未解码的JPEG可以直接以缩小的尺寸解码，缩小后短边不小于2倍缩放目标
+    if image.format == 'JPEG':
+        image.draft('RGB', (2 * resize_size, 2 * resize_size))
+    image = image.convert('RGB')
+    
+    # 与transforms.Resize相同的尺寸计算：短边缩放到resize_size
+    if width <= height:
+        new_size = (resize_size, int(resize_size * height / width))
+    else:
+        new_size = (int(resize_size * width / height), resize_size)
+    if new_size != image.size:
+        image = image.resize(new_size, Image.BILINEAR, reducing_gap=3.0)
+    
+    # 与transforms.CenterCrop相同的裁剪位置
+    left = int(round((new_size[0] - img_size) / 2.0))
+    top = int(round((new_size[1] - img_size) / 2.0))
+    return image.crop((left, top, left + img_size, top + img_size))
+
+# 快速批量预处理
+def fast_preprocess_batch(images, img_size=160):
+    """快速预处理一组图像：缩小解码后在一个批次张量上完成类型转换与归一化
+    
+    Args:
+        images: PIL.Image、二进制图像数据或图像文件路径的列表
+        img_size: 图像大小
+        
+    Returns:
+        形状为[B, 3, img_size, img_size]的张量
+    """
+    return _crops_to_tensor([decode_image(image, img_size) for image in images])
+
+@latency_recorder.timed('preprocess')
+def _crops_to_tensor(crops):
+    """将裁剪好的RGB图像堆叠为批次张量，并一次完成类型转换与归一化"""
+    arrays = np.stack([np.asarray(crop) for crop in crops])
+    batch = torch.from_numpy(arrays).permute(0, 3, 1, 2).float()
+    return batch.sub_(_NORMALIZE_MEAN).mul_(_NORMALIZE_SCALE).contiguous()
+
 # 图像预处理
-def preprocess_image(image, img_size=160):
+def preprocess_image(image, img_size=160, fast=True):
     """预处理输入图像
     
     Args:
-        image: PIL.Image或二进制图像数据
+        image: PIL.Image或二进制图像数据（快速路径还支持文件路径）
         img_size: 图像大小
+        fast: True使用快速预处理路径，False使用torchvision参考转换
         
     Returns:
         处理后的张量
     """
+    if fast:
+        return fast_preprocess_batch([image], img_size)
+    
     # 从缓存获取转换器，不存在则创建
     global _transform_cache
     if img_size not in _transform_cache:
@@ -150,7 +980,58 @@ def preprocess_image(image, img_size=160):
         raise TypeError("图像必须是PIL.Image或bytes类型")
     
     # 应用转换并增加批次维度
-    return transform(image).unsqueeze(0)
+    with stage('preprocess'):
+        return transform(image).unsqueeze(0)
+
+# 批量图像预处理
+def preprocess_batch(images, img_size=160, fast=True):
+    """预处理一组图像并堆叠为一个批次张量
+    
+    Args:
+        images: PIL.Image或二进制图像数据的列表
+        img_size: 图像大小
+        fast: True使用快速预处理路径，False使用torchvision参考转换
+        
+    Returns:
+        形状为[B, 3, img_size, img_size]的张量
+    """
+    if fast:
+        return fast_preprocess_batch(images, img_size)
+    return torch.cat([preprocess_image(image, img_size, fast=False) for image in images], dim=0)
+
+# 将top-k张量格式化为结果列表
+def _format_predictions(top_prob, top_class):
+    """将批量top-k结果转换为每张图像的结果列表
+    
+    Args:
+        top_prob: 形状为[B, k]的概率张量
+        top_class: 形状为[B, k]的类别索引张量
+        
+    Returns:
+        每张图像的预测结果列表
+    """
+    # 一次性转换为Python列表，避免逐元素调用item()
+    probs = top_prob.cpu().tolist()
+    classes = top_class.cpu().tolist()
+    
+    results = []
+    for row_probs, row_classes in zip(probs, classes):
+        results.append([
+            {
+                'class_id': class_idx,
+                'class_name': CIFAR100_CLASSES[class_idx],
+                'probability': round(prob * 100, 2)  # 转为百分比并保留两位小数
+            }
+            for prob, class_idx in zip(row_probs, row_classes)
+        ])
+    return results
+
+def _topk_results(output, top_k):
+    """对模型输出计算softmax与top-k，并格式化为每张图像的结果列表"""
+    with stage('topk_format'):
+        probabilities = torch.nn.functional.softmax(output, dim=1)
+        top_prob, top_class = torch.topk(probabilities, top_k, dim=1)
+        return _format_predictions(top_prob, top_class)
 
 # 预测函数
 @torch.no_grad()  # 禁用梯度计算提高性能
@@ -158,7 +1039,7 @@ def predict(model, image, device, top_k=5):
     """预测图像类别
     
     Args:
-        model: 预训练模型
+        model: 预训练模型或推理后端（TorchBackend、OnnxBackend）
         image: 输入图像
         device: 计算设备
         top_k: 返回前k个预测结果
@@ -170,51 +1051,64 @@ def predict(model, image, device, top_k=5):
     processed_image = preprocess_image(image).to(device)
     
     # 模型推理
-    output = model(processed_image)
-    probabilities = torch.nn.functional.softmax(output, dim=1)
-    
-    # 获取top-k结果
-    top_prob, top_class = torch.topk(probabilities, top_k, dim=1)
+    with stage('forward'):
+        output = model(processed_image)
     
-    # 格式化结果
-    result = []
-    for i in range(top_k):
-        class_idx = top_class[0][i].item()
-        result.append({
-            'class_id': class_idx,
-            'class_name': CIFAR100_CLASSES[class_idx],
-            'probability': round(top_prob[0][i].item() * 100, 2)  # 转为百分比并保留两位小数
-        })
-    
-    return result
+    # 获取top-k结果并格式化
+    return _topk_results(output, top_k)[0]
+
+# 批量预测默认的解码线程数
+DEFAULT_DECODE_WORKERS = min(4, os.cpu_count() or 1)
 
 # 批量预测函数
 @torch.no_grad()  # 禁用梯度计算提高性能
-def batch_predict(model, images, device, top_k=5, batch_size=16):
+def batch_predict(model, images, device, top_k=5, batch_size=16, num_workers=None, prefetch_batches=2):
     """批量预测多张图像
     
+    解码和预处理在线程池中进行，并提前准备后续批次，与当前批次的模型推理重叠执行。
+    
     Args:
-        model: 预训练模型
-        images: 图像列表
+        model: 预训练模型或推理后端（TorchBackend、OnnxBackend）
+        images: 图像列表（PIL.Image、二进制图像数据或图像文件路径）
         device: 计算设备
         top_k: 每张图像返回前k个预测结果
         batch_size: 批处理大小
+        num_workers: 解码线程数，None时使用DEFAULT_DECODE_WORKERS，0表示在当前线程中串行解码
+        prefetch_batches: 最多提前解码的批次数，限制预取占用的内存
         
     Returns:
         每张图像的预测结果列表
     """
+    if num_workers is None:
+        num_workers = DEFAULT_DECODE_WORKERS
+    batches = [images[i:i+batch_size] for i in range(0, len(images), batch_size)]
     results = []
     
-    # 按批次处理图像
-    for i in range(0, len(images), batch_size):
-        batch_images = images[i:i+batch_size]
-        batch_results = []
-        
-        # 处理每张图像
-        for image in batch_images:
-            result = predict(model, image, device, top_k)
-            batch_results.append(result)
+    def run_batch(batch_tensor):
+        # 整批推理，softmax与top-k也对整批一次完成
+        with stage('forward'):
+            output = model(batch_tensor.to(device))
+        results.extend(_topk_results(output, top_k))
+    
+    if num_workers <= 0:
+        for batch_images in batches:
+            run_batch(preprocess_batch(batch_images))
+        return results
+    
+    with ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="decode") as executor:
+        # 生产者：按批次提交解码任务，队列中最多保留prefetch_batches个待消费批次（至少1个）
+        pending = []
+        next_batch = 0
+        while next_batch < len(batches) and len(pending) < max(1, prefetch_batches):
+            pending.append([executor.submit(decode_image, image) for image in batches[next_batch]])
+            next_batch += 1
         
-        results.extend(batch_results)
+        # 消费者：取出最早的批次推理，同时补充新的解码任务
+        while pending:
+            crops = [future.result() for future in pending.pop(0)]
+            if next_batch < len(batches):
+                pending.append([executor.submit(decode_image, image) for image in batches[next_batch]])
+                next_batch += 1
+            run_batch(_crops_to_tensor(crops))
     
     return results
@@ -0,0 +1,2 @@
+# 运维工具包
+# 权重转换等命令行工具，使用 python -m tools.<名称> 运行
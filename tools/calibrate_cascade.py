@@ -0,0 +1,109 @@
+"""标定级联推理的提前退出阈值
+
+在一组图像上同时计算ConvNeXt单分支和完整模型的预测，对每种提前退出指标选出
+满足目标一致率（级联结果与完整模型top-1相同的比例）的最低阈值，并报告提前退出率
+与估算节省的延迟。得到的阈值通过MODEL_CASCADE_THRESHOLD/MODEL_CASCADE_METRIC传给应用。
+
+用法:
+    python -m tools.calibrate_cascade best_model.pth
+    python -m tools.calibrate_cascade best_model.pth --images data/categories --target 0.99
+"""
+import argparse
+import json
+import os
+import time
+import torch
+
+from model import load_model, preprocess_batch, cascade_scores, CASCADE_METRICS
+from utils.image_utils import list_labeled_images
+
+def choose_threshold(scores, agree, target):
+    """选出一致率不低于target、提前退出样本最多的阈值
+
+    按分数从高到低依次让样本提前退出，只在分数变化处切分，保证阈值对相同分数的样本一视同仁。
+
+    Args:
+        scores: 每个样本的提前退出指标
+        agree: 每个样本ConvNeXt与完整模型的top-1是否一致
+        target: 目标一致率
+
+    Returns:
+        (阈值, 提前退出率, 一致率)；没有样本可以提前退出时阈值为inf
+    """
+    order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+    total = len(scores)
+    best = (float('inf'), 0.0, 1.0)
+    disagreements = 0
+    for rank, index in enumerate(order, start=1):
+        disagreements += not agree[index]
+        agreement = 1 - disagreements / total
+        if agreement < target:
+            break
+        if rank == total or scores[order[rank]] < scores[index]:
+            best = (scores[index], rank / total, agreement)
+    return best
+
+@torch.no_grad()
+def main():
+    parser = argparse.ArgumentParser(description="标定级联推理的提前退出阈值")
+    parser.add_argument('model_path', help="模型权重文件路径")
+    parser.add_argument('--images', default=os.path.join('data', 'categories'), help="标定图像目录（递归查找）")
+    parser.add_argument('--target', type=float, default=0.99, help="与完整模型top-1的目标一致率")
+    parser.add_argument('--batch-size', type=int, default=16, help="批处理大小")
+    parser.add_argument('--output', default=None, help="将标定结果写入JSON文件")
+    args = parser.parse_args()
+
+    paths = [path for path, _ in list_labeled_images(args.images)]
+    if not paths:
+        raise SystemExit(f"{args.images} 中没有找到图像")
+
+    model, device = load_model(args.model_path)
+    scores = {metric: [] for metric in CASCADE_METRICS}
+    agree = []
+    convnext_seconds = full_seconds = 0.0
+    for start in range(0, len(paths), args.batch_size):
+        batch = preprocess_batch(paths[start:start + args.batch_size]).to(device)
+
+        start_time = time.perf_counter()
+        x1 = model.convnext(batch)
+        convnext_seconds += time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        output = model.fusion(torch.cat([x1, model.vit(batch)], dim=1))
+        full_seconds += time.perf_counter() - start_time
+
+        for metric in CASCADE_METRICS:
+            scores[metric].extend(cascade_scores(x1, metric).tolist())
+        agree.extend((x1.argmax(dim=1) == output.argmax(dim=1)).tolist())
+
+    count = len(paths)
+    full_ms = full_seconds / count * 1000
+    total_ms = (convnext_seconds + full_seconds) / count * 1000
+    print(f"标定图像 {count} 张，ConvNeXt单分支与完整模型top-1一致率 {sum(agree) / count * 100:.1f}%")
+    print(f"单张耗时: ConvNeXt {convnext_seconds / count * 1000:.1f} ms, ViT与融合层 {full_ms:.1f} ms")
+
+    results = {}
+    print(f"{'指标':<12}{'阈值':>10}{'提前退出率':>12}{'一致率':>10}{'估算单张延迟(ms)':>18}")
+    for metric in CASCADE_METRICS:
+        threshold, exit_rate, agreement = choose_threshold(scores[metric], agree, args.target)
+        expected_ms = total_ms - exit_rate * full_ms
+        results[metric] = {'threshold': threshold, 'exit_rate': exit_rate,
+                           'agreement': agreement, 'expected_ms': expected_ms}
+        print(f"{metric:<12}{threshold:>10.4f}{exit_rate * 100:>11.1f}%{agreement * 100:>9.1f}%{expected_ms:>18.1f}")
+
+    best_metric = max(results, key=lambda metric: results[metric]['exit_rate'])
+    best = results[best_metric]
+    if best['exit_rate'] > 0:
+        # 阈值原样输出：四舍五入后的阈值可能比标定值更低，让一致率不达标的样本也提前退出
+        print(f"建议: MODEL_CASCADE_METRIC={best_metric} MODEL_CASCADE_THRESHOLD={best['threshold']!r}"
+              f"（完整模型单张 {total_ms:.1f} ms）")
+    else:
+        print("在目标一致率下没有样本可以提前退出，建议保持级联关闭")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'target': args.target, 'images': count, 'full_ms': total_ms,
+                       'recommended_metric': best_metric, 'metrics': results}, f, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""使用本地HTTP服务器验证断点续传下载
+
+启动一个支持Range请求、可以在指定字节数后主动断开连接的本地服务器，
+依次验证顺序下载、中断后续传、并发区间下载与续传、不支持Range的服务器以及内容损坏的情况。
+
+用法:
+    python -m tools.check_download
+    python -m tools.check_download --size-mb 64
+"""
+import argparse
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.checkpoint import download_file, read_verification_stamp
+
+class _StandInServer:
+    """本地下载服务器，记录收到的Range请求并可模拟连接中断"""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.support_range = True
+        self.abort_after = None  # 每个响应最多发送的字节数，None表示不中断
+        self.abort_budget = 0    # 还允许中断的响应次数
+        self.ranges = []
+        self.lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                start, end = 0, len(server.payload) - 1
+                header = self.headers.get('Range')
+                match = re.match(r'bytes=(\d+)-(\d*)', header or '')
+                with server.lock:
+                    server.ranges.append(header)
+                    abort = server.abort_after if server.abort_budget > 0 else None
+                    if abort is not None:
+                        server.abort_budget -= 1
+                if match and server.support_range:
+                    start = int(match.group(1))
+                    end = int(match.group(2)) if match.group(2) else end
+                    self.send_response(206)
+                    self.send_header('Content-Range', f"bytes {start}-{end}/{len(server.payload)}")
+                else:
+                    self.send_response(200)
+                body = server.payload[start:end + 1]
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if abort is not None:
+                    self.wfile.write(body[:abort])
+                    self.wfile.flush()
+                    self.connection.shutdown(2)
+                    return
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/best_model.pth"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def reset(self, support_range=True, abort_after=None, abort_budget=0):
+        self.support_range = support_range
+        self.abort_after = abort_after
+        self.abort_budget = abort_budget
+        self.ranges = []
+
+    def close(self):
+        self.httpd.shutdown()
+
+def _attempt(func):
+    """执行一次下载，返回异常（成功时为None）"""
+    try:
+        func()
+    except Exception as e:
+        return e
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="使用本地HTTP服务器验证断点续传下载")
+    parser.add_argument('--size-mb', type=int, default=16, help="测试文件大小（MB）")
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size_mb * 1024 * 1024)
+    size, sha256 = len(payload), hashlib.sha256(payload).hexdigest()
+    server = _StandInServer(payload)
+    checks = []
+
+    def check(name, passed):
+        checks.append(passed)
+        print(f"{'通过' if passed else '失败'}: {name}")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        def target(name):
+            return os.path.join(temp_dir, name)
+
+        # 1. 顺序下载，边下载边校验
+        progress = []
+        server.reset()
+        path = target('sequential.pth')
+        download_file(server.url, path, size, sha256, progress=lambda done, total: progress.append(done))
+        check("顺序下载完成且写入校验戳", read_verification_stamp(path)['sha256'] == sha256 and progress[-1] == size)
+
+        # 2. 中断后续传：第二次请求从已下载位置开始
+        server.reset(abort_after=size // 3, abort_budget=1)
+        path = target('resume.pth')
+        error = _attempt(lambda: download_file(server.url, path, size, sha256))
+        partial = os.path.getsize(f"{path}.download") if os.path.exists(f"{path}.download") else 0
+        check("中断后保留已下载部分", error is not None and partial > 0)
+        download_file(server.url, path, size, sha256)
+        check("续传使用Range请求并校验通过", server.ranges[-1] == f"bytes={partial}-" and os.path.exists(path))
+
+        # 3. 并发区间下载，其中一个区间中断后续传
+        server.reset(abort_after=size // 16, abort_budget=1)
+        path = target('concurrent.pth')
+        error = _attempt(lambda: download_file(server.url, path, size, sha256, workers=4))
+        check("并发下载中断后保留区间进度", error is not None and os.path.exists(f"{path}.download.parts.json"))
+        server.reset()
+        download_file(server.url, path, size, sha256, workers=4)
+        with open(path, 'rb') as f:
+            check("并发续传只请求未完成的区间并校验通过",
+                  len(server.ranges) <= 4 and hashlib.sha256(f.read()).hexdigest() == sha256)
+
+        # 4. 服务器不支持Range时从头下载
+        server.reset(support_range=False)
+        path = target('no_range.pth')
+        with open(f"{path}.download", 'wb') as f:
+            f.write(payload[:size // 2])
+        download_file(server.url, path, size, sha256)
+        check("不支持Range时从头下载", os.path.exists(path))
+
+        # 5. 内容损坏时删除临时文件并报错
+        server.reset()
+        path = target('corrupt.pth')
+        error = _attempt(lambda: download_file(server.url, path, size, '0' * 64))
+        check("校验失败时报错并删除临时文件", error is not None and not os.path.exists(f"{path}.download"))
+
+    server.close()
+    if not all(checks):
+        raise SystemExit("下载校验未全部通过")
+    print("全部通过")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""将.pth权重转换为可内存映射的safetensors文件
+
+转换后的文件放在原权重旁（同名.safetensors），load_model会自动优先使用它。
+元数据中记录原权重的大小、修改时间和SHA-256，原权重变化后load_model回退到.pth文件。
+
+用法:
+    python -m tools.convert_checkpoint best_model.pth
+    python -m tools.convert_checkpoint best_model.pth -o weights/best_model.safetensors
+"""
+import argparse
+import os
+import torch
+
+from model import _safetensors_sibling, safetensors_source_metadata
+from utils.weights import save_safetensors, load_safetensors_mmap
+
+def main():
+    parser = argparse.ArgumentParser(description="将.pth权重转换为safetensors格式")
+    parser.add_argument('model_path', help=".pth权重文件路径")
+    parser.add_argument('-o', '--output', default=None, help="输出路径，默认与原权重同名的.safetensors文件")
+    args = parser.parse_args()
+
+    output_path = args.output or _safetensors_sibling(args.model_path)
+    if os.path.abspath(output_path) == os.path.abspath(args.model_path):
+        raise SystemExit("输出路径不能与输入路径相同")
+
+    state_dict = torch.load(args.model_path, map_location='cpu')
+    save_safetensors(state_dict, output_path, metadata=safetensors_source_metadata(args.model_path))
+
+    # 校验转换结果
+    converted, _ = load_safetensors_mmap(output_path)
+    for name, tensor in state_dict.items():
+        if not torch.equal(converted[name], tensor):
+            os.remove(output_path)
+            raise SystemExit(f"转换校验失败: {name}")
+
+    print(f"已保存 {output_path} ({os.path.getsize(output_path) / 1024 / 1024:.1f} MB, {len(state_dict)} 个张量)")
+
+if __name__ == '__main__':
+    main()
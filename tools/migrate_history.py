@@ -0,0 +1,38 @@
+"""把历史记录中的JSON预测结果迁移到prediction_topk表
+
+应用启动时会自动完成迁移；记录很多时可以先用本工具离线迁移并查看进度。
+每块在一个事务中提交，中断（Ctrl+C）后再次运行从上次提交的位置继续。
+
+用法:
+    python -m tools.migrate_history
+    python -m tools.migrate_history --db data/history.db --chunk-size 5000
+"""
+import argparse
+import time
+
+import utils.db as db
+
+def main():
+    parser = argparse.ArgumentParser(description="把历史记录中的JSON预测结果迁移到prediction_topk表")
+    parser.add_argument('--db', default=None, help="数据库路径，默认为data/history.db")
+    parser.add_argument('--chunk-size', type=int, default=db.TOPK_MIGRATION_CHUNK, help="每个事务处理的记录数")
+    parser.add_argument('--max-chunks', type=int, default=None, help="本次最多处理的块数，默认处理到末尾")
+    args = parser.parse_args()
+
+    if args.db:
+        db.DB_PATH = args.db
+        db.ensure_db_structure(migrate=False)
+
+    pending = db.topk_migration_pending()
+    print(f"待迁移记录: {pending}")
+    start_time = time.perf_counter()
+
+    def progress(last_id, migrated):
+        elapsed = time.perf_counter() - start_time
+        print(f"已处理到 id={last_id}，本次迁移 {migrated} 条，耗时 {elapsed:.1f}s")
+
+    migrated = db.migrate_prediction_topk(chunk_size=args.chunk_size, max_chunks=args.max_chunks, progress=progress)
+    print(f"本次迁移 {migrated} 条，剩余待迁移 {db.topk_migration_pending()} 条")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""从历史记录重建统计计数表和搜索索引
+
+类别、每日和反馈计数表以及FTS5搜索索引由数据库触发器维护；直接修改数据库文件、
+从备份恢复，或怀疑计数与记录不一致时，用本工具从prediction_history重新计算。
+
+用法:
+    python -m tools.rebuild_statistics
+    python -m tools.rebuild_statistics --db data/history.db
+"""
+import argparse
+import time
+
+import utils.db as db
+
+def main():
+    parser = argparse.ArgumentParser(description="从历史记录重建统计计数表和搜索索引")
+    parser.add_argument('--db', default=None, help="数据库路径，默认为data/history.db")
+    args = parser.parse_args()
+
+    if args.db:
+        db.DB_PATH = args.db
+        db.ensure_db_structure()
+
+    before = db.get_class_statistics()
+    start_time = time.perf_counter()
+    rows = db.rebuild_statistics()
+    elapsed = time.perf_counter() - start_time
+
+    print(f"重建完成，耗时 {elapsed:.2f}s")
+    for table, count in rows.items():
+        print(f"  {table}: {count} 行")
+    if sorted(before) != sorted(db.get_class_statistics()):
+        print("重建前的类别计数与记录不一致，已修正")
+    else:
+        print("类别计数与记录一致")
+
+    start_time = time.perf_counter()
+    indexed = db.rebuild_search_index()
+    if indexed is None:
+        print("当前SQLite不支持FTS5，搜索使用LIKE，无需重建索引")
+    else:
+        print(f"搜索索引重建完成，共 {indexed} 条记录，耗时 {time.perf_counter() - start_time:.2f}s")
+
+if __name__ == '__main__':
+    main()
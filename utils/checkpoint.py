@@ -0,0 +1,279 @@
+"""
+模型权重文件模块 - 断点续传下载、完整性校验与校验戳
+
+下载使用HTTP Range请求，中断后保留.download临时文件，下次从已下载的位置继续；
+顺序下载时边接收边计算SHA-256，无需下载完成后再读一遍文件。
+
+完整的SHA-256校验需要读完整个权重文件。校验通过后在权重旁写入一个校验戳
+（文件大小、修改时间、inode和已验证的摘要），之后启动时只要文件元数据与校验戳一致
+就跳过重新哈希；元数据变化或显式要求时才重新完整校验。
+"""
+import hashlib
+import json
+import os
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# 每次从网络读取的块大小
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+def file_sha256(path):
+    """计算文件内容的SHA-256（分块读取）"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as model_file:
+        for chunk in iter(lambda: model_file.read(8 * 1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def stamp_path(path):
+    """校验戳文件路径"""
+    return f"{path}.verified.json"
+
+def _file_identity(path):
+    """用于判断文件是否变化的元数据"""
+    stat = os.stat(path)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'inode': stat.st_ino,
+        'device': stat.st_dev,
+    }
+
+def write_verification_stamp(path, sha256):
+    """记录文件已通过校验"""
+    stamp = dict(_file_identity(path), sha256=sha256)
+    temporary_path = f"{stamp_path(path)}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as stamp_file:
+        json.dump(stamp, stamp_file)
+    os.replace(temporary_path, stamp_path(path))
+
+def read_verification_stamp(path):
+    """读取校验戳，不存在或损坏时返回None"""
+    try:
+        with open(stamp_path(path), encoding="utf-8") as stamp_file:
+            return json.load(stamp_file)
+    except (OSError, ValueError):
+        return None
+
+def has_valid_stamp(path, sha256):
+    """校验戳与当前文件元数据及期望摘要一致时返回True"""
+    stamp = read_verification_stamp(path)
+    if stamp is None:
+        return False
+    try:
+        identity = _file_identity(path)
+    except OSError:
+        return False
+    return stamp.get('sha256') == sha256 and all(stamp.get(key) == value for key, value in identity.items())
+
+def verify_file(path, size, sha256, force=False):
+    """检查文件是否完整
+
+    Args:
+        path: 文件路径
+        size: 期望的文件大小（字节）
+        sha256: 期望的SHA-256摘要
+        force: True时忽略校验戳，重新完整哈希
+
+    Returns:
+        bool: 文件是否存在且完整
+    """
+    if not os.path.exists(path) or os.path.getsize(path) != size:
+        return False
+    if not force and has_valid_stamp(path, sha256):
+        return True
+    if file_sha256(path) != sha256:
+        return False
+    write_verification_stamp(path, sha256)
+    return True
+
+def _open_range(url, start, end=None, timeout=60):
+    """发起Range请求，返回响应对象；end为None表示读到文件末尾"""
+    headers = {}
+    if start or end is not None:
+        headers['Range'] = f"bytes={start}-{'' if end is None else end}"
+    request = urllib.request.Request(url, headers=headers)
+    return urllib.request.urlopen(request, timeout=timeout)
+
+def _hash_file_prefix(digest, path, length):
+    """将文件前length字节加入摘要（续传时对已下载部分补算）"""
+    with open(path, "rb") as partial_file:
+        remaining = length
+        while remaining > 0:
+            chunk = partial_file.read(min(8 * 1024 * 1024, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+
+def _download_sequential(url, temporary_path, size, progress, timeout):
+    """顺序下载，支持断点续传，边下载边计算SHA-256"""
+    digest = hashlib.sha256()
+    parts_path = f"{temporary_path}.parts.json"
+    if os.path.exists(parts_path):
+        # 并发下载留下的预分配文件无法按前缀续传
+        os.remove(parts_path)
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    offset = os.path.getsize(temporary_path) if os.path.exists(temporary_path) else 0
+    if offset > size:
+        os.remove(temporary_path)
+        offset = 0
+    if offset == size:
+        _hash_file_prefix(digest, temporary_path, offset)
+        return digest.hexdigest()
+
+    response = _open_range(url, offset, timeout=timeout)
+    with response:
+        if offset and response.status != 206:
+            # 服务器不支持Range，从头开始下载
+            offset = 0
+        if offset:
+            _hash_file_prefix(digest, temporary_path, offset)
+
+        with open(temporary_path, "r+b" if offset else "wb") as output_file:
+            output_file.seek(offset)
+            output_file.truncate()
+            downloaded = offset
+            if progress:
+                progress(downloaded, size)
+            for chunk in iter(lambda: response.read(DOWNLOAD_CHUNK_SIZE), b""):
+                output_file.write(chunk)
+                digest.update(chunk)
+                downloaded += len(chunk)
+                if progress:
+                    progress(downloaded, size)
+    return digest.hexdigest()
+
+def _download_concurrent(url, temporary_path, size, progress, workers, timeout):
+    """将文件按区间并发下载，各区间独立续传
+
+    各区间的完成字节数记录在.parts.json中；主线程按区间顺序计算摘要，
+    已完成区间的数据刚写入磁盘，读取时命中页缓存。
+    """
+    parts_path = f"{temporary_path}.parts.json"
+    segment_size = -(-size // workers)
+    segments = [(start, min(start + segment_size, size)) for start in range(0, size, segment_size)]
+
+    done = [0] * len(segments)
+    if os.path.exists(temporary_path) and os.path.getsize(temporary_path) == size:
+        try:
+            with open(parts_path, encoding="utf-8") as parts_file:
+                saved = json.load(parts_file)
+            if saved.get('segments') == [list(segment) for segment in segments]:
+                done = saved['done']
+        except (OSError, ValueError):
+            pass
+    else:
+        with open(temporary_path, "wb") as output_file:
+            output_file.truncate(size)
+
+    lock = threading.Lock()
+    finished = [threading.Event() for _ in segments]
+
+    def save_parts():
+        with open(parts_path, "w", encoding="utf-8") as parts_file:
+            json.dump({'segments': [list(segment) for segment in segments], 'done': done}, parts_file)
+
+    def report():
+        if progress:
+            progress(sum(done), size)
+
+    def fetch(index):
+        start, end = segments[index]
+        try:
+            position = start + done[index]
+            if position >= end:
+                return
+            with _open_range(url, position, end - 1, timeout=timeout) as response:
+                if response.status != 206:
+                    raise RuntimeError("服务器不支持Range请求，无法并发下载")
+                fd = os.open(temporary_path, os.O_WRONLY)
+                try:
+                    for chunk in iter(lambda: response.read(DOWNLOAD_CHUNK_SIZE), b""):
+                        os.pwrite(fd, chunk, position)
+                        position += len(chunk)
+                        with lock:
+                            done[index] = position - start
+                            save_parts()
+                        report()
+                finally:
+                    os.close(fd)
+            if position < end:
+                # 连接提前结束，已完成的字节数已记录，下次从断点继续
+                raise RuntimeError("模型文件下载未完成，请稍后重试。")
+        finally:
+            finished[index].set()
+
+    digest = hashlib.sha256()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download") as executor:
+        futures = [executor.submit(fetch, index) for index in range(len(segments))]
+        with open(temporary_path, "rb") as input_file:
+            for index, (start, end) in enumerate(segments):
+                finished[index].wait()
+                futures[index].result()
+                input_file.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    chunk = input_file.read(min(8 * 1024 * 1024, remaining))
+                    digest.update(chunk)
+                    remaining -= len(chunk)
+
+    if os.path.exists(parts_path):
+        os.remove(parts_path)
+    return digest.hexdigest()
+
+def download_file(url, path, size, sha256, progress=None, workers=1, timeout=60):
+    """断点续传下载并校验文件
+
+    下载中断时保留path.download，再次调用会从已下载的位置继续。
+
+    Args:
+        url: 下载地址
+        path: 目标文件路径
+        size: 期望的文件大小（字节）
+        sha256: 期望的SHA-256摘要
+        progress: 进度回调，签名为progress(已下载字节数, 总字节数)
+        workers: 并发下载的区间数，1表示顺序下载
+        timeout: 单次网络请求超时时间（秒）
+
+    Returns:
+        目标文件路径
+    """
+    temporary_path = f"{path}.download"
+    if workers > 1:
+        actual_sha256 = _download_concurrent(url, temporary_path, size, progress, workers, timeout)
+    else:
+        actual_sha256 = _download_sequential(url, temporary_path, size, progress, timeout)
+
+    if os.path.getsize(temporary_path) < size:
+        # 连接提前结束，保留已下载部分供下次续传
+        raise RuntimeError("模型文件下载未完成，请稍后重试。")
+    if os.path.getsize(temporary_path) != size or actual_sha256 != sha256:
+        os.remove(temporary_path)
+        raise RuntimeError("模型文件完整性校验失败，请稍后重试。")
+
+    os.replace(temporary_path, path)
+    write_verification_stamp(path, sha256)
+    return path
+
+def ensure_model_file(path, url, size, sha256, force_verify=False, progress=None, workers=1):
+    """Download and verify the public release checkpoint when it is absent.
+
+    Args:
+        path: 权重文件路径
+        url: 下载地址
+        size: 期望的文件大小（字节）
+        sha256: 期望的SHA-256摘要
+        force_verify: True时忽略校验戳，对已有文件重新完整校验
+        progress: 下载进度回调，签名为progress(已下载字节数, 总字节数)
+        workers: 并发下载的区间数，1表示顺序下载
+
+    Returns:
+        权重文件路径
+    """
+    if verify_file(path, size, sha256, force=force_verify):
+        return path
+
+    return download_file(url, path, size, sha256, progress=progress, workers=workers)
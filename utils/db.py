@@ -1,33 +1,145 @@
 import sqlite3
+import base64
 import json
 import os
+import re
+import threading
+from contextlib import contextmanager
 import pandas as pd
 from datetime import datetime
+from utils.timing import latency_recorder
+from utils.class_names import CIFAR100_CHINESE_MAPPING
 
 # 数据库路径
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'history.db')
 
+# 连接参数：等待锁的最长时间（毫秒）与页缓存大小（KB）
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 16 * 1024
+
+# 每个线程复用自己的连接，按数据库路径区分
+_local = threading.local()
+
+# JSON结果迁移到prediction_topk表时每个事务处理的记录数
+TOPK_MIGRATION_CHUNK = 1000
+
+# IN查询每次携带的记录ID数，低于SQLite的变量数上限
+_IN_CHUNK = 500
+
+# 读取历史记录的列：已迁移的记录不再取出prediction_result的JSON文本
+HISTORY_COLUMNS = (
+    "id, image_path, timestamp, feedback, category, top1_class_id, top1_probability, "
+    "CASE WHEN top1_probability IS NULL THEN prediction_result END AS prediction_result"
+)
+
+# 可用于排序的字段
+SORT_COLUMNS = {
+    'timestamp': 'timestamp',
+    'id': 'id',
+    'probability': 'top1_probability',
+}
+
+# 游标分页的排序键，表达式与索引中的一致；没有概率的记录按-1排在最后（降序时）
+KEYSET_COLUMNS = {
+    'timestamp': 'timestamp',
+    'id': 'id',
+    'probability': 'IFNULL(top1_probability, -1)',
+}
+
+# 各数据库是否已建立FTS5搜索索引（SQLite未编译FTS5时退回LIKE搜索）
+_search_index_enabled = {}
+
+# 搜索索引的版本，分词方式或索引内容变化时递增，已有数据库在启动时重建索引和触发器
+SEARCH_INDEX_VERSION = '2'
+
+# 中日韩文字：unicode61分词器把连续的汉字作为一个词，索引前在每个字两侧加空格，使每个字成为一个词
+CJK_PATTERN = re.compile(r'([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af])')
+
+# 搜索索引中的类别文本：一条记录top-k类别的英文名和中文名
+SEARCH_CLASSES_SQL = (
+    "SELECT split_cjk(group_concat(c.name || ' ' || IFNULL(c.name_zh, ''), ' ')) FROM prediction_topk t "
+    "JOIN class_names c ON c.class_id = t.class_id WHERE t.record_id = {record_id}"
+)
+
+# 搜索索引中的反馈文本：反馈表单的JSON只取正确类别、最不准确的类别（批量反馈）和评论，不索引键名与评分
+SEARCH_FEEDBACK_SQL = (
+    "split_cjk(CASE WHEN json_valid({row}.feedback) THEN "
+    "CASE WHEN json_type({row}.feedback) = 'object' THEN "
+    "trim(IFNULL(json_extract({row}.feedback, '$.correct_class'), '') || ' ' || "
+    "IFNULL(json_extract({row}.feedback, '$.least_accurate_class'), '') || ' ' || "
+    "IFNULL(json_extract({row}.feedback, '$.comment'), '')) "
+    "ELSE {row}.feedback END "
+    "ELSE IFNULL({row}.feedback, '') END)"
+)
+
+def _split_cjk(text):
+    """在每个中日韩文字两侧加空格，供搜索索引和查询使用（注册为SQL函数split_cjk）"""
+    if text is None:
+        return None
+    return CJK_PATTERN.sub(r' \1 ', str(text))
+
+def get_connection(db_path=None):
+    """获取当前线程复用的数据库连接
+    
+    连接使用WAL日志模式，读写互不阻塞；synchronous=NORMAL在WAL下仍保证数据库一致，
+    只在系统掉电时可能丢失最后提交的事务；写事务使用BEGIN IMMEDIATE，
+    遇到锁时在busy_timeout内等待而不是立即失败。
+    
+    Args:
+        db_path: 数据库路径，None时使用DB_PATH
+        
+    Returns:
+        sqlite3.Connection，行类型为sqlite3.Row
+    """
+    db_path = db_path or DB_PATH
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level='IMMEDIATE')
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        # 搜索索引的触发器使用split_cjk分隔汉字
+        conn.create_function('split_cjk', 1, _split_cjk, deterministic=True)
+        connections[db_path] = conn
+    return conn
+
+@contextmanager
+def transaction(db_path=None):
+    """写事务：正常结束时提交，出现异常时回滚"""
+    conn = get_connection(db_path)
+    with conn:
+        yield conn
+
+def close_connection(db_path=None):
+    """关闭当前线程的数据库连接（线程结束时连接也会随之释放）"""
+    connections = getattr(_local, 'connections', {})
+    conn = connections.pop(db_path or DB_PATH, None)
+    if conn is not None:
+        conn.close()
+
 def init_db():
     """初始化数据库，创建必要的表"""
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # 历史记录表
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS prediction_history (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        image_path TEXT,
-        prediction_result TEXT,
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-        feedback TEXT,
-        category TEXT
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        # 历史记录表
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS prediction_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            image_path TEXT,
+            prediction_result TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            feedback TEXT,
+            category TEXT
+        )
+        ''')
     
     # 确保数据目录结构
     categories_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'categories')
@@ -36,11 +148,9 @@ def init_db():
     # 确保数据库结构
     ensure_db_structure()
 
+@latency_recorder.timed('save_prediction')
 def save_prediction(image_path, prediction_result):
     """保存预测结果到数据库"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
     # 将预测结果转换为JSON字符串
     prediction_json = json.dumps(prediction_result)
     
@@ -75,138 +185,340 @@ def save_prediction(image_path, prediction_result):
     else:
         new_image_path = image_path
     
-    cursor.execute(
-        "INSERT INTO prediction_history (image_path, prediction_result, timestamp, category) VALUES (?, ?, ?, ?)",
-        (new_image_path, prediction_json, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), top1_class)
+    top1 = prediction_result[0] if prediction_result else {}
+    with transaction() as conn:
+        cursor = conn.execute(
+            "INSERT INTO prediction_history (image_path, prediction_result, timestamp, category, "
+            "top1_class_id, top1_probability) VALUES (?, ?, ?, ?, ?, ?)",
+            (new_image_path, prediction_json, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), top1_class,
+             top1.get('class_id'), top1.get('probability'))
+        )
+        _write_topk(conn, cursor.lastrowid, prediction_result)
+    
+    return cursor.lastrowid
+
+def _write_topk(conn, record_id, prediction_result):
+    """把一条记录的top-k预测写入prediction_topk表，类别名写入class_names表"""
+    entries = [p for p in prediction_result if p.get('class_id') is not None]
+    conn.executemany(
+        "INSERT OR IGNORE INTO class_names (class_id, name, name_zh) VALUES (?, ?, ?)",
+        [(p['class_id'], p['class_name'], CIFAR100_CHINESE_MAPPING.get(p['class_name'])) for p in entries]
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO prediction_topk (record_id, rank, class_id, probability) VALUES (?, ?, ?, ?)",
+        [(record_id, rank, p['class_id'], p['probability']) for rank, p in enumerate(entries, 1)]
     )
+
+def _attach_topk(conn, records):
+    """从prediction_topk表读取top-k预测，填入各记录的prediction_result
     
-    conn.commit()
-    last_id = cursor.lastrowid
-    conn.close()
+    按记录ID分批查询，尚未迁移的旧记录（top1_probability为空）才解析JSON。
     
-    return last_id
+    Args:
+        conn: 数据库连接
+        records: 记录字典列表（需包含id、top1_probability和prediction_result）
+        
+    Returns:
+        records本身
+    """
+    ids = [record['id'] for record in records if record.get('top1_probability') is not None]
+    topk = {}
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start:start + _IN_CHUNK]
+        rows = conn.execute(
+            "SELECT t.record_id, t.class_id, c.name, t.probability FROM prediction_topk t "
+            "JOIN class_names c ON c.class_id = t.class_id "
+            f"WHERE t.record_id IN ({','.join(['?'] * len(chunk))}) ORDER BY t.record_id, t.rank",
+            chunk
+        )
+        for record_id, class_id, class_name, probability in rows:
+            topk.setdefault(record_id, []).append(
+                {'class_id': class_id, 'class_name': class_name, 'probability': probability}
+            )
+    
+    for record in records:
+        if record['id'] in topk:
+            record['prediction_result'] = topk[record['id']]
+        else:
+            record['prediction_result'] = json.loads(record['prediction_result'] or '[]')
+    return records
 
-def get_history(limit=100, offset=0, search_term=None, sort_by="timestamp", sort_order="DESC", category=None):
-    """获取预测历史记录
+def _get_meta(conn, key, default=None):
+    row = conn.execute("SELECT value FROM db_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row is not None else default
+
+def _set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO db_meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+def migrate_prediction_topk(chunk_size=TOPK_MIGRATION_CHUNK, max_chunks=None, progress=None):
+    """把prediction_result中的JSON迁移到prediction_topk表和top1列
     
-    参数:
-        limit: 每页显示的记录数
-        offset: 起始偏移量(用于分页)
-        search_term: 搜索关键词(在类别名称和反馈中搜索)
-        sort_by: 排序字段(id, timestamp, top1_class)
-        sort_order: 排序顺序(ASC或DESC)
-        category: 筛选特定类别
+    按id分块迁移，每块一个事务，已处理到的id记录在db_meta表中；
+    中断后再次调用会从上次提交的位置继续，已迁移的记录直接跳过。
+    
+    Args:
+        chunk_size: 每个事务处理的记录数
+        max_chunks: 本次最多处理的块数，None表示处理到末尾
+        progress: 进度回调，签名为progress(已处理到的记录id, 本次迁移的记录数)
+        
+    Returns:
+        int: 本次迁移的记录数
     """
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    migrated = 0
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        with transaction() as conn:
+            last_id = int(_get_meta(conn, 'topk_migration_last_id', 0))
+            rows = conn.execute(
+                "SELECT id, prediction_result, top1_probability FROM prediction_history "
+                "WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, chunk_size)
+            ).fetchall()
+            if not rows:
+                break
+            
+            for row in rows:
+                if row['top1_probability'] is not None:
+                    continue
+                try:
+                    prediction_result = json.loads(row['prediction_result'] or '[]')
+                except ValueError:
+                    continue
+                if not prediction_result or prediction_result[0].get('class_id') is None:
+                    continue
+                _write_topk(conn, row['id'], prediction_result)
+                conn.execute(
+                    "UPDATE prediction_history SET top1_class_id = ?, top1_probability = ? WHERE id = ?",
+                    (prediction_result[0]['class_id'], prediction_result[0]['probability'], row['id'])
+                )
+                migrated += 1
+            _set_meta(conn, 'topk_migration_last_id', rows[-1]['id'])
+        
+        chunks += 1
+        if progress:
+            progress(rows[-1]['id'], migrated)
     
-    # 构建查询语句
-    query = "SELECT * FROM prediction_history"
-    params = []
+    return migrated
+
+def topk_migration_pending():
+    """尚未迁移的记录数"""
+    conn = get_connection()
+    last_id = int(_get_meta(conn, 'topk_migration_last_id', 0))
+    return conn.execute(
+        "SELECT COUNT(*) FROM prediction_history WHERE id > ? AND top1_probability IS NULL", (last_id,)
+    ).fetchone()[0]
+
+def _search_match(search_term):
+    """把搜索框输入转换为FTS5查询：每个词按前缀匹配，多个词需同时出现
+    
+    下划线也作为分隔符，与索引的分词方式一致（maple_tree匹配maple和tree）；
+    汉字按单字分词，连续的汉字作为短语匹配相邻的字（识别匹配“图片识别得非常准确”）。
+    """
+    tokens = re.findall(r'[^\W_]+', search_term)
+    return ' '.join(f'"{" ".join(_split_cjk(token).split())}"*' for token in tokens)
+
+def _search_enabled(conn):
+    """当前数据库是否有FTS5搜索索引"""
+    if DB_PATH not in _search_index_enabled:
+        _search_index_enabled[DB_PATH] = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'history_fts'"
+        ).fetchone() is not None
+    return _search_index_enabled[DB_PATH]
+
+def _history_query(conn, columns, search_term=None, category=None, min_probability=None, extra=None):
+    """构建带筛选条件的历史记录查询
+    
+    有搜索词时与FTS5索引的匹配结果连接，匹配得分（bm25，越小越相关）可用match_rank排序。
+    extra为附加的(条件, 参数列表)，如游标分页的位置条件。
     
-    # 添加筛选条件
+    Returns:
+        (查询语句, 参数列表, 是否按全文索引搜索)
+    """
+    query = f"SELECT {columns} FROM prediction_history"
     conditions = []
+    params = []
+    searched = False
+    
+    if search_term:
+        if _search_enabled(conn):
+            match = _search_match(search_term)
+            if match:
+                query += (" JOIN (SELECT rowid AS match_id, rank AS match_rank FROM history_fts "
+                          "WHERE history_fts MATCH ?) ON match_id = id")
+                params.append(match)
+                searched = True
+            else:
+                # 搜索词中没有可检索的字符
+                conditions.append("0")
+        else:
+            conditions.append("(prediction_result LIKE ? OR feedback LIKE ?)")
+            params.extend([f"%{search_term}%", f"%{search_term}%"])
     
     if category:
         conditions.append("category = ?")
         params.append(category)
     
-    if search_term:
-        conditions.append("(prediction_result LIKE ? OR feedback LIKE ?)")
-        params.extend([f"%{search_term}%", f"%{search_term}%"])
+    if min_probability is not None:
+        conditions.append("top1_probability >= ?")
+        params.append(min_probability)
+    
+    if extra is not None:
+        conditions.append(extra[0])
+        params.extend(extra[1])
     
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
     
-    # 添加排序
-    sort_column = "timestamp"  # 默认按时间戳排序
-    if sort_by == "id":
-        sort_column = "id"
-    
-    query += f" ORDER BY {sort_column} {sort_order}"
-    
-    # 添加分页
-    query += " LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
+    return query, params, searched
+
+def get_history(limit=100, offset=0, search_term=None, sort_by="timestamp", sort_order="DESC", category=None,
+                min_probability=None):
+    """按LIMIT/OFFSET分页获取预测历史记录
     
-    cursor.execute(query, params)
+    应用内的分页使用get_history_page；此函数只保留给benchmarks.history_pagination，
+    作为对比OFFSET随页码深度变慢的基准。
     
-    results = []
-    for row in cursor.fetchall():
-        record = dict(row)
-        record['prediction_result'] = json.loads(record['prediction_result'])
-        results.append(record)
+    参数:
+        limit: 每页显示的记录数
+        offset: 起始偏移量(用于分页)
+        search_term: 搜索关键词(按前缀匹配类别的中英文名称和反馈内容)
+        sort_by: 排序字段(id, timestamp, probability, relevance)；relevance按搜索相关度排序，
+                 没有搜索词时按时间戳排序
+        sort_order: 排序顺序(ASC或DESC)
+        category: 筛选特定类别
+        min_probability: 只返回top1概率不低于该值的记录
     
-    conn.close()
-    return results
-
-def get_history_count(search_term=None, category=None):
-    """获取历史记录总数(用于分页)"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    Raises:
+        ValueError: sort_by或sort_order不是支持的取值
+    """
+    if sort_by not in SORT_COLUMNS and sort_by != "relevance":
+        raise ValueError(f"不支持的排序字段: {sort_by}")
+    sort_order = str(sort_order).upper()
+    if sort_order not in ("ASC", "DESC"):
+        raise ValueError(f"不支持的排序顺序: {sort_order}")
     
-    # 构建查询语句
-    query = "SELECT COUNT(*) FROM prediction_history"
-    params = []
+    conn = get_connection()
     
-    # 添加筛选条件
-    conditions = []
+    # 构建查询语句并添加筛选条件
+    query, params, searched = _history_query(conn, HISTORY_COLUMNS, search_term, category, min_probability)
     
-    if category:
-        conditions.append("category = ?")
-        params.append(category)
+    # 添加排序，默认按时间戳排序
+    if sort_by == "relevance" and searched:
+        query += " ORDER BY match_rank, id DESC"
+    else:
+        sort_column = SORT_COLUMNS.get(sort_by, "timestamp")
+        query += f" ORDER BY {sort_column} {sort_order}"
     
-    if search_term:
-        conditions.append("(prediction_result LIKE ? OR feedback LIKE ?)")
-        params.extend([f"%{search_term}%", f"%{search_term}%"])
+    # 添加分页
+    query += " LIMIT ? OFFSET ?"
+    params.extend([limit, offset])
     
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
+    records = [dict(row) for row in conn.execute(query, params).fetchall()]
+    return _attach_topk(conn, records)
+
+def _encode_cursor(sort_by, sort_order, position):
+    """把排序方式与上一页最后一条记录的位置编码为不透明的游标字符串"""
+    payload = json.dumps([sort_by, sort_order] + list(position), separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor, sort_by, sort_order):
+    """解析游标，返回位置列表；游标损坏或与当前排序方式不一致时抛出ValueError"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise ValueError("无效的分页游标") from e
+    if not isinstance(payload, list) or payload[:2] != [sort_by, sort_order]:
+        raise ValueError("分页游标与当前排序方式不一致")
+    return payload[2:]
+
+def get_history_page(limit=100, cursor=None, search_term=None, sort_by="timestamp", sort_order="DESC",
+                     category=None, min_probability=None):
+    """按游标分页获取预测历史记录
     
-    cursor.execute(query, params)
-    count = cursor.fetchone()[0]
+    以(排序字段, id)为键定位上一页的最后一条记录，配合(timestamp, id)、(category, timestamp, id)
+    等复合索引，每页的查询代价与页码深度无关。按相关度排序时匹配结果本身有限，游标中保存偏移量。
     
-    conn.close()
-    return count
+    Args:
+        limit: 每页的记录数
+        cursor: 上一次调用返回的游标，None表示第一页
+        search_term: 搜索关键词(按前缀匹配类别的中英文名称和反馈内容)
+        sort_by: 排序字段(id, timestamp, probability, relevance)
+        sort_order: 排序顺序(ASC或DESC)
+        category: 筛选特定类别
+        min_probability: 只返回top1概率不低于该值的记录
+        
+    Returns:
+        (记录列表, 下一页游标)；没有下一页时游标为None
+        
+    Raises:
+        ValueError: 游标无效或与当前排序方式不一致
+    """
+    conn = get_connection()
+    sort_order = "ASC" if str(sort_order).upper() == "ASC" else "DESC"
+    searched = bool(search_term) and _search_enabled(conn) and bool(_search_match(search_term))
+    if sort_by == "relevance" and searched:
+        offset = _decode_cursor(cursor, sort_by, sort_order)[0] if cursor else 0
+        query, params, _ = _history_query(conn, HISTORY_COLUMNS, search_term, category, min_probability)
+        query += " ORDER BY match_rank, id DESC LIMIT ? OFFSET ?"
+        params.extend([limit + 1, offset])
+        records = [dict(row) for row in conn.execute(query, params).fetchall()]
+        next_cursor = _encode_cursor(sort_by, sort_order, [offset + limit]) if len(records) > limit else None
+        return _attach_topk(conn, records[:limit]), next_cursor
+    
+    if sort_by not in KEYSET_COLUMNS:
+        sort_by = "timestamp"
+    sort_key = KEYSET_COLUMNS[sort_by]
+    
+    # 从上一页最后一条记录之后继续；先按排序键做范围查找，排序键相同时再比较id
+    extra = None
+    if cursor:
+        value, record_id = _decode_cursor(cursor, sort_by, sort_order)
+        op = '<' if sort_order == 'DESC' else '>'
+        extra = (f"{sort_key} {op}= ? AND ({sort_key} {op} ? OR id {op} ?)", [value, value, record_id])
+    
+    query, params, _ = _history_query(
+        conn, f"{HISTORY_COLUMNS}, {sort_key} AS sort_key", search_term, category, min_probability, extra
+    )
+    query += f" ORDER BY {sort_key} {sort_order}, id {sort_order} LIMIT ?"
+    params.append(limit + 1)
+    
+    records = [dict(row) for row in conn.execute(query, params).fetchall()]
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = _encode_cursor(sort_by, sort_order, [records[-1]['sort_key'], records[-1]['id']])
+    for record in records:
+        del record['sort_key']
+    return _attach_topk(conn, records), next_cursor
+
+def get_history_count(search_term=None, category=None, min_probability=None):
+    """获取历史记录总数(用于分页)"""
+    conn = get_connection()
+    query, params, _ = _history_query(conn, "COUNT(*)", search_term, category, min_probability)
+    return conn.execute(query, params).fetchone()[0]
 
 def get_class_statistics():
-    """获取类别统计信息"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT prediction_result FROM prediction_history")
-    
-    class_counts = {}
-    for row in cursor.fetchall():
-        prediction_result = json.loads(row['prediction_result'])
-        if prediction_result:
-            top1_class = prediction_result[0]['class_name']
-            class_counts[top1_class] = class_counts.get(top1_class, 0) + 1
-    
-    conn.close()
+    """获取类别统计信息，读取由触发器维护的class_counts计数表"""
+    conn = get_connection()
     
     # 按频率排序
-    sorted_counts = sorted(class_counts.items(), key=lambda x: x[1], reverse=True)
-    return sorted_counts
+    rows = conn.execute(
+        "SELECT c.name, s.count FROM class_counts s "
+        "JOIN class_names c ON c.class_id = s.class_id "
+        "ORDER BY s.count DESC"
+    ).fetchall()
+    return [(row['name'], row['count']) for row in rows]
 
 def batch_delete_records(record_ids):
     """批量删除历史记录"""
     if not record_ids:
         return 0
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
     placeholders = ','.join(['?'] * len(record_ids))
-    cursor.execute(f"DELETE FROM prediction_history WHERE id IN ({placeholders})", record_ids)
-    
-    deleted_count = cursor.rowcount
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        cursor = conn.execute(f"DELETE FROM prediction_history WHERE id IN ({placeholders})", record_ids)
     
-    return deleted_count
+    return cursor.rowcount
 
 def save_feedback(record_id, feedback):
     """保存用户反馈
@@ -219,20 +531,15 @@ def save_feedback(record_id, feedback):
         bool: 保存是否成功
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
         # 确保feedback是JSON字符串
         if not isinstance(feedback, str):
             feedback = json.dumps(feedback)
         
-        cursor.execute(
-            "UPDATE prediction_history SET feedback = ? WHERE id = ?",
-            (feedback, record_id)
-        )
-        
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            conn.execute(
+                "UPDATE prediction_history SET feedback = ? WHERE id = ?",
+                (feedback, record_id)
+            )
         return True
     except Exception as e:
         print(f"保存反馈失败: {str(e)}")
@@ -240,24 +547,20 @@ def save_feedback(record_id, feedback):
 
 def export_history(format='csv'):
     """导出历史记录为CSV或JSON格式"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM prediction_history ORDER BY timestamp DESC")
+    conn = get_connection()
     
+    records = [dict(row) for row in conn.execute(
+        f"SELECT {HISTORY_COLUMNS} FROM prediction_history ORDER BY timestamp DESC"
+    ).fetchall()]
     results = []
-    for row in cursor.fetchall():
-        record = dict(row)
-        record['prediction_result'] = json.loads(record['prediction_result'])
+    for record in _attach_topk(conn, records):
         # 提取top1预测结果和概率
         if record['prediction_result']:
             record['top1_class'] = record['prediction_result'][0]['class_name']
             record['top1_probability'] = record['prediction_result'][0]['probability']
+        del record['top1_class_id']
         results.append(record)
     
-    conn.close()
-    
     if format == 'csv':
         df = pd.DataFrame(results)
         return df.to_csv(index=False)
@@ -268,102 +571,341 @@ def export_history(format='csv'):
 
 def delete_record(record_id):
     """删除历史记录"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("DELETE FROM prediction_history WHERE id = ?", (record_id,))
-    
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("DELETE FROM prediction_history WHERE id = ?", (record_id,))
 
 def clear_history():
     """清空历史记录"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("DELETE FROM prediction_history")
-    
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("DELETE FROM prediction_topk")
+        conn.execute("DELETE FROM prediction_history")
 
 # 添加初始化函数，确保数据库表结构包含category字段
-def ensure_db_structure():
-    """确保数据库表结构包含所需字段"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # 检查是否存在category列
-    cursor.execute("PRAGMA table_info(prediction_history)")
-    columns = [col[1] for col in cursor.fetchall()]
+def ensure_db_structure(migrate=True):
+    """确保数据库表结构包含所需字段
     
-    if "category" not in columns:
-        cursor.execute("ALTER TABLE prediction_history ADD COLUMN category TEXT")
+    Args:
+        migrate: 是否同时把旧记录的JSON结果迁移到prediction_topk表
+    """
+    with transaction() as conn:
+        # 检查是否存在category列
+        columns = [col[1] for col in conn.execute("PRAGMA table_info(prediction_history)").fetchall()]
+        
+        if "category" not in columns:
+            conn.execute("ALTER TABLE prediction_history ADD COLUMN category TEXT")
+            
+            # 更新现有记录的category字段
+            for row in conn.execute("SELECT id, prediction_result FROM prediction_history").fetchall():
+                record_id, prediction_result = row
+                prediction_data = json.loads(prediction_result)
+                if prediction_data:
+                    top1_class = prediction_data[0]['class_name']
+                    conn.execute("UPDATE prediction_history SET category = ? WHERE id = ?", (top1_class, record_id))
         
-        # 更新现有记录的category字段
-        cursor.execute("SELECT id, prediction_result FROM prediction_history")
-        for row in cursor.fetchall():
-            record_id, prediction_result = row
-            prediction_data = json.loads(prediction_result)
-            if prediction_data:
-                top1_class = prediction_data[0]['class_name']
-                cursor.execute("UPDATE prediction_history SET category = ? WHERE id = ?", (top1_class, record_id))
-    
-    conn.commit()
-    conn.close()
+        # top1类别和概率列，用于按置信度筛选和排序
+        if "top1_class_id" not in columns:
+            conn.execute("ALTER TABLE prediction_history ADD COLUMN top1_class_id INTEGER")
+        if "top1_probability" not in columns:
+            conn.execute("ALTER TABLE prediction_history ADD COLUMN top1_probability REAL")
+        
+        # top-k预测明细表与类别名称表
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS prediction_topk (
+            record_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            class_id INTEGER NOT NULL,
+            probability REAL NOT NULL,
+            PRIMARY KEY (record_id, rank)
+        ) WITHOUT ROWID
+        ''')
+        conn.execute("CREATE TABLE IF NOT EXISTS class_names (class_id INTEGER PRIMARY KEY, name TEXT NOT NULL, name_zh TEXT)")
+        if "name_zh" not in [col[1] for col in conn.execute("PRAGMA table_info(class_names)").fetchall()]:
+            conn.execute("ALTER TABLE class_names ADD COLUMN name_zh TEXT")
+        conn.executemany(
+            "UPDATE class_names SET name_zh = ? WHERE name = ? AND name_zh IS NULL",
+            [(name_zh, name) for name, name_zh in CIFAR100_CHINESE_MAPPING.items()]
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS db_meta (key TEXT PRIMARY KEY, value TEXT)")
+        
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_topk_class_probability ON prediction_topk (class_id, probability)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_top1_class ON prediction_history (top1_class_id, top1_probability)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_top1_probability ON prediction_history (top1_probability)")
+        
+        # 游标分页使用的复合索引，与KEYSET_COLUMNS中的排序键一致
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_timestamp ON prediction_history (timestamp, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_category_timestamp ON prediction_history (category, timestamp, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_category_id ON prediction_history (category, id)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_history_probability_keyset "
+            "ON prediction_history (IFNULL(top1_probability, -1), id)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_history_category_probability_keyset "
+            "ON prediction_history (category, IFNULL(top1_probability, -1), id)"
+        )
+        
+        # 删除历史记录时一并删除其top-k明细
+        conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS prediction_history_delete_topk
+        AFTER DELETE ON prediction_history
+        BEGIN
+            DELETE FROM prediction_topk WHERE record_id = old.id;
+        END
+        ''')
+        
+        _create_statistics_tables(conn)
+        _search_index_enabled[DB_PATH] = _create_search_index(conn)
+    
+    # 把旧记录的JSON结果迁移到prediction_topk表，已迁移的部分会被跳过
+    if migrate:
+        migrate_prediction_topk()
 
-def get_categories():
-    """获取所有预测类别"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def _create_statistics_tables(conn):
+    """创建统计计数表及维护它们的触发器
     
-    cursor.execute("SELECT DISTINCT category FROM prediction_history WHERE category IS NOT NULL")
-    categories = [row[0] for row in cursor.fetchall()]
+    class_counts按top1类别、daily_counts按日期、feedback_counts按(类别, 反馈内容)计数，
+    由prediction_history上的插入、删除和更新触发器维护，统计页面不再扫描历史记录。
+    计数表首次创建时从现有记录重建。
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'class_counts'"
+    ).fetchone() is not None
+    
+    conn.execute("CREATE TABLE IF NOT EXISTS class_counts (class_id INTEGER PRIMARY KEY, count INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS daily_counts (day TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS feedback_counts (
+        category TEXT NOT NULL,
+        feedback TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (category, feedback)
+    ) WITHOUT ROWID
+    ''')
     
-    conn.close()
-    return categories
+    # 计数加减语句，{row}替换为new或old，{delta}为+1或-1
+    class_sql = '''
+        INSERT OR IGNORE INTO class_counts (class_id, count)
+            SELECT {row}.top1_class_id, 0 WHERE {row}.top1_class_id IS NOT NULL;
+        UPDATE class_counts SET count = count {delta} WHERE class_id = {row}.top1_class_id;
+        DELETE FROM class_counts WHERE class_id = {row}.top1_class_id AND count <= 0;
+    '''
+    daily_sql = '''
+        INSERT OR IGNORE INTO daily_counts (day, count)
+            SELECT date({row}.timestamp), 0 WHERE {row}.timestamp IS NOT NULL;
+        UPDATE daily_counts SET count = count {delta} WHERE day = date({row}.timestamp);
+        DELETE FROM daily_counts WHERE day = date({row}.timestamp) AND count <= 0;
+    '''
+    feedback_sql = '''
+        INSERT OR IGNORE INTO feedback_counts (category, feedback, count)
+            SELECT IFNULL({row}.category, ''), {row}.feedback, 0 WHERE {row}.feedback IS NOT NULL;
+        UPDATE feedback_counts SET count = count {delta}
+            WHERE category = IFNULL({row}.category, '') AND feedback = {row}.feedback;
+        DELETE FROM feedback_counts
+            WHERE category = IFNULL({row}.category, '') AND feedback = {row}.feedback AND count <= 0;
+    '''
+    
+    def increment(*templates):
+        return ''.join(template.format(row='new', delta='+ 1') for template in templates)
+    
+    def decrement(*templates):
+        return ''.join(template.format(row='old', delta='- 1') for template in templates)
+    
+    triggers = {
+        'statistics_insert': (
+            "AFTER INSERT ON prediction_history",
+            increment(class_sql, daily_sql, feedback_sql)
+        ),
+        'statistics_delete': (
+            "AFTER DELETE ON prediction_history",
+            decrement(class_sql, daily_sql, feedback_sql)
+        ),
+        # 迁移旧记录时会更新top1_class_id
+        'statistics_update_class': (
+            "AFTER UPDATE OF top1_class_id ON prediction_history "
+            "WHEN old.top1_class_id IS NOT new.top1_class_id",
+            decrement(class_sql) + increment(class_sql)
+        ),
+        'statistics_update_feedback': (
+            "AFTER UPDATE OF feedback, category ON prediction_history "
+            "WHEN old.feedback IS NOT new.feedback OR old.category IS NOT new.category",
+            decrement(feedback_sql) + increment(feedback_sql)
+        ),
+    }
+    for name, (event, body) in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+    
+    if not exists:
+        _rebuild_statistics(conn)
+
+def _rebuild_statistics(conn):
+    conn.execute("DELETE FROM class_counts")
+    conn.execute("DELETE FROM daily_counts")
+    conn.execute("DELETE FROM feedback_counts")
+    conn.execute(
+        "INSERT INTO class_counts (class_id, count) "
+        "SELECT top1_class_id, COUNT(*) FROM prediction_history "
+        "WHERE top1_class_id IS NOT NULL GROUP BY top1_class_id"
+    )
+    conn.execute(
+        "INSERT INTO daily_counts (day, count) "
+        "SELECT date(timestamp), COUNT(*) FROM prediction_history "
+        "WHERE timestamp IS NOT NULL GROUP BY date(timestamp)"
+    )
+    conn.execute(
+        "INSERT INTO feedback_counts (category, feedback, count) "
+        "SELECT IFNULL(category, ''), feedback, COUNT(*) FROM prediction_history "
+        "WHERE feedback IS NOT NULL GROUP BY IFNULL(category, ''), feedback"
+    )
 
-def get_history_by_category(category, limit=100, offset=0, sort_by="timestamp", sort_order="DESC"):
-    """获取指定类别的历史记录"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+def rebuild_statistics():
+    """从历史记录重新计算全部统计计数表（计数与记录不一致时使用）
     
-    # 构建查询语句
-    query = "SELECT * FROM prediction_history WHERE category = ?"
-    params = [category]
+    Returns:
+        dict: 重建后各计数表的行数
+    """
+    with transaction() as conn:
+        _rebuild_statistics(conn)
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ('class_counts', 'daily_counts', 'feedback_counts')
+        }
+
+def _create_search_index(conn):
+    """创建FTS5搜索索引及维护它的触发器
     
-    # 添加排序
-    sort_column = "timestamp"  # 默认按时间戳排序
-    if sort_by == "id":
-        sort_column = "id"
+    history_fts以记录id为rowid，classes列为top-k类别的中英文名称，feedback_text列为反馈文本，
+    汉字经split_cjk逐字分隔后索引；写入记录、写入top-k明细、更新反馈和删除记录时由触发器同步。
+    索引首次创建或SEARCH_INDEX_VERSION变化时重建触发器并从现有记录重建索引。
     
-    query += f" ORDER BY {sort_column} {sort_order}"
+    Returns:
+        bool: 是否可用（SQLite未编译FTS5时返回False）
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'history_fts'").fetchone() is not None
+    rebuild = not exists or _get_meta(conn, 'search_index_version') != SEARCH_INDEX_VERSION
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts "
+            "USING fts5(classes, feedback_text, tokenize = 'unicode61')"
+        )
+    except sqlite3.OperationalError:
+        return False
     
-    # 添加分页
-    query += " LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
+    classes = SEARCH_CLASSES_SQL.format(record_id='new.record_id')
+    triggers = {
+        'search_insert': (
+            "AFTER INSERT ON prediction_history",
+            "INSERT INTO history_fts (rowid, classes, feedback_text) VALUES "
+            f"(new.id, IFNULL(({SEARCH_CLASSES_SQL.format(record_id='new.id')}), ''), "
+            f"{SEARCH_FEEDBACK_SQL.format(row='new')});"
+        ),
+        # top-k明细在主记录之后写入
+        'search_topk': (
+            "AFTER INSERT ON prediction_topk",
+            f"UPDATE history_fts SET classes = IFNULL(({classes}), '') WHERE rowid = new.record_id;"
+        ),
+        'search_feedback': (
+            "AFTER UPDATE OF feedback ON prediction_history",
+            f"UPDATE history_fts SET feedback_text = {SEARCH_FEEDBACK_SQL.format(row='new')} WHERE rowid = new.id;"
+        ),
+        'search_delete': (
+            "AFTER DELETE ON prediction_history",
+            "DELETE FROM history_fts WHERE rowid = old.id;"
+        ),
+    }
+    for name, (event, body) in triggers.items():
+        if rebuild:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+    
+    if rebuild:
+        _rebuild_search_index(conn)
+        _set_meta(conn, 'search_index_version', SEARCH_INDEX_VERSION)
+    return True
+
+def _rebuild_search_index(conn):
+    conn.execute("DELETE FROM history_fts")
+    conn.execute(
+        "INSERT INTO history_fts (rowid, classes, feedback_text) "
+        f"SELECT h.id, IFNULL(({SEARCH_CLASSES_SQL.format(record_id='h.id')}), split_cjk(IFNULL(h.category, ''))), "
+        f"{SEARCH_FEEDBACK_SQL.format(row='h')} FROM prediction_history h"
+    )
+    conn.execute("INSERT INTO history_fts (history_fts) VALUES ('optimize')")
+
+def rebuild_search_index():
+    """从历史记录重建FTS5搜索索引
     
-    cursor.execute(query, params)
+    Returns:
+        int: 索引的记录数；SQLite不支持FTS5时返回None
+    """
+    with transaction() as conn:
+        if not _search_enabled(conn):
+            return None
+        _rebuild_search_index(conn)
+        return conn.execute("SELECT COUNT(*) FROM history_fts").fetchone()[0]
+
+def get_daily_counts(days=None):
+    """获取每日预测数量
     
-    results = []
-    for row in cursor.fetchall():
-        record = dict(row)
-        record['prediction_result'] = json.loads(record['prediction_result'])
-        results.append(record)
+    Args:
+        days: 只返回最近的天数，None表示全部
+        
+    Returns:
+        按日期升序的[(日期, 数量)]列表
+    """
+    conn = get_connection()
+    rows = conn.execute(
+        "SELECT day, count FROM daily_counts ORDER BY day DESC LIMIT ?",
+        (-1 if days is None else days,)
+    ).fetchall()
+    return [(row['day'], row['count']) for row in reversed(rows)]
+
+def get_feedback_statistics(category=None):
+    """获取反馈内容的计数
+    
+    Args:
+        category: 只统计该类别的记录，None表示全部类别
+        
+    Returns:
+        按次数降序的[(反馈内容, 次数)]列表
+    """
+    conn = get_connection()
+    if category is not None:
+        rows = conn.execute(
+            "SELECT feedback, count FROM feedback_counts WHERE category = ? ORDER BY count DESC",
+            (category,)
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            "SELECT feedback, SUM(count) AS count FROM feedback_counts GROUP BY feedback ORDER BY count DESC"
+        ).fetchall()
+    return [(row['feedback'], row['count']) for row in rows]
+
+def get_record(record_id):
+    """获取单条历史记录，不存在时返回None"""
+    conn = get_connection()
+    row = conn.execute(f"SELECT {HISTORY_COLUMNS} FROM prediction_history WHERE id = ?", (record_id,)).fetchone()
+    if row is None:
+        return None
+    return _attach_topk(conn, [dict(row)])[0]
+
+def get_categories():
+    """获取所有预测类别"""
+    conn = get_connection()
+    rows = conn.execute("SELECT DISTINCT category FROM prediction_history WHERE category IS NOT NULL").fetchall()
+    return [row[0] for row in rows]
+
+def get_history_by_category(category, limit=100, cursor=None, sort_by="timestamp", sort_order="DESC"):
+    """按游标分页获取指定类别的历史记录，使用(category, timestamp, id)等复合索引，见get_history_page
     
-    conn.close()
-    return results
+    Returns:
+        (记录列表, 下一页游标)；没有下一页时游标为None
+    """
+    return get_history_page(limit=limit, cursor=cursor, sort_by=sort_by, sort_order=sort_order, category=category)
 
 def get_history_count_by_category(category):
     """获取指定类别的历史记录数量"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT COUNT(*) FROM prediction_history WHERE category = ?", (category,))
-    count = cursor.fetchone()[0]
-    
-    conn.close()
-    return count
+    conn = get_connection()
+    return conn.execute("SELECT COUNT(*) FROM prediction_history WHERE category = ?", (category,)).fetchone()[0]
 
 # 初始化数据库
 init_db() 
\ No newline at end of file
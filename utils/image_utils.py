@@ -5,7 +5,9 @@ import io
 import base64
 import tempfile
 from datetime import datetime
+from utils.timing import latency_recorder
 
+@latency_recorder.timed('file_save')
 def save_uploaded_image(uploaded_file):
     """保存上传的图像到临时目录，并返回路径
     
@@ -75,6 +77,7 @@ def get_file_extension(filename):
     """
     return os.path.splitext(filename)[1].lower()
 
+@latency_recorder.timed('upload_validation')
 def is_valid_image(file):
     """检查文件是否为有效的图像文件
     
@@ -200,4 +203,23 @@ def optimize_image(image_path, max_size=(800, 800), quality=85):
         return optimized_path
     except Exception as e:
         print(f"图像优化错误: {str(e)}")
-        return image_path  # 如果优化失败，返回原始路径 
\ No newline at end of file
+        return image_path  # 如果优化失败，返回原始路径 
+
+
+# 本地评估使用的图像扩展名
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+def list_labeled_images(directory):
+    """递归列出目录中的图像，以所在子目录名作为标签（如data/categories/apple/*.jpg）
+    
+    Args:
+        directory: 图像根目录
+        
+    Returns:
+        list: (图像路径, 标签)列表，按路径排序
+    """
+    images = []
+    for root, _, files in os.walk(directory):
+        label = os.path.basename(root) if os.path.abspath(root) != os.path.abspath(directory) else None
+        images.extend((os.path.join(root, name), label) for name in files if name.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(images)
@@ -0,0 +1,207 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class BackgroundModelLoader:
+    """在后台线程中下载并加载模型
+
+    页面渲染不再等待模型；需要模型的地方调用wait()或轮询status()，加载失败后可调用retry()重新加载。
+    加载函数接收一个report(message, state=None, **details)回调，用于汇报当前进度，
+    也可以切换到WARMING状态并附带预热结果等详情；readiness()供界面和健康检查使用。
+    """
+
+    PENDING = 'pending'
+    LOADING = 'loading'
+    WARMING = 'warming'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    def __init__(self, load_fn):
+        """
+        Args:
+            load_fn: 加载函数，签名为load_fn(report)，返回(model, device)
+        """
+        self._load_fn = load_fn
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+        self._state = self.PENDING
+        self._message = "等待加载"
+        self._result = None
+        self._error = None
+        self._started_at = None
+        self._finished_at = None
+        self._loaded_at = None
+        self._details = {}
+        self._serving = False
+
+    def start(self):
+        """启动后台加载线程，重复调用无副作用"""
+        with self._lock:
+            if self._thread is None:
+                self._start_thread()
+        return self
+
+    def retry(self):
+        """加载失败后重新启动后台加载线程（如下载临时中断），未失败时无副作用
+
+        Returns:
+            是否重新开始了加载
+        """
+        with self._lock:
+            if self._state != self.FAILED:
+                return False
+            self._done = threading.Event()
+            self._message = "重新加载"
+            self._result = None
+            self._error = None
+            self._finished_at = None
+            self._loaded_at = None
+            self._details = {}
+            self._start_thread()
+        return True
+
+    def _start_thread(self):
+        self._state = self.LOADING
+        self._started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+        self._thread.start()
+
+    def report(self, message, state=None, **details):
+        """更新加载进度说明
+
+        Args:
+            message: 进度说明
+            state: 切换到的状态（如WARMING），None表示不变
+            **details: 附加详情，如预热结果warmup
+        """
+        with self._lock:
+            self._message = message
+            if state is not None:
+                self._state = state
+                if state == self.WARMING:
+                    self._loaded_at = time.time()
+            self._details.update(details)
+
+    def mark_serving(self):
+        """标记推理服务已开始接收请求（收到第一个分类请求时调用）"""
+        with self._lock:
+            self._serving = True
+
+    def _run(self):
+        try:
+            result = self._load_fn(self.report)
+        except Exception as e:
+            with self._lock:
+                self._state = self.FAILED
+                self._error = e
+                self._message = f"加载失败: {str(e)}"
+                self._finished_at = time.time()
+        else:
+            with self._lock:
+                self._state = self.READY
+                self._result = result
+                self._message = "模型已就绪"
+                self._finished_at = time.time()
+                self._loaded_at = self._loaded_at or self._finished_at
+        finally:
+            self._done.set()
+
+    @property
+    def is_ready(self):
+        return self._state == self.READY
+
+    @property
+    def is_failed(self):
+        return self._state == self.FAILED
+
+    def status(self):
+        """返回当前状态、进度说明、错误信息和已耗时（秒）"""
+        with self._lock:
+            end_time = self._finished_at or time.time()
+            return {
+                'state': self._state,
+                'message': self._message,
+                'error': str(self._error) if self._error else None,
+                'elapsed': end_time - self._started_at if self._started_at else 0.0,
+            }
+
+    def readiness(self):
+        """返回就绪探针信息：是否已加载、已预热、正在服务，以及预热耗时
+
+        Returns:
+            dict: state、loaded、warmed、serving、ready、load_seconds、warmup（预热结果，未预热时为None）和error
+        """
+        with self._lock:
+            loaded = self._state in (self.WARMING, self.READY)
+            warmup = self._details.get('warmup')
+            return {
+                'state': self._state,
+                'loaded': loaded,
+                'warmed': self._state == self.READY and warmup is not None,
+                'serving': self._state == self.READY and self._serving,
+                'ready': self._state == self.READY,
+                'load_seconds': self._loaded_at - self._started_at if loaded and self._started_at else None,
+                'warmup': warmup,
+                'error': str(self._error) if self._error else None,
+            }
+
+    def wait(self, timeout=None):
+        """等待加载完成
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            (model, device)；超时返回None
+
+        Raises:
+            加载失败时重新抛出加载过程中的异常
+        """
+        if not self._done.wait(timeout):
+            return None
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+def start_health_server(loader, port, host='0.0.0.0'):
+    """在独立端口上启动就绪探针HTTP服务（守护线程）
+
+    Streamlit对所有路径都返回同一个页面，内容通过websocket渲染，HTTP探针无法读取，
+    因此就绪状态由这个独立的监听端口提供：GET /health（或/ready）返回readiness()的JSON，
+    就绪时状态码为200，否则为503。
+
+    Args:
+        loader: BackgroundModelLoader实例
+        port: 监听端口
+        host: 监听地址
+
+    Returns:
+        ThreadingHTTPServer实例；端口被占用等原因无法监听时返回None
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/health', '/ready'):
+                self.send_error(404)
+                return
+            readiness = loader.readiness()
+            body = json.dumps(readiness, ensure_ascii=False).encode('utf-8')
+            self.send_response(200 if readiness['ready'] else 503)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # 探针请求频繁，不写访问日志
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        print(f"就绪探针端口 {port} 无法监听: {str(e)}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="health-server", daemon=True).start()
+    return server
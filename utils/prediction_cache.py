@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+# 缓存数据库路径，与历史记录数据库放在同一目录
+CACHE_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'prediction_cache.db')
+
+def hash_image_bytes(image_bytes):
+    """计算图像文件内容的SHA-256"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+class PredictionCache:
+    """按图像内容哈希缓存预测结果
+
+    两级缓存：进程内有界LRU + SQLite持久化。缓存键由图像内容SHA-256、
+    模型权重标识和top_k组成，权重变化后旧结果自然失效。持久化缓存超过
+    max_disk_entries条时按写入顺序淘汰最早的条目（包括其他权重标识下的旧结果）。
+    """
+
+    def __init__(self, model_hash, db_path=CACHE_DB_PATH, max_entries=1024, max_disk_entries=100000):
+        """
+        Args:
+            model_hash: 模型权重标识（如权重文件SHA-256加精度模式）
+            db_path: 持久化缓存的SQLite路径，None表示只使用内存缓存
+            max_entries: 内存LRU缓存的最大条目数
+            max_disk_entries: 持久化缓存的最大条目数
+        """
+        self.model_hash = model_hash
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        # 持久化缓存的条目数，启动时统计一次，之后随写入和淘汰更新，不在每次读取统计时扫描表
+        self._disk_entries = 0
+
+        if self.db_path:
+            self._init_db()
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS prediction_cache (
+            cache_key TEXT PRIMARY KEY,
+            prediction_result TEXT,
+            created_at DATETIME
+        )
+        ''')
+        conn.commit()
+        self._disk_entries = conn.execute("SELECT COUNT(*) FROM prediction_cache").fetchone()[0]
+        conn.close()
+
+    def make_key(self, image_bytes, top_k):
+        """生成缓存键"""
+        return f"{hash_image_bytes(image_bytes)}:{self.model_hash}:{top_k}"
+
+    def get(self, image_bytes, top_k=5):
+        """查询缓存，未命中时返回None
+
+        Args:
+            image_bytes: 图像文件的原始字节
+            top_k: 预测结果数量
+
+        Returns:
+            预测结果列表或None
+        """
+        key = self.make_key(image_bytes, top_k)
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return self._memory[key]
+
+        result = self._get_from_db(key)
+
+        with self._lock:
+            if result is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['disk_hits'] += 1
+            self._remember(key, result)
+        return result
+
+    def put(self, image_bytes, top_k, result):
+        """写入缓存
+
+        Args:
+            image_bytes: 图像文件的原始字节
+            top_k: 预测结果数量
+            result: 预测结果列表
+        """
+        key = self.make_key(image_bytes, top_k)
+        with self._lock:
+            self._remember(key, result)
+        self._put_to_db(key, result)
+
+    def stats(self):
+        """返回命中统计：内存命中、磁盘命中、未命中、命中率以及当前条目数"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+            stats['disk_entries'] = self._disk_entries
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """清空内存和持久化缓存"""
+        with self._lock:
+            self._memory.clear()
+            self._disk_entries = 0
+        if self.db_path:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("DELETE FROM prediction_cache")
+            conn.commit()
+            conn.close()
+
+    def _remember(self, key, result):
+        """写入内存LRU，超出容量时淘汰最久未使用的条目（调用方持有锁）"""
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _get_from_db(self, key):
+        if not self.db_path:
+            return None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            row = conn.execute(
+                "SELECT prediction_result FROM prediction_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            conn.close()
+        except Exception as e:
+            print(f"读取预测缓存失败: {str(e)}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def _put_to_db(self, key, result):
+        if not self.db_path:
+            return
+        try:
+            conn = sqlite3.connect(self.db_path)
+            values = (json.dumps(result), datetime.now().strftime('%Y-%m-%d %H:%M:%S'), key)
+            added = conn.execute(
+                "INSERT OR IGNORE INTO prediction_cache (prediction_result, created_at, cache_key) VALUES (?, ?, ?)",
+                values
+            ).rowcount
+            if not added:
+                conn.execute(
+                    "UPDATE prediction_cache SET prediction_result = ?, created_at = ? WHERE cache_key = ?", values
+                )
+            with self._lock:
+                self._disk_entries += added
+                over_limit = self._disk_entries > self.max_disk_entries
+            if over_limit:
+                self._evict_db_entries(conn)
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"写入预测缓存失败: {str(e)}")
+
+    def _evict_db_entries(self, conn):
+        """按写入顺序（rowid）淘汰最早的条目，额外多淘汰10%的容量，避免之后每次写入都触发淘汰
+
+        多个进程共用缓存文件时各自的计数可能与实际不符，淘汰前重新统计一次条目数。
+        """
+        count = conn.execute("SELECT COUNT(*) FROM prediction_cache").fetchone()[0]
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            excess = min(count, excess + self.max_disk_entries // 10)
+            conn.execute(
+                "DELETE FROM prediction_cache WHERE rowid IN "
+                "(SELECT rowid FROM prediction_cache ORDER BY rowid LIMIT ?)",
+                (excess,)
+            )
+            count -= excess
+        with self._lock:
+            self._disk_entries = count
@@ -0,0 +1,150 @@
+"""
+耗时统计模块 - 记录请求链路各阶段的延迟
+
+每个阶段保留最近的若干个样本，用于计算p50/p95/p99；可选地将样本批量写入SQLite，
+便于在生产负载下离线分析延迟分布。
+"""
+import functools
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# 请求链路的各个阶段（用于诊断面板的展示顺序）
+STAGES = (
+    'upload_validation',
+    'file_save',
+    'decode',
+    'preprocess',
+    'forward',
+    'topk_format',
+    'save_prediction',
+    'render',
+)
+
+def _percentile(sorted_samples, percent):
+    """最近秩法计算百分位数"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, int(round(percent / 100.0 * len(sorted_samples))))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+class LatencyRecorder:
+    """线程安全的分阶段延迟记录器"""
+
+    def __init__(self, max_samples=2048, flush_every=50):
+        """
+        Args:
+            max_samples: 每个阶段保留的最近样本数
+            flush_every: 开启持久化时，累计多少条样本写一次数据库
+        """
+        self.max_samples = max_samples
+        self.flush_every = flush_every
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._db_path = None
+        self._pending = []
+
+    def enable_persistence(self, db_path):
+        """开启持久化，样本写入db_path中的stage_latency表"""
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = sqlite3.connect(db_path)
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS stage_latency (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stage TEXT,
+            duration_ms REAL,
+            timestamp DATETIME
+        )
+        ''')
+        conn.commit()
+        conn.close()
+        self._db_path = db_path
+
+    def record(self, stage, duration_ms):
+        """记录一次阶段耗时（毫秒）"""
+        flush = False
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self.max_samples)
+                self._counts[stage] = 0
+            self._samples[stage].append(duration_ms)
+            self._counts[stage] += 1
+            if self._db_path:
+                self._pending.append((stage, duration_ms, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+                flush = len(self._pending) >= self.flush_every
+        if flush:
+            self.flush()
+
+    @contextmanager
+    def stage(self, name):
+        """计时上下文管理器：with recorder.stage('decode'): ..."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start_time) * 1000)
+
+    def timed(self, name=None):
+        """计时装饰器，name为None时使用函数名作为阶段名"""
+        def decorator(func):
+            stage_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self):
+        """返回各阶段统计：总次数、样本数、平均值、p50、p95、p99、最大值（毫秒）"""
+        with self._lock:
+            snapshot = {stage: (list(samples), self._counts[stage]) for stage, samples in self._samples.items()}
+
+        summary = {}
+        for stage, (samples, count) in snapshot.items():
+            samples.sort()
+            summary[stage] = {
+                'count': count,
+                'samples': len(samples),
+                'mean': sum(samples) / len(samples) if samples else 0.0,
+                'p50': _percentile(samples, 50),
+                'p95': _percentile(samples, 95),
+                'p99': _percentile(samples, 99),
+                'max': samples[-1] if samples else 0.0,
+            }
+        return summary
+
+    def flush(self):
+        """将待写入的样本批量写入数据库"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            db_path = self._db_path
+        if not pending or not db_path:
+            return
+        try:
+            conn = sqlite3.connect(db_path)
+            conn.executemany(
+                "INSERT INTO stage_latency (stage, duration_ms, timestamp) VALUES (?, ?, ?)",
+                pending
+            )
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"耗时样本写入失败: {str(e)}")
+
+    def reset(self):
+        """清空内存中的样本"""
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+# 进程级共享的记录器
+latency_recorder = LatencyRecorder()
+stage = latency_recorder.stage
+timed = latency_recorder.timed
@@ -0,0 +1,178 @@
+"""
+Token合并模块 - 在ViT分支的Transformer块之间合并相似的patch token（ToMe风格）
+
+每个块的注意力之后，按注意力key的余弦相似度做二分图匹配：token交替分为A、B两组，
+A组中与B组最相似的r个token合并到其匹配对象（按已合并的token数加权平均），
+后续块处理的token数随之减少。class token不参与合并，分类头的输入保持不变。
+合并后的token在注意力中按其代表的token数加权（proportional attention）。
+
+启用方式是替换timm VisionTransformer、Block和Attention实例的类，权重与state_dict不变，
+可以随时恢复为原始实现。
+"""
+import torch
+import torch.nn.functional as F
+from timm.models.vision_transformer import VisionTransformer, Block, Attention
+
+def bipartite_soft_matching(metric, r, class_token=True):
+    """计算一次二分图软匹配，返回合并函数
+
+    Args:
+        metric: 相似度度量，形状为(B, N, C)
+        r: 本次合并的token数
+        class_token: 第一个token是否为class token（不参与合并）
+
+    Returns:
+        merge(x, mode)函数，将(B, N, C)的张量合并为(B, N - r, C)
+    """
+    with torch.no_grad():
+        metric = metric / metric.norm(dim=-1, keepdim=True)
+        a, b = metric[..., ::2, :], metric[..., 1::2, :]
+        scores = a @ b.transpose(-1, -2)
+        if class_token:
+            scores[..., 0, :] = -float('inf')
+
+        node_max, node_idx = scores.max(dim=-1)
+        edge_idx = node_max.argsort(dim=-1, descending=True)[..., None]
+        unmerged_idx = edge_idx[..., r:, :]
+        src_idx = edge_idx[..., :r, :]
+        dst_idx = node_idx[..., None].gather(dim=-2, index=src_idx)
+        if class_token:
+            # 保证class token仍位于第一个位置
+            unmerged_idx = unmerged_idx.sort(dim=1)[0]
+
+    def merge(x, mode='sum'):
+        src, dst = x[..., ::2, :], x[..., 1::2, :]
+        n, t1, c = src.shape
+        unmerged = src.gather(dim=-2, index=unmerged_idx.expand(n, t1 - r, c))
+        src = src.gather(dim=-2, index=src_idx.expand(n, r, c))
+        dst = dst.scatter_reduce(-2, dst_idx.expand(n, r, c), src, reduce=mode)
+        return torch.cat([unmerged, dst], dim=1)
+
+    return merge
+
+def merge_weighted_average(merge, x, size):
+    """按每个token代表的原始token数加权平均合并，返回合并后的token和新的size"""
+    x = merge(x * size, mode='sum')
+    size = merge(size, mode='sum')
+    return x / size, size
+
+class ToMeAttention(Attention):
+    """返回注意力输出和key（作为合并的相似度度量），并按token大小加权注意力"""
+
+    def forward(self, x, size=None):
+        B, N, C = x.shape
+        qkv = self.qkv(x).reshape(B, N, 3, self.num_heads, self.head_dim).permute(2, 0, 3, 1, 4)
+        q, k, v = qkv.unbind(0)
+        q, k = self.q_norm(q), self.k_norm(k)
+
+        # 合并后的token代表多个原始token，在softmax前加上log(size)
+        attn_bias = size.log()[:, None, None, :, 0] if size is not None else None
+        if self.fused_attn:
+            x = F.scaled_dot_product_attention(
+                q, k, v,
+                attn_mask=attn_bias,
+                dropout_p=self.attn_drop.p if self.training else 0.,
+            )
+        else:
+            attn = (q * self.scale) @ k.transpose(-2, -1)
+            if attn_bias is not None:
+                attn = attn + attn_bias
+            attn = self.attn_drop(attn.softmax(dim=-1))
+            x = attn @ v
+
+        x = x.transpose(1, 2).reshape(B, N, C)
+        x = self.proj_drop(self.proj(x))
+        return x, k.mean(1)
+
+class ToMeBlock(Block):
+    """在注意力与MLP之间合并token的Transformer块，额外接收并返回每个token的大小"""
+
+    def forward(self, x, size=None):
+        x_attn, metric = self.attn(self.norm1(x), size if self._tome_prop_attn else None)
+        x = x + self.drop_path1(self.ls1(x_attn))
+
+        r = merge_count(x.shape[1], self._tome_ratio)
+        if r > 0:
+            merge = bipartite_soft_matching(metric, r, class_token=True)
+            if size is None:
+                size = torch.ones_like(x[..., 0, None])
+            x, size = merge_weighted_average(merge, x, size)
+
+        x = x + self.drop_path2(self.ls2(self.mlp(self.norm2(x))))
+        return x, size
+
+class ToMeVisionTransformer(VisionTransformer):
+    """逐块传递token大小的VisionTransformer；大小不保存在模块上，多个线程可同时推理"""
+
+    def forward_features(self, x):
+        x = self.patch_embed(x)
+        x = self._pos_embed(x)
+        x = self.patch_drop(x)
+        x = self.norm_pre(x)
+        size = None
+        for block in self.blocks:
+            x, size = block(x, size)
+        return self.norm(x)
+
+def merge_count(num_tokens, ratio):
+    """按比例计算本层合并的token数；二分匹配最多合并A组中除class token外的全部token"""
+    if ratio <= 0:
+        return 0
+    return max(0, min(int(ratio * num_tokens), (num_tokens + 1) // 2 - 1))
+
+def _normalize_ratios(ratios, depth):
+    if isinstance(ratios, (int, float)):
+        return [float(ratios)] * depth
+    ratios = [float(ratio) for ratio in ratios]
+    if len(ratios) == 1:
+        return ratios * depth
+    if len(ratios) != depth:
+        raise ValueError(f"合并比例需要为每个块各指定一个，共{depth}个，实际为{len(ratios)}个")
+    return ratios
+
+def apply_token_merging(vit, ratios, prop_attn=True):
+    """为timm VisionTransformer启用token合并
+
+    Args:
+        vit: timm VisionTransformer实例（需带class token）
+        ratios: 每层合并比例（本层token数的比例），单个数值（或只含一个数值的列表）表示所有层使用相同比例；
+                例如0.1表示每层注意力之后合并约10%的token
+        prop_attn: 是否按合并后的token大小加权注意力
+
+    Returns:
+        vit本身
+    """
+    if getattr(vit, 'cls_token', None) is None:
+        raise ValueError("token合并需要带class token的VisionTransformer")
+    vit.__class__ = ToMeVisionTransformer
+    for block, ratio in zip(vit.blocks, _normalize_ratios(ratios, len(vit.blocks))):
+        block.__class__ = ToMeBlock
+        block.attn.__class__ = ToMeAttention
+        block._tome_ratio = ratio
+        block._tome_prop_attn = prop_attn
+    return vit
+
+def remove_token_merging(vit):
+    """恢复为原始的VisionTransformer实现"""
+    if not isinstance(vit, ToMeVisionTransformer):
+        return vit
+    vit.__class__ = VisionTransformer
+    for block in vit.blocks:
+        block.__class__ = Block
+        block.attn.__class__ = Attention
+        del block._tome_ratio, block._tome_prop_attn
+    return vit
+
+def token_merging_config(vit):
+    """返回当前的token合并设置（每层比例的元组，prop_attn），未启用时返回None"""
+    if not isinstance(vit, ToMeVisionTransformer):
+        return None
+    return tuple(block._tome_ratio for block in vit.blocks), vit.blocks[0]._tome_prop_attn
+
+def token_counts(ratios, num_tokens, depth):
+    """估算启用合并后每个块输出的token数（含class token），用于报告"""
+    counts = []
+    for ratio in _normalize_ratios(ratios, depth):
+        num_tokens -= merge_count(num_tokens, ratio)
+        counts.append(num_tokens)
+    return counts
@@ -0,0 +1,151 @@
+"""
+权重文件模块 - safetensors格式的读写与内存映射加载
+
+safetensors文件由8字节小端头部长度、JSON头部和连续的张量数据组成。
+读取时直接将文件内存映射为张量存储，不再在内存中额外复制一份权重。
+同一主机上的多个进程映射同一个文件时共享页缓存，权重只占用一份物理内存。
+"""
+import json
+import os
+import struct
+import tempfile
+import torch
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# safetensors数据类型与torch数据类型的对应关系
+_DTYPES = {
+    'F64': torch.float64,
+    'F32': torch.float32,
+    'F16': torch.float16,
+    'BF16': torch.bfloat16,
+    'I64': torch.int64,
+    'I32': torch.int32,
+    'I16': torch.int16,
+    'I8': torch.int8,
+    'U8': torch.uint8,
+    'BOOL': torch.bool,
+}
+_DTYPE_NAMES = {dtype: name for name, dtype in _DTYPES.items()}
+
+def save_safetensors(state_dict, path, metadata=None):
+    """将state_dict保存为safetensors文件
+
+    张量按元素字节数从大到小排列，头部补齐到8字节，保证每个张量在文件中按其元素大小对齐，
+    可以直接内存映射使用。
+
+    Args:
+        state_dict: 参数名到张量的字典
+        path: 输出文件路径
+        metadata: 可选的字符串元数据字典
+    """
+    tensors = sorted(
+        ((name, tensor.detach().cpu().contiguous()) for name, tensor in state_dict.items()),
+        key=lambda item: -item[1].element_size()
+    )
+
+    header = {}
+    if metadata:
+        header['__metadata__'] = {str(k): str(v) for k, v in metadata.items()}
+    offset = 0
+    for name, tensor in tensors:
+        if tensor.dtype not in _DTYPE_NAMES:
+            raise TypeError(f"不支持的张量类型: {name} ({tensor.dtype})")
+        nbytes = tensor.numel() * tensor.element_size()
+        header[name] = {
+            'dtype': _DTYPE_NAMES[tensor.dtype],
+            'shape': list(tensor.shape),
+            'data_offsets': [offset, offset + nbytes],
+        }
+        offset += nbytes
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-len(header_bytes) % 8)
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as f:
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for _, tensor in tensors:
+            # 逐个张量写出，避免拼接出完整的权重副本
+            f.write(memoryview(tensor.reshape(-1).view(torch.uint8).numpy()))
+    os.replace(temporary_path, path)
+
+def read_safetensors_header(path):
+    """读取safetensors头部
+
+    Returns:
+        (头部字典, 数据区起始字节偏移)
+    """
+    with open(path, 'rb') as f:
+        (header_size,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_size))
+    return header, 8 + header_size
+
+def load_safetensors_mmap(path, shared=False):
+    """以内存映射方式加载safetensors文件
+
+    所有张量共享同一个文件映射存储，只有真正访问到的页才会读入内存。
+
+    Args:
+        path: safetensors文件路径
+        shared: True时使用共享映射（MAP_SHARED，多个进程共享同一份页缓存，写入会落盘）；
+                False时使用私有写时复制映射
+
+    Returns:
+        (参数名到张量的字典, 元数据字典)
+    """
+    header, data_start = read_safetensors_header(path)
+    metadata = header.pop('__metadata__', {})
+    storage = torch.UntypedStorage.from_file(path, shared, os.path.getsize(path))
+
+    state_dict = {}
+    for name, info in header.items():
+        dtype = _DTYPES[info['dtype']]
+        begin, end = info['data_offsets']
+        element_size = torch.empty((), dtype=dtype).element_size()
+        byte_offset = data_start + begin
+        if byte_offset % element_size:
+            raise ValueError(f"张量未按元素大小对齐，无法内存映射: {name}")
+        tensor = torch.empty(0, dtype=dtype)
+        tensor.set_(storage, byte_offset // element_size, info['shape'])
+        if tensor.numel() * element_size != end - begin:
+            raise ValueError(f"张量大小与头部记录不一致: {name}")
+        state_dict[name] = tensor
+    return state_dict, metadata
+
+# 多进程共享的权重文件默认放在内存文件系统中
+SHARED_WEIGHTS_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+def publish_safetensors(path, load_state_dict, metadata=None):
+    """确保path处存在safetensors文件，不存在时由当前进程生成
+
+    多个进程同时启动时通过文件锁保证只有一个进程读取原始权重并写入，
+    其余进程等待写入完成后直接内存映射同一个文件。
+
+    Args:
+        path: safetensors文件路径
+        load_state_dict: 无参数函数，返回要写入的state_dict
+        metadata: 可选的字符串元数据字典
+
+    Returns:
+        safetensors文件路径
+    """
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.lock", 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # 等锁期间其他进程可能已经写好
+            if not os.path.exists(path):
+                save_safetensors(load_state_dict(), path, metadata)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return path